@@ -1,10 +1,24 @@
-print("[MessageVerifier] module loaded")
-def _split_keywords(text: str):
+from agent_logging import get_logger
+
+log = get_logger("MessageVerifier")
+
+
+def _split_keywords(text):
+    # compiled rules carry pre-split keyword tuples; raw rules carry comma strings
+    if isinstance(text, (list, tuple)):
+        return list(text)
     if not isinstance(text, str):
         return []
     return [t.strip() for t in text.split(",") if t.strip()]
 
 
+def _rule_keywords(rule_row: dict, field: str):
+    pre = rule_row.get(f"{field}_keywords")
+    if pre is not None:
+        return pre
+    return rule_row.get(field, "")
+
+
 def check_banned(message: str, banned: str):
     hits = [k for k in _split_keywords(banned) if k in message]
     if hits:
@@ -30,17 +44,63 @@ def check_viewpoint(message: str, viewpoint: str):
     return None
 
 
+# rule keyword signature -> matcher, for rule rows that are not in the compiled artifact
+_ADHOC_MATCHERS = {}
+_ADHOC_MATCHERS_MAX = 512
+
+
+def _matcher_for(rule_row: dict):
+    """
+    Per-brand Aho-Corasick matcher built once (compiled rule artifact).
+    Rule rows that did not come from the artifact (edited / hand-built dicts)
+    get a single-row matcher cached by keyword signature.
+    """
+    from brand_rules import get_brand_matcher
+    from keyword_automaton import BrandRuleMatcher, rule_signature
+
+    brand = rule_row.get("brand", "")
+    if brand and "rule_id" in rule_row:
+        m = get_brand_matcher(brand)
+        if m is not None and m.covers(rule_row):
+            return m
+
+    sig = rule_signature(rule_row)
+    m = _ADHOC_MATCHERS.get(sig)
+    if m is None:
+        if len(_ADHOC_MATCHERS) >= _ADHOC_MATCHERS_MAX:
+            _ADHOC_MATCHERS.clear()
+        m = BrandRuleMatcher(brand, [dict(rule_row, rule_id=None)])
+        _ADHOC_MATCHERS[sig] = m
+    return m
+
+
 def verify_brand_rules(message: str, rule_row: dict):
+    # one automaton pass reports banned / must_include / viewpoint hits together;
+    # error strings are the same as check_banned / check_must_include / check_viewpoint
+    errors = _matcher_for(rule_row or {}).verify(message or "", rule_row or {})
+
+    log.debug("verify_brand_rules brand=%s errors=%d", (rule_row or {}).get("brand", ""), len(errors))
+    return errors
+
+
+def verify_brand_rules_all(message: str):
+    """Audit one message against every compiled rule row: {rule_id: errors}, single pass."""
+    from brand_rules import get_rule_set_matcher
+
+    return get_rule_set_matcher().verify_all(message or "")
+
+
+def verify_brand_rules_scan(message: str, rule_row: dict):
+    """Reference implementation: one substring scan per keyword (kept for parity checks)."""
     errors = []
 
-    e = check_banned(message, rule_row.get("banned", ""))
+    e = check_banned(message, _rule_keywords(rule_row, "banned"))
     if e: errors.append(e)
 
-    e = check_must_include(message, rule_row.get("must_include", ""))
+    e = check_must_include(message, _rule_keywords(rule_row, "must_include"))
     if e: errors.append(e)
 
-    e = check_viewpoint(message, rule_row.get("viewpoint", ""))
+    e = check_viewpoint(message, _rule_keywords(rule_row, "viewpoint"))
     if e: errors.append(e)
 
-    print("[MessageVerifier] verify_brand_rules called")
     return errors
\ No newline at end of file
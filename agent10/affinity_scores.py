@@ -0,0 +1,248 @@
+# agent10/affinity_scores.py
+# Offline product-affinity scoring: benefit_score / identity_score per catalog row.
+#
+# ProductSelector ranks candidates by 0.5 * benefit_score + 0.5 * identity_score,
+# but the catalog carries neither column, so every product tied at 0.0.
+# This pipeline scores every product against its brand's analysed "parts"
+# (brand_analysis_part_enhanced.csv):
+#   - product text : 상품명 + category + subcategory + leading 전성분 tokens
+#   - part text    : content + 핵심 키워드 + AI 분석 톤
+#   - TF-IDF (char_wb n-grams, robust for Korean compounds without a tokenizer)
+#   - benefit_score  = cosine(product, centroid of the brand's benefit/proof parts)
+#   - identity_score = cosine(product, centroid of the brand's identity/emotion parts)
+#     (brands without parts of a role fall back to all of their parts; brands
+#      without any part score 0.0)
+#
+# Output is a versioned columnar artifact under data/build/, keyed by the input
+# hashes + pipeline version:
+#   product_affinity.v{VER}.{key16}/benefit_score.npy    float32[n_rows]
+#                                  /identity_score.npy   float32[n_rows]
+#                                  /meta.json            inputs, n_rows, names digest
+# Columns are aligned with catalog rows; the selector memory-maps them
+# (np.load(mmap_mode="r")) after checking the row count / product-name digest.
+#
+# Usage:
+#   python agent10/affinity_scores.py            # build (no-op if up to date)
+#   python agent10/affinity_scores.py --force
+
+import csv
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from agent_logging import get_logger
+
+log = get_logger("affinity_scores")
+
+BASE_DIR = Path(__file__).resolve().parent
+DATA_DIR = BASE_DIR.parent / "data"
+BUILD_DIR = DATA_DIR / "build"
+
+CATALOG_CSV = DATA_DIR / "amore_with_category.csv"
+PARTS_CSV = DATA_DIR / "brand_analysis_part_enhanced.csv"
+
+# 파이프라인(텍스트 구성/벡터라이저/역할 매핑)이 바뀌면 올린다 → 기존 산출물 무효화
+AFFINITY_VERSION = 1
+
+SCORE_COLUMNS = ["benefit_score", "identity_score"]
+
+# part_role -> score column
+ROLE_GROUPS = {
+    "benefit_score": ("benefit", "proof"),
+    "identity_score": ("identity", "emotion"),
+}
+
+# leading 전성분 tokens carry the formulation's main actives; the tail is mostly boilerplate
+INGREDIENT_TOKENS = 12
+
+TFIDF_PARAMS = {"analyzer": "char_wb", "ngram_range": (2, 4), "min_df": 1, "sublinear_tf": True}
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _read_csv(path: Path) -> List[Dict[str, str]]:
+    with path.open("r", encoding="utf-8-sig", newline="") as f:
+        return [{(k or "").strip(): (v or "").strip() for k, v in r.items()} for r in csv.DictReader(f)]
+
+
+def _clean_name(v) -> str:
+    if v is None or (isinstance(v, float) and v != v):
+        return ""
+    s = str(v).strip()
+    return "" if s.lower() == "nan" else s
+
+
+def names_digest(names: Sequence) -> str:
+    """Row-aligned product-name digest (artifact <-> catalog/DataFrame alignment check)."""
+    h = hashlib.sha1()
+    for n in names:
+        h.update(_clean_name(n).encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def artifact_dir(catalog_csv=CATALOG_CSV, parts_csv=PARTS_CSV, build_dir=BUILD_DIR) -> Path:
+    key = hashlib.sha256(
+        json.dumps(
+            [AFFINITY_VERSION, _sha256(Path(catalog_csv)), _sha256(Path(parts_csv)), repr(TFIDF_PARAMS),
+             INGREDIENT_TOKENS, ROLE_GROUPS],
+            ensure_ascii=False,
+        ).encode("utf-8")
+    ).hexdigest()
+    return Path(build_dir) / f"product_affinity.v{AFFINITY_VERSION}.{key[:16]}"
+
+
+def product_text(row: Dict[str, str]) -> str:
+    from ingredient_index import split_ingredients
+
+    ing = split_ingredients(row.get("전성분", ""))[:INGREDIENT_TOKENS]
+    return " ".join([row.get("상품명", ""), row.get("category", ""), row.get("subcategory", ""), " ".join(ing)])
+
+
+def part_text(row: Dict[str, str]) -> str:
+    content = row.get("content", "").rstrip(".").rstrip("…")
+    return " ".join([content, row.get("핵심 키워드", "").replace(",", " "), row.get("AI 분석 톤", "")])
+
+
+def compute_scores(catalog_rows: List[Dict[str, str]], part_rows: List[Dict[str, str]]) -> Dict[str, "object"]:
+    """-> {"benefit_score": float32[n], "identity_score": float32[n]} aligned with catalog_rows."""
+    import numpy as np
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.preprocessing import normalize
+
+    from brand_rules import normalize_brand
+
+    n = len(catalog_rows)
+    out = {c: np.zeros(n, dtype=np.float32) for c in SCORE_COLUMNS}
+    if n == 0 or not part_rows:
+        return out
+
+    vec = TfidfVectorizer(**TFIDF_PARAMS)
+    # one vocabulary over products + parts so both live in the same space
+    X = vec.fit_transform([product_text(r) for r in catalog_rows] + [part_text(r) for r in part_rows])
+    P, Q = X[:n], X[n:]
+
+    part_brands = [normalize_brand(r.get("brand", "")) for r in part_rows]
+    part_roles = [r.get("part_role", "").strip().lower() for r in part_rows]
+    prod_brands = [normalize_brand(r.get("brand", "")) for r in catalog_rows]
+
+    for col, roles in ROLE_GROUPS.items():
+        # brand -> L2-normalized centroid of its parts for this role group
+        centroids, brands = [], []
+        for b in sorted(set(part_brands)):
+            idx = [i for i, pb in enumerate(part_brands) if pb == b and part_roles[i] in roles]
+            if not idx:
+                idx = [i for i, pb in enumerate(part_brands) if pb == b]
+            centroids.append(np.asarray(Q[idx].mean(axis=0)).ravel())
+            brands.append(b)
+        C = normalize(np.vstack(centroids))
+        brand_pos = {b: j for j, b in enumerate(brands)}
+
+        sims = np.asarray((P @ C.T))  # (n_products, n_brands), rows already L2-normalized by TF-IDF
+        rows = np.array([brand_pos.get(b, -1) for b in prod_brands])
+        has = rows >= 0
+        out[col][has] = sims[np.nonzero(has)[0], rows[has]].astype(np.float32)
+    return out
+
+
+def build_affinity_scores(catalog_csv=CATALOG_CSV, parts_csv=PARTS_CSV, build_dir=BUILD_DIR, force=False) -> Path:
+    """Compute and write the artifact; returns its directory (reused when up to date)."""
+    import numpy as np
+
+    catalog_csv, parts_csv = Path(catalog_csv), Path(parts_csv)
+    out = artifact_dir(catalog_csv, parts_csv, build_dir)
+    if out.exists() and not force:
+        return out
+
+    t0 = time.perf_counter()
+    catalog_rows = _read_csv(catalog_csv)
+    part_rows = _read_csv(parts_csv)
+    scores = compute_scores(catalog_rows, part_rows)
+
+    tmp = out.with_name(out.name + f".tmp{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for col, arr in scores.items():
+        np.save(tmp / f"{col}.npy", np.ascontiguousarray(arr, dtype=np.float32))
+    meta = {
+        "version": AFFINITY_VERSION,
+        "catalog_csv": str(catalog_csv.name),
+        "catalog_sha256": _sha256(catalog_csv),
+        "parts_csv": str(parts_csv.name),
+        "parts_sha256": _sha256(parts_csv),
+        "n_rows": len(catalog_rows),
+        "names_sha1": names_digest(r.get("상품명", "") for r in catalog_rows),
+        "columns": list(scores),
+        "tfidf": {k: list(v) if isinstance(v, tuple) else v for k, v in TFIDF_PARAMS.items()},
+        "build_sec": round(time.perf_counter() - t0, 3),
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    if force:
+        shutil.rmtree(out, ignore_errors=True)
+    try:
+        os.replace(tmp, out)
+    except OSError:
+        # another process published the same artifact first
+        shutil.rmtree(tmp, ignore_errors=True)
+    return out
+
+
+def load_affinity_scores(
+    n_rows: int,
+    names_sha1: Optional[str] = None,
+    catalog_csv=CATALOG_CSV,
+    parts_csv=PARTS_CSV,
+    build_dir=BUILD_DIR,
+    build_if_missing: bool = True,
+) -> Dict[str, "object"]:
+    """
+    Memory-mapped score columns ({column: np.memmap}) for a catalog of n_rows rows,
+    or {} when the artifact is missing / does not line up with the caller's rows.
+    """
+    import numpy as np
+
+    try:
+        d = artifact_dir(catalog_csv, parts_csv, build_dir)
+        if not d.exists():
+            if not build_if_missing:
+                return {}
+            d = build_affinity_scores(catalog_csv, parts_csv, build_dir)
+        meta = json.loads((d / "meta.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError, ImportError) as e:
+        log.warning("unavailable: %s", e)
+        return {}
+
+    if meta.get("n_rows") != n_rows or (names_sha1 and meta.get("names_sha1") != names_sha1):
+        log.warning("artifact does not match the loaded catalog rows (ignored)")
+        return {}
+    return {c: np.load(d / f"{c}.npy", mmap_mode="r") for c in meta.get("columns", SCORE_COLUMNS)}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    sys.path.insert(0, str(BASE_DIR))
+    ap = argparse.ArgumentParser(description="Build product benefit/identity affinity scores.")
+    ap.add_argument("--catalog", default=str(CATALOG_CSV))
+    ap.add_argument("--parts", default=str(PARTS_CSV))
+    ap.add_argument("--build-dir", default=str(BUILD_DIR))
+    ap.add_argument("--force", action="store_true")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    path = build_affinity_scores(args.catalog, args.parts, args.build_dir, force=args.force)
+    meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+    print(f"[affinity_scores] {path} rows={meta['n_rows']} build={meta['build_sec']}s "
+          f"total={time.perf_counter() - t0:.2f}s")
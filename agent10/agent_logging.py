@@ -0,0 +1,236 @@
+# agent10/agent_logging.py
+# Structured logging for the pipeline hot paths.
+#
+# ProductSelector / OpenAIChatCompletionClient / verify_brand_rules / ToneProfiles used
+# to print() (flush=True) on every call: one synchronous write per selected product and
+# per LLM call, always on. They now log through stdlib loggers under "agent10.<module>":
+#   - off by default below WARNING; a disabled call costs one cached isEnabledFor()
+#     check (the message is never formatted: %-style args, not f-strings), and hot
+#     paths guard expensive arguments with `if log.isEnabledFor(DEBUG):`
+#   - per-module levels from AGENT10_LOG, e.g.
+#       AGENT10_LOG=INFO                                  # every agent10 logger
+#       AGENT10_LOG=product_selector=DEBUG,openai_client=INFO
+#       AGENT10_LOG=DEBUG,token_ledger=ERROR              # bare level = default for the rest
+#   - AGENT10_LOG_JSON=<path> (or "-" for stderr) emits JSON lines instead of text,
+#     asynchronously: the caller only enqueues the record (QueueHandler), a
+#     QueueListener thread formats and writes it. Each line carries ts / level /
+#     logger / msg, the LLM stage (token_ledger.current_stage) and any extra={...}.
+#
+# Benchmark (overhead per call, logging off / text / json, vs the old print):
+#   python agent10/agent_logging.py --bench
+
+import atexit
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, Optional, Tuple
+
+ROOT = "agent10"
+DEFAULT_LEVEL = logging.WARNING
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+
+_TEXT_FORMAT = "[%(module_name)s] %(levelname)s %(message)s"
+
+# LogRecord attributes that are not user extras (JSON output keeps the rest)
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "module_name", "stage"}
+
+_STATE: Dict[str, Any] = {"configured": False, "listener": None, "stream": None}
+
+
+def parse_levels(spec: str) -> Tuple[int, Dict[str, int]]:
+    """"DEBUG,token_ledger=ERROR" -> (DEBUG, {"token_ledger": ERROR}); unknown level names are ignored."""
+    default = DEFAULT_LEVEL
+    per_module: Dict[str, int] = {}
+    for part in (spec or "").split(","):
+        name, _, level = part.strip().rpartition("=")
+        value = logging.getLevelName(level.strip().upper())
+        if not isinstance(value, int):
+            continue
+        if name.strip():
+            per_module[name.strip()] = value
+        else:
+            default = value
+    return default, per_module
+
+
+class _ContextFilter(logging.Filter):
+    """Short module name for the text format, LLM stage for JSON (read in the calling thread)."""
+
+    _current_stage: Any = None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.module_name = record.name[len(ROOT) + 1:] if record.name.startswith(ROOT + ".") else record.name
+        if self._current_stage is None:
+            from token_ledger import current_stage
+
+            _ContextFilter._current_stage = staticmethod(current_stage)
+        record.stage = self._current_stage()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": getattr(record, "module_name", record.name),
+            "msg": record.getMessage(),
+            "stage": getattr(record, "stage", ""),
+        }
+        for k, v in vars(record).items():
+            if k not in _RECORD_ATTRS and not k.startswith("_"):
+                out[k] = v
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+def _queue_handler(q: Any) -> logging.Handler:
+    from logging.handlers import QueueHandler
+
+    class _AsyncHandler(QueueHandler):
+        # the agent10 tree has this single handler (propagate=False), so the record is
+        # not shared: merge the message in place instead of QueueHandler's format + copy
+        def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+            record.msg = record.getMessage()
+            record.args = None
+            if record.exc_info:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+                record.exc_info = None
+            return record
+
+    return _AsyncHandler(q)
+
+
+def _shutdown() -> None:
+    listener = _STATE.get("listener")
+    if listener is not None:
+        listener.stop()
+        _STATE["listener"] = None
+    stream = _STATE.get("stream")
+    if stream is not None:
+        stream.close()
+        _STATE["stream"] = None
+
+
+def configure(levels: Optional[str] = None, json_path: Optional[str] = None, stream: Any = None) -> logging.Logger:
+    """
+    (Re)configure the agent10 logger tree. levels / json_path default to AGENT10_LOG /
+    AGENT10_LOG_JSON; stream overrides the text handler target (default sys.stderr).
+    """
+    levels = os.getenv("AGENT10_LOG", "") if levels is None else levels
+    json_path = os.getenv("AGENT10_LOG_JSON", "") if json_path is None else json_path
+
+    _shutdown()
+    root = logging.getLogger(ROOT)
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.propagate = False
+
+    default, per_module = parse_levels(levels)
+    root.setLevel(default)
+    # reset loggers configured by a previous call, then apply the per-module levels
+    for name, obj in list(logging.root.manager.loggerDict.items()):
+        if name.startswith(ROOT + ".") and isinstance(obj, logging.Logger):
+            obj.setLevel(logging.NOTSET)
+    for name, level in per_module.items():
+        logging.getLogger(f"{ROOT}.{name}").setLevel(level)
+
+    if json_path:
+        import queue
+        from logging.handlers import QueueListener
+
+        if json_path == "-":
+            target = logging.StreamHandler(sys.stderr)
+        else:
+            fh = open(json_path, "a", encoding="utf-8")
+            _STATE["stream"] = fh
+            target = logging.StreamHandler(fh)
+        target.setFormatter(JsonFormatter())
+        q: Any = queue.SimpleQueue()
+        handler: logging.Handler = _queue_handler(q)
+        listener = QueueListener(q, target)
+        listener.start()
+        _STATE["listener"] = listener
+    else:
+        handler = logging.StreamHandler(stream if stream is not None else sys.stderr)
+        handler.setFormatter(logging.Formatter(_TEXT_FORMAT))
+    handler.addFilter(_ContextFilter())
+    root.addHandler(handler)
+    _STATE["configured"] = True
+    return root
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger "agent10.<name>"; the tree is configured from the environment on first use."""
+    if not _STATE["configured"]:
+        configure()
+    return logging.getLogger(f"{ROOT}.{name}")
+
+
+atexit.register(_shutdown)
+
+
+# ---------------------------------------------------------------------------
+# benchmark
+# ---------------------------------------------------------------------------
+def _time_per_call(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - t0) / n * 1e9
+
+
+def bench(n: int = 200_000) -> Dict[str, float]:
+    """ns per hot-path log statement (the ProductSelector "Selected" line) in each mode."""
+    name, score = "설화수 자음생크림", 0.81234
+    devnull = open(os.devnull, "w", encoding="utf-8")
+    out: Dict[str, float] = {}
+    try:
+        out["baseline (no logging)"] = _time_per_call(lambda i: None, n)
+        out["print(flush=True) [old]"] = _time_per_call(
+            lambda i: print(f">>> [DEBUG] Selected: {name} ({score:.4f})", file=devnull, flush=True), n)
+
+        log = get_logger("bench")
+        configure(levels="WARNING", json_path="", stream=devnull)
+        out["logging off"] = _time_per_call(lambda i: log.debug("Selected: %s (%.4f)", name, score), n)
+        out["logging off, guarded"] = _time_per_call(
+            lambda i: log.isEnabledFor(DEBUG) and log.debug("Selected: %s (%.4f)", name, score), n)
+
+        configure(levels="bench=DEBUG", json_path="", stream=devnull)
+        out["logging on, text"] = _time_per_call(lambda i: log.debug("Selected: %s (%.4f)", name, score), n)
+
+        configure(levels="bench=DEBUG", json_path=os.devnull)
+        t0 = time.perf_counter()
+        for _ in range(n):
+            log.debug("Selected: %s (%.4f)", name, score, extra={"product": name, "score": score})
+        out["logging on, json (caller)"] = (time.perf_counter() - t0) / n * 1e9
+        _shutdown()  # drains the queue
+        out["logging on, json (drained)"] = (time.perf_counter() - t0) / n * 1e9
+    finally:
+        configure()
+        devnull.close()
+    return out
+
+
+if __name__ == "__main__":
+    import argparse
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    # the pipeline modules import agent_logging, not __main__: benchmark that module
+    from agent_logging import bench
+
+    ap = argparse.ArgumentParser(description="agent10 logging layer")
+    ap.add_argument("--bench", action="store_true", help="measure per-call overhead off / text / json")
+    ap.add_argument("-n", type=int, default=200_000)
+    args = ap.parse_args()
+    if args.bench:
+        for mode, ns in bench(args.n).items():
+            print(f"{mode:<28}{ns:>10.0f} ns/call")
@@ -0,0 +1,470 @@
+# agent10/batch_jobs.py
+# Offline batch-job mode: emit LLM request files, ingest results asynchronously.
+#
+# Nightly campaigns do not need interactive latency. Instead of one synchronous
+# chat call per stage, a job runs in rounds over a job directory:
+#
+#   step     re-run the pipeline (controller.main) for every persona with BatchLLM:
+#            calls whose response is already ingested are replayed, the first missing
+#            call of each message is written to round_<n>.requests.jsonl and the rest
+#            of that message is skipped (its later prompts depend on the response).
+#            When nothing is missing, post-processing + verification run and the
+#            final messages are written to messages.jsonl.
+#   serve    the provider side: answers round_<n>.requests.jsonl into
+#            round_<n>.results.jsonl. The local stand-in runs offline_llm.OfflineLLM
+#            (or the live chat client, --llm openai) per request.
+#   run      step / serve until done (local end-to-end).
+#
+# Planner -> narrator -> length insert dependencies therefore take one round each.
+# Request / result lines use the OpenAI Batch API file format
+# ({"custom_id", "method", "url", "body"} / {"custom_id", "response": {"body": ...}}),
+# so a requests file can be uploaded as is and the downloaded output dropped in
+# as round_<n>.results.jsonl.
+#
+# custom_id = <persona>-s<seed>-m<message>-c<call>-<stage>-<prompt hash>: stable across
+# rounds (the pipeline is deterministic for a fixed seed) and self-validating (an
+# edited prompt gets a new id instead of a stale response).
+#
+# Cross-persona dedup: ingested responses are keyed by the request content hash
+# (model + messages + sampling params), not by custom_id. Each round issues every
+# unique pending prompt once (the first waiting message's custom_id), and the answer
+# fans out to all messages waiting on the same prompt, including prompts that come
+# up again in a later round. Title prompts (brand / product / skin_concern /
+# lifestyle) and planner prompts (persona fields only, shared by all rows of a persona)
+# repeat a lot within a campaign. round_<n>.dedup.json and summary.json report the
+# waiting vs issued counts and the dedup ratio per stage.
+#
+# Usage:
+#   python agent10/batch_jobs.py run --job /tmp/job1 --personas 8 --seed 7
+#   python agent10/batch_jobs.py step --job /tmp/job1     # cron: emit / finalize
+#   python agent10/batch_jobs.py serve --job /tmp/job1    # provider stand-in
+#   python agent10/batch_jobs.py run --job /tmp/job1 --personas 8 --profile prof/   # pipeline_profile
+
+import contextlib
+import csv
+import hashlib
+import io
+import json
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent
+PERSONA_CSV = BASE_DIR.parent / "data" / "persona_meta_v2.csv"
+
+JOB_SPEC = "job.json"
+MESSAGES = "messages.jsonl"
+SUMMARY = "summary.json"
+CHAT_URL = "/v1/chat/completions"
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_MAX_ROUNDS = 8
+
+_ROUND_RE = re.compile(r"round_(\d+)\.requests\.jsonl$")
+
+
+def _persona_ids(limit: int) -> List[str]:
+    with PERSONA_CSV.open("r", encoding="utf-8-sig", newline="") as f:
+        ids = list(dict.fromkeys((r.get("persona_id") or "").strip() for r in csv.DictReader(f)))
+    return [p for p in ids if p][:limit]
+
+
+def request_body(messages: Any, model: str, temperature: float, response_format: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Chat completions request body as sent to the provider."""
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    body: Dict[str, Any] = {"model": model, "messages": list(messages or []), "temperature": float(temperature)}
+    if response_format:
+        body["response_format"] = response_format
+    return body
+
+
+def request_hash(body: Dict[str, Any]) -> str:
+    """Content hash of a request body (model + messages + sampling params)."""
+    blob = json.dumps(body, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _read_jsonl(path: Path) -> List[Dict[str, Any]]:
+    with path.open("r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _write_jsonl(path: Path, records: List[Dict[str, Any]]) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    tmp.replace(path)
+
+
+# ---------------------------------------------------------------------------
+# client side: record / replay
+# ---------------------------------------------------------------------------
+class BatchLLM:
+    """
+    Chat client surface for one persona run of a batch round.
+    Ingested responses (request hash -> text) are replayed; the first call of a message
+    without a response is recorded in .pending and answered with "", and every later
+    call of that message is answered with "" without being recorded.
+    Message boundaries are the per-message call budgets (token_ledger.begin_message_budget).
+    """
+
+    def __init__(self, responses: Dict[str, str], persona_id: str, seed: int, model: str = DEFAULT_MODEL):
+        self.offline = False
+        self.model = model
+        self.responses = responses
+        self.persona_id = persona_id
+        self.seed = int(seed)
+        self.pending: List[Dict[str, Any]] = []
+        self.replayed = 0
+        self._budget: Any = None
+        self._message = 0
+        self._call = 0
+        self._blocked = False
+
+    def _next_id(self, stage: str, digest: str) -> str:
+        from token_ledger import current_budget
+
+        budget = current_budget()
+        if budget is not self._budget or budget is None:
+            self._budget = budget
+            self._message += 1
+            self._call = 0
+            self._blocked = False
+        self._call += 1
+        return f"{self.persona_id}-s{self.seed}-m{self._message}-c{self._call}-{stage}-{digest[:16]}"
+
+    def generate(
+        self,
+        messages=None,
+        system: Optional[str] = None,
+        user: Optional[str] = None,
+        temperature: float = 0.7,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        from token_ledger import current_stage
+
+        if messages is None and system is not None and user is not None:
+            messages = [{"role": "system", "content": system}, {"role": "user", "content": user}]
+        body = request_body(messages, self.model, temperature, response_format)
+        digest = request_hash(body)
+        custom_id = self._next_id(current_stage(), digest)
+
+        if self._blocked:
+            return ""
+        text = self.responses.get(digest)
+        if text is not None:
+            self.replayed += 1
+            return text
+        self.pending.append({"custom_id": custom_id, "method": "POST", "url": CHAT_URL, "body": body})
+        self._blocked = True
+        return ""
+
+    def chat(self, messages, temperature: float = 0.7, response_format: Optional[Dict[str, Any]] = None) -> str:
+        return self.generate(messages=messages, temperature=temperature, response_format=response_format)
+
+
+# ---------------------------------------------------------------------------
+# job directory
+# ---------------------------------------------------------------------------
+def _rounds(job_dir: Path) -> List[int]:
+    return sorted(int(m.group(1)) for p in job_dir.glob("round_*.requests.jsonl") if (m := _ROUND_RE.search(p.name)))
+
+
+def _requests_path(job_dir: Path, n: int) -> Path:
+    return job_dir / f"round_{n}.requests.jsonl"
+
+
+def _results_path(job_dir: Path, n: int) -> Path:
+    return job_dir / f"round_{n}.results.jsonl"
+
+
+def _dedup_path(job_dir: Path, n: int) -> Path:
+    return job_dir / f"round_{n}.dedup.json"
+
+
+def load_responses(job_dir: Path) -> Dict[str, str]:
+    """request hash -> assistant text from every round_<n>.results.jsonl (failed lines skipped)."""
+    out: Dict[str, str] = {}
+    for n in _rounds(job_dir):
+        path = _results_path(job_dir, n)
+        if not path.exists():
+            continue
+        digests = {r["custom_id"]: request_hash(r["body"]) for r in _read_jsonl(_requests_path(job_dir, n))}
+        for rec in _read_jsonl(path):
+            resp = rec.get("response") or {}
+            if rec.get("error") or resp.get("status_code", 200) != 200:
+                continue
+            try:
+                out[digests[rec["custom_id"]]] = resp["body"]["choices"][0]["message"]["content"] or ""
+            except (KeyError, IndexError, TypeError):
+                continue
+    return out
+
+
+def create_job(
+    job_dir,
+    persona_ids: List[str],
+    seed: int,
+    topk: int = 3,
+    prompt_mode: Optional[str] = None,
+    output_mode: Optional[str] = None,
+    model: str = DEFAULT_MODEL,
+) -> Dict[str, Any]:
+    job_dir = Path(job_dir)
+    job_dir.mkdir(parents=True, exist_ok=True)
+    spec = {
+        "personas": list(persona_ids),
+        "seed": int(seed),
+        "topk": int(topk),
+        "prompt_mode": prompt_mode,
+        "output_mode": output_mode,
+        "model": model,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    (job_dir / JOB_SPEC).write_text(json.dumps(spec, ensure_ascii=False, indent=2), encoding="utf-8")
+    return spec
+
+
+def load_job(job_dir) -> Dict[str, Any]:
+    path = Path(job_dir) / JOB_SPEC
+    if not path.exists():
+        raise FileNotFoundError(f"{path} not found (create the job first: batch_jobs.py run/step --personas ...)")
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _verify(results: List[Dict[str, Any]], verifier: Any) -> None:
+    for r in results:
+        if not r.get("message"):
+            continue
+        title, _, body = r["message"].partition("\n")
+        title = title.replace("TITLE:", "", 1).strip()
+        body = body.replace("BODY:", "", 1).strip()
+        plan = dict(r.get("plan") or {})
+        plan.setdefault("brand_name_slot", (r.get("row") or {}).get("brand_name_slot"))
+        v = verifier.verify({"title": title, "body": body}, plan)
+        r["verify_errors"] = v["errors"]
+        r["verify_warnings"] = v["warnings"]
+
+
+def step(job_dir, max_rounds: int = DEFAULT_MAX_ROUNDS) -> Dict[str, Any]:
+    """
+    One client round: ingest results, re-run every persona, then either emit the
+    next requests file or (nothing missing) verify and write messages.jsonl.
+    """
+    from controller import main
+
+    job_dir = Path(job_dir)
+    spec = load_job(job_dir)
+    rounds = _rounds(job_dir)
+    if rounds and not _results_path(job_dir, rounds[-1]).exists():
+        return {"status": "waiting", "round": rounds[-1]}
+
+    responses = load_responses(job_dir)
+    pending: Dict[str, Dict[str, Any]] = {}
+    finished: List[Dict[str, Any]] = []
+    waiting = 0
+    replayed = 0
+    t0 = time.perf_counter()
+    for pid in spec["personas"]:
+        llm = BatchLLM(responses, pid, spec["seed"], spec.get("model") or DEFAULT_MODEL)
+        # controller progress prints are not part of the batch output
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = main(pid, topk=spec["topk"], verbose=False, seed=spec["seed"], llm=llm,
+                           prompt_mode=spec.get("prompt_mode"), output_mode=spec.get("output_mode"))
+        replayed += llm.replayed
+        for req in llm.pending:
+            pending.setdefault(req["custom_id"], req)
+        if llm.pending:
+            waiting += 1
+        else:
+            finished.extend(results)
+    elapsed = round(time.perf_counter() - t0, 3)
+
+    n = (rounds[-1] + 1) if rounds else 1
+    if pending:
+        if n > max_rounds:
+            raise RuntimeError(f"[batch_jobs] still {len(pending)} missing responses after {max_rounds} rounds")
+        # one request per unique prompt; the response fans out through the hash-keyed store
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for req in pending.values():
+            groups.setdefault(request_hash(req["body"]), []).append(req)
+        issued = [reqs[0] for reqs in groups.values()]
+        report = dedup_report(list(pending.values()), issued)
+        report["fanout"] = {reqs[0]["custom_id"]: [r["custom_id"] for r in reqs[1:]] for reqs in groups.values() if len(reqs) > 1}
+        _write_jsonl(_requests_path(job_dir, n), issued)
+        _dedup_path(job_dir, n).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        return {"status": "pending", "round": n, "requests": len(issued), "waiting": len(pending),
+                "dedup_ratio": report["dedup_ratio"], "replayed": replayed,
+                "personas_done": len(spec["personas"]) - waiting,
+                "client_sec": elapsed}
+
+    from verifier import MessageVerifier
+
+    _verify(finished, MessageVerifier())
+    _write_jsonl(job_dir / MESSAGES, finished)
+    summary = {
+        "status": "done",
+        "rounds": len(rounds),
+        "personas": len(spec["personas"]),
+        "messages": sum(1 for r in finished if r.get("message")),
+        "llm_requests": sum(len(_read_jsonl(_requests_path(job_dir, k))) for k in rounds),
+        # calls a synchronous run makes (every call of every message) vs requests issued
+        "llm_calls": replayed,
+        "dedup": campaign_dedup(job_dir, rounds),
+        "verify_errors": sum(len(r.get("verify_errors", [])) for r in finished),
+        "client_sec": elapsed,
+    }
+    (job_dir / SUMMARY).write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+    return summary
+
+
+def dedup_report(waiting: List[Dict[str, Any]], issued: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """waiting vs issued request counts (total and per stage) for one round."""
+    by_stage: Dict[str, Dict[str, int]] = {}
+    for key, reqs in (("waiting", waiting), ("issued", issued)):
+        for r in reqs:
+            b = by_stage.setdefault(_stage_of(r["custom_id"]), {"waiting": 0, "issued": 0})
+            b[key] += 1
+    return {
+        "waiting": len(waiting),
+        "issued": len(issued),
+        "dedup_ratio": round(1 - len(issued) / len(waiting), 4) if waiting else 0.0,
+        "by_stage": dict(sorted(by_stage.items())),
+    }
+
+
+def campaign_dedup(job_dir: Path, rounds: List[int]) -> Dict[str, Any]:
+    """dedup_report totals over all rounds of a job."""
+    waiting = issued = 0
+    by_stage: Dict[str, Dict[str, int]] = {}
+    for n in rounds:
+        path = _dedup_path(job_dir, n)
+        if not path.exists():
+            continue
+        rep = json.loads(path.read_text(encoding="utf-8"))
+        waiting += rep["waiting"]
+        issued += rep["issued"]
+        for stage, b in rep["by_stage"].items():
+            t = by_stage.setdefault(stage, {"waiting": 0, "issued": 0})
+            t["waiting"] += b["waiting"]
+            t["issued"] += b["issued"]
+    for b in by_stage.values():
+        b["dedup_ratio"] = round(1 - b["issued"] / b["waiting"], 4) if b["waiting"] else 0.0
+    return {
+        "waiting": waiting,
+        "issued": issued,
+        "dedup_ratio": round(1 - issued / waiting, 4) if waiting else 0.0,
+        "by_stage": dict(sorted(by_stage.items())),
+    }
+
+
+# ---------------------------------------------------------------------------
+# provider side: local stand-in
+# ---------------------------------------------------------------------------
+def _stage_of(custom_id: str) -> str:
+    # <persona>-s<seed>-m<k>-c<k>-<stage>-<hash>
+    parts = custom_id.rsplit("-", 2)
+    return parts[1] if len(parts) == 3 else "unlabeled"
+
+
+def serve(job_dir, llm: Any = None) -> Dict[str, Any]:
+    """Answer every requests file that has no results file yet (Batch API output format)."""
+    from token_ledger import estimate_prompt_tokens, estimate_tokens, llm_stage
+
+    job_dir = Path(job_dir)
+    if llm is None:
+        from offline_llm import OfflineLLM
+
+        llm = OfflineLLM()
+    answered = 0
+    for n in _rounds(job_dir):
+        out_path = _results_path(job_dir, n)
+        if out_path.exists():
+            continue
+        out = []
+        for i, req in enumerate(_read_jsonl(_requests_path(job_dir, n)), 1):
+            body = req["body"]
+            # the stage label picks the simulator's response shape; a real provider ignores it
+            with llm_stage(_stage_of(req["custom_id"])):
+                text = llm.generate(messages=body["messages"], temperature=body.get("temperature", 0.7),
+                                    response_format=body.get("response_format"))
+            text = text.get("text", "") if isinstance(text, dict) else text
+            prompt_tokens, completion_tokens = estimate_prompt_tokens(body["messages"]), estimate_tokens(text)
+            out.append({
+                "id": f"batch_req_r{n}_{i}",
+                "custom_id": req["custom_id"],
+                "response": {
+                    "status_code": 200,
+                    "request_id": f"local-r{n}-{i}",
+                    "body": {
+                        "object": "chat.completion",
+                        "model": body.get("model", DEFAULT_MODEL),
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                                  "total_tokens": prompt_tokens + completion_tokens},
+                    },
+                },
+                "error": None,
+            })
+        _write_jsonl(out_path, out)
+        answered += len(out)
+    return {"answered": answered}
+
+
+def run(job_dir, llm: Any = None, max_rounds: int = DEFAULT_MAX_ROUNDS) -> Dict[str, Any]:
+    """step / serve until the job is done (local provider)."""
+    while True:
+        res = step(job_dir, max_rounds=max_rounds)
+        print(f"[batch_jobs] {json.dumps(res, ensure_ascii=False)}", file=sys.stderr)
+        if res["status"] == "done":
+            return res
+        serve(job_dir, llm=llm)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    sys.path.insert(0, str(BASE_DIR))
+    ap = argparse.ArgumentParser(description="Two-phase batch LLM jobs (emit requests / ingest results).")
+    ap.add_argument("command", choices=("step", "serve", "run"))
+    ap.add_argument("--job", required=True, help="job directory")
+    ap.add_argument("--personas", type=int, default=0, help="create the job for the first N personas")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--topk", type=int, default=3)
+    ap.add_argument("--prompt-mode", default=None)
+    ap.add_argument("--output", default=None, help="narrator output mode (text/json)")
+    ap.add_argument("--llm", choices=("offline", "openai"), default="offline", help="serve: local provider backend")
+    ap.add_argument("--max-rounds", type=int, default=DEFAULT_MAX_ROUNDS)
+    from pipeline_profile import add_profile_args, profiler_from_args
+
+    add_profile_args(ap)
+    args = ap.parse_args()
+
+    if args.personas:
+        create_job(args.job, _persona_ids(args.personas), args.seed, args.topk, args.prompt_mode, args.output)
+
+    provider = None
+    if args.llm == "openai":
+        from openai_client import OpenAIChatCompletionClient
+
+        provider = OpenAIChatCompletionClient()
+
+    if args.command != "serve":
+        from shared_catalog import ensure_artifacts
+
+        ensure_artifacts()
+
+    profiler = profiler_from_args(args)
+    with profiler if profiler is not None else contextlib.nullcontext():
+        if args.command == "step":
+            out = step(args.job, max_rounds=args.max_rounds)
+        elif args.command == "serve":
+            out = serve(args.job, llm=provider)
+        else:
+            out = run(args.job, llm=provider, max_rounds=args.max_rounds)
+    print(json.dumps(out, ensure_ascii=False))
+    if profiler is not None:
+        profiler.report()
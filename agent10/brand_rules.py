@@ -1,5 +1,8 @@
-import pandas as pd
 from pathlib import Path
+import csv
+import hashlib
+import os
+import pickle
 import re
 import unicodedata
 
@@ -7,9 +10,29 @@ import unicodedata
 BASE_DIR = Path(__file__).resolve().parent        # agent10/
 ROOT_DIR = BASE_DIR.parent                        # project root
 DATA_DIR = ROOT_DIR / "data"                      # data/
+BUILD_DIR = DATA_DIR / "build"                    # data/build/ (컴파일 산출물, git 제외)
 
 RULES_CSV = DATA_DIR / "amore_brand_tone_rules.csv"
 
+# 컴파일 산출물 포맷 버전 (필드 구성이 바뀌면 올린다 → 기존 산출물 자동 무효화)
+RULES_ARTIFACT_VERSION = 2
+
+REQUIRED_COLUMNS = [
+    "brand",
+    "opening",
+    "product_link",
+    "routine",
+    "closing",
+    "banned",
+    "viewpoint",
+    "must_include",
+    "avoid",
+    "style_note",
+]
+
+# 콤마 문자열 → 사전 분리된 키워드 튜플로 컴파일하는 필드
+KEYWORD_FIELDS = ["banned", "must_include", "viewpoint", "avoid"]
+
 # -------------------------------------------------
 # 핵심: brand 문자열 정규화 (CSV/row 양쪽에서 "완전히 동일"하게 맞추기)
 # - strip()만으로 안 잡히는 유니코드 공백/제로폭/nbps 등 제거
@@ -36,64 +59,190 @@ def normalize_brand(v) -> str:
     s = re.sub(r"\s+", " ", s)
     return s
 
-def load_brand_rules(csv_path=RULES_CSV) -> dict:
-    """
-    브랜드 톤 앤 매너 규칙 CSV 파일을 로드합니다.
-    입력값 csv_path는 Path 객체일 수도 있고, 문자열(str)일 수도 있습니다.
-    """
+def split_keywords(text) -> tuple:
+    """콤마 구분 키워드 문자열 → 공백 제거된 키워드 튜플 (빈 값/NaN 제외)."""
+    if isinstance(text, (list, tuple)):
+        return tuple(str(t).strip() for t in text if str(t).strip())
+    if not isinstance(text, str) or text.strip().lower() == "nan":
+        return tuple()
+    return tuple(t.strip() for t in text.split(",") if t.strip())
 
-    # 입력값이 문자열(str)이면 Path 객체로 변환합니다.
-    if isinstance(csv_path, str):
-        csv_path = Path(csv_path)
 
-    if not csv_path.exists():
-        raise FileNotFoundError(f"[brand_rules] CSV 파일을 찾을 수 없습니다: {csv_path}")
+# (path, mtime_ns, size) -> sha256: 매 호출마다 CSV 전체를 다시 해시하지 않도록
+_HASH_CACHE = {}
+
+
+def _csv_sha256(csv_path: Path) -> str:
+    st = csv_path.stat()
+    key = (str(csv_path), st.st_mtime_ns, st.st_size)
+    cached = _HASH_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    h = hashlib.sha256()
+    with csv_path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    _HASH_CACHE[key] = h.hexdigest()
+    return _HASH_CACHE[key]
+
+
+def rules_artifact_path(csv_path=RULES_CSV, build_dir=BUILD_DIR, csv_hash: str = "") -> Path:
+    """CSV 해시로 키잉된 컴파일 산출물 경로. CSV가 바뀌면 경로도 바뀐다."""
+    csv_path = Path(csv_path)
+    csv_hash = csv_hash or _csv_sha256(csv_path)
+    return Path(build_dir) / f"{csv_path.stem}.v{RULES_ARTIFACT_VERSION}.{csv_hash[:16]}.pkl"
+
 
-    # CSV 로드
-    df = pd.read_csv(csv_path)
-
-    # 필수 컬럼 체크
-    required = [
-        "brand",
-        "opening",
-        "product_link",
-        "routine",
-        "closing",
-        "banned",
-        "viewpoint",
-        "must_include",
-        "avoid",
-        "style_note",
-    ]
-
-    # 혹시 모를 컬럼명 공백 제거
-    df.columns = [str(c).strip() for c in df.columns]
-
-    missing = [c for c in required if c not in df.columns]
+def _read_rule_rows(csv_path: Path) -> list:
+    from data_build import read_records
+
+    # columnar build (data_build.py) when it is fresh, CSV otherwise
+    rows = read_records(csv_path, strip=False)
+    # 혹시 모를 컬럼명 공백 제거 (read_records 가 헤더를 trim)
+    fieldnames = list(rows[0].keys()) if rows else _csv_header(csv_path)
+    missing = [c for c in REQUIRED_COLUMNS if c not in fieldnames]
     if missing:
         raise RuntimeError(
-            f"[brand_rules] CSV에 필수 컬럼이 누락되었습니다: {missing}\n현재 컬럼: {list(df.columns)}"
+            f"[brand_rules] CSV에 필수 컬럼이 누락되었습니다: {missing}\n현재 컬럼: {fieldnames}"
         )
+    return rows
+
+
+def _csv_header(csv_path: Path) -> list:
+    with csv_path.open("r", encoding="utf-8-sig", newline="") as f:
+        return [str(c).strip() for c in (next(csv.reader(f), []))]
 
+
+def compile_rule_rows(rows: list, csv_hash: str = "") -> dict:
+    """
+    CSV row(dict) 리스트 → 컴파일된 규칙 산출물.
+    각 규칙 dict는 기존 필드를 그대로 유지하고 아래 필드를 추가로 가진다.
+      - rule_id: CSV 내 row 순번
+      - prompt_block: 미리 렌더링된 <BrandRule> 프롬프트 블록
+      - {banned,must_include,viewpoint,avoid}_keywords: 사전 분리된 키워드 튜플
+    브랜드별 키워드 매처(Aho-Corasick)도 함께 빌드한다.
+    """
     rules = {}
-    for _, row in df.iterrows():
+    for rule_id, row in enumerate(rows):
         # ✅ brand key 정규화
         brand_key = normalize_brand(row.get("brand", ""))
 
-        # 데이터프레임의 NaN(빈 값)을 빈 문자열("")로 변환하여 딕셔너리로 저장
-        row_dict = row.fillna("").to_dict()
-
-        # ✅ row_dict 내부 brand도 정규화해서 통일
-        row_dict["brand"] = brand_key
-
         # brand가 비어있으면 스킵(의도치 않은 빈 행 방어)
         if not brand_key:
             continue
 
+        # NaN/None → "" 로 통일하고, row_dict 내부 brand도 정규화해서 통일
+        row_dict = {k: ("" if v is None or str(v).lower() == "nan" else v) for k, v in row.items()}
+        row_dict["brand"] = brand_key
+        row_dict["rule_id"] = rule_id
+        for field in KEYWORD_FIELDS:
+            row_dict[f"{field}_keywords"] = split_keywords(row_dict.get(field, ""))
+        row_dict["prompt_block"] = _render_brand_rule_block(row_dict)
+
         # 기존 구조 유지: brand -> [rule_rows...]
         rules.setdefault(brand_key, []).append(row_dict)
 
-    return rules
+    from keyword_automaton import build_brand_matchers, build_rule_set_matcher
+
+    return {
+        "version": RULES_ARTIFACT_VERSION,
+        "csv_sha256": csv_hash,
+        "rules": rules,
+        # brand -> BrandRuleMatcher (banned/must_include/viewpoint 전체를 담은 Aho-Corasick)
+        "matchers": build_brand_matchers(rules),
+        # 전체 규칙(rule_id 기준)을 한 번에 검사하는 매처 (아카이브 감사용)
+        "rule_set_matcher": build_rule_set_matcher(rules),
+    }
+
+
+def compile_brand_rules(csv_path=RULES_CSV, build_dir=BUILD_DIR) -> Path:
+    """
+    CSV → 바이너리(pickle) 규칙 산출물 컴파일. 산출물 경로를 반환한다.
+    같은 해시의 산출물이 이미 있으면 그대로 재사용한다.
+    """
+    csv_path = Path(csv_path)
+    if not csv_path.exists():
+        raise FileNotFoundError(f"[brand_rules] CSV 파일을 찾을 수 없습니다: {csv_path}")
+
+    csv_hash = _csv_sha256(csv_path)
+    out = rules_artifact_path(csv_path, build_dir, csv_hash)
+    if out.exists():
+        return out
+
+    artifact = compile_rule_rows(_read_rule_rows(csv_path), csv_hash)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix(f".tmp{os.getpid()}")
+    with tmp.open("wb") as f:
+        pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, out)
+    return out
+
+
+# 프로세스 내 캐시: csv 해시 -> 컴파일된 산출물
+_ARTIFACT_CACHE = {}
+
+
+def load_compiled_brand_rules(csv_path=RULES_CSV, build_dir=BUILD_DIR) -> dict:
+    """
+    컴파일된 규칙 산출물 로드 (프로세스 캐시 → pickle 1회 역직렬화 → 필요 시 컴파일).
+    build 디렉터리에 쓸 수 없는 환경에서는 메모리 상에서만 컴파일한다.
+    """
+    csv_path = Path(csv_path)
+    if not csv_path.exists():
+        raise FileNotFoundError(f"[brand_rules] CSV 파일을 찾을 수 없습니다: {csv_path}")
+
+    csv_hash = _csv_sha256(csv_path)
+    cached = _ARTIFACT_CACHE.get(csv_hash)
+    if cached is not None:
+        return cached
+
+    artifact = None
+    path = rules_artifact_path(csv_path, build_dir, csv_hash)
+    try:
+        if not path.exists():
+            path = compile_brand_rules(csv_path, build_dir)
+        with path.open("rb") as f:
+            artifact = pickle.load(f)
+        if artifact.get("version") != RULES_ARTIFACT_VERSION or artifact.get("csv_sha256") != csv_hash:
+            artifact = None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        # ImportError: a pickled matcher class moved / renamed (e.g. keyword_automaton)
+        artifact = None
+
+    if artifact is None:
+        artifact = compile_rule_rows(_read_rule_rows(csv_path), csv_hash)
+
+    _ARTIFACT_CACHE[csv_hash] = artifact
+    return artifact
+
+
+def load_brand_rules(csv_path=RULES_CSV) -> dict:
+    """
+    브랜드 톤 앤 매너 규칙을 로드합니다. (brand -> [rule_dict, ...])
+    입력값 csv_path는 Path 객체일 수도 있고, 문자열(str)일 수도 있습니다.
+    CSV 해시로 키잉된 컴파일 산출물(data/build/*.pkl)을 우선 사용합니다.
+    """
+
+    # 입력값이 문자열(str)이면 Path 객체로 변환합니다.
+    if isinstance(csv_path, str):
+        csv_path = Path(csv_path)
+
+    return load_compiled_brand_rules(csv_path)["rules"]
+
+def get_brand_matcher(brand, csv_path=RULES_CSV):
+    """컴파일 산출물에 포함된 브랜드별 키워드 매처 (없으면 None)."""
+    try:
+        artifact = load_compiled_brand_rules(csv_path)
+    except FileNotFoundError:
+        return None
+    return artifact.get("matchers", {}).get(normalize_brand(brand))
+
+
+def get_rule_set_matcher(csv_path=RULES_CSV):
+    """전체 규칙 row를 담은 단일 매처 (rule_id -> errors 를 한 번의 스캔으로 계산)."""
+    return load_compiled_brand_rules(csv_path).get("rule_set_matcher")
+
 
 def build_brand_rule_block(rule_dict: dict) -> str:
     """
@@ -112,6 +261,15 @@ def build_brand_rule_block(rule_dict: dict) -> str:
             return ""
         rule_dict = rule_dict[0]
 
+    # 컴파일된 규칙이면 미리 렌더링된 블록을 그대로 사용
+    pre = rule_dict.get("prompt_block")
+    if pre:
+        return pre
+
+    return _render_brand_rule_block(rule_dict)
+
+
+def _render_brand_rule_block(rule_dict: dict) -> str:
     # brand 값도 정규화(혹시 외부에서 들어온 dict가 정규화 안 됐을 때)
     brand = normalize_brand(rule_dict.get("brand", "Unknown"))
 
@@ -156,7 +314,8 @@ def build_brand_rule_block(rule_dict: dict) -> str:
 if __name__ == "__main__":
     # 테스트 실행 코드 (sanity check)
     try:
-        print("[brand_rules] Loading rules...")
+        print("[brand_rules] Compiling rules...")
+        print(f"[brand_rules] artifact: {compile_brand_rules()}")
         rules = load_brand_rules()
         print(f"[brand_rules] loaded brands: {list(rules.keys())}")
 
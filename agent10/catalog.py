@@ -0,0 +1,226 @@
+# agent10/catalog.py
+# Column-projected product catalog loader.
+#
+# pd.read_csv(PRODUCT_CSV_PATH) materialized every column as object dtype, including
+# the full 전성분 lists and URLs that only a few consumers read. load_catalog():
+#   - parses only the columns selection needs (name, brand, category, subcategory,
+#     price/volume and score columns when present)
+#   - stores the low-cardinality columns (brand, category, subcategory, unit) as
+#     pandas categoricals
+#   - defers the heavy text columns (전성분, URL): they are listed in .columns but
+#     parsed on first access (catalog["전성분"]) and cached on the Catalog
+# Catalog duck-types the small DataFrame surface the selector / product index use
+# (len / empty / columns / catalog[col].tolist()); .frame is the eager DataFrame.
+#
+# Benchmark (synthetic catalog = the real one repeated N times, fresh process each):
+#   python agent10/catalog.py --bench 100
+
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from agent_logging import get_logger
+
+log = get_logger("catalog")
+
+BASE_DIR = Path(__file__).resolve().parent
+CATALOG_CSV = BASE_DIR.parent / "data" / "amore_with_category.csv"
+
+# parsed eagerly (when present in the file)
+CORE_COLUMNS = (
+    "상품명", "brand", "category", "subcategory",
+    "price_original", "용량_raw", "용량_value", "용량_unit",
+    "benefit_score", "identity_score",
+)
+CATEGORICAL_COLUMNS = ("brand", "category", "subcategory", "용량_unit")
+# parsed on first access
+LAZY_COLUMNS = ("전성분", "URL")
+
+
+def _header(path: Path) -> List[str]:
+    import csv
+
+    with path.open("r", encoding="utf-8-sig", newline="") as f:
+        return [(h or "").strip() for h in next(csv.reader(f), [])]
+
+
+class Catalog:
+    """Projected catalog: eager core columns + lazily parsed text columns."""
+
+    def __init__(self, path: Path, frame: Any, lazy: Sequence[str], all_columns: Sequence[str]):
+        self.path = Path(path)
+        self.frame = frame
+        self.lazy = tuple(lazy)
+        # file column order, restricted to what this catalog can serve
+        self.columns: List[str] = [c for c in all_columns if c in frame.columns or c in self.lazy]
+        self._loaded: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.frame) == 0
+
+    def __contains__(self, col: str) -> bool:
+        return col in self.columns
+
+    def __getitem__(self, col: str):
+        if col in self.frame.columns:
+            return self.frame[col]
+        if col not in self.lazy:
+            raise KeyError(col)
+        s = self._loaded.get(col)
+        if s is None:
+            s = self._loaded[col] = self._read_column(col)
+        return s
+
+    def is_loaded(self, col: str) -> bool:
+        return col in self.frame.columns or col in self._loaded
+
+    def _read_column(self, col: str):
+        import pandas as pd
+
+        from data_build import columnar_path
+
+        t0 = time.perf_counter()
+        pq = columnar_path(self.path)
+        if pq is not None:
+            s = pd.read_parquet(pq, columns=[col])[col]
+        else:
+            s = pd.read_csv(self.path, usecols=[col], encoding="utf-8-sig")[col]
+        if len(s) != len(self.frame):
+            raise ValueError(f"{self.path}: column {col} has {len(s)} rows, catalog has {len(self.frame)}")
+        s.index = self.frame.index
+        log.info("lazy column %s loaded (%.3fs)", col, time.perf_counter() - t0)
+        return s
+
+    def text(self, col: str, row: int) -> str:
+        """One lazy/eager text value ("" for missing)."""
+        import pandas as pd
+
+        v = self[col].iloc[row]
+        return "" if pd.isna(v) else str(v)
+
+
+def load_catalog(
+    path=CATALOG_CSV,
+    columns: Optional[Sequence[str]] = None,
+    lazy: Sequence[str] = LAZY_COLUMNS,
+) -> Catalog:
+    """Parse the projected columns of a catalog CSV (cached per file stat + projection)."""
+    import pandas as pd
+
+    from data_build import columnar_path, load_manifest
+
+    path = Path(path)
+    st = path.stat()
+    # fresh columnar build (data_build.py): projected Parquet read instead of a CSV parse
+    pq = columnar_path(path)
+    header = list(load_manifest()["files"][path.name]["columns"]) if pq is not None else _header(path)
+    wanted = [c for c in (columns or CORE_COLUMNS) if c in header and c not in lazy]
+    key = (str(path), st.st_mtime_ns, st.st_size, str(pq), tuple(wanted), tuple(lazy))
+    hit = _CATALOG_CACHE.get(key[0])
+    if hit is not None and hit[0] == key:
+        return hit[1]
+
+    dtype = {c: "category" for c in CATEGORICAL_COLUMNS if c in wanted}
+    if pq is not None:
+        frame = pd.read_parquet(pq, columns=wanted).astype(dtype)
+    else:
+        frame = pd.read_csv(path, usecols=wanted, dtype=dtype, encoding="utf-8-sig")[wanted]
+
+    cat = Catalog(path, frame, [c for c in lazy if c in header], header)
+    _CATALOG_CACHE[key[0]] = (key, cat)
+    return cat
+
+
+# path -> (cache key, Catalog)
+_CATALOG_CACHE: Dict[str, Tuple[tuple, Catalog]] = {}
+
+
+# ---------------------------------------------------------------------------
+# benchmark
+# ---------------------------------------------------------------------------
+def _rss_anon_mb() -> float:
+    try:
+        for line in open("/proc/self/status"):
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _bench_child(mode: str, path: str) -> Dict[str, float]:
+    import pandas as pd  # noqa: F401  (import cost excluded from the measurement)
+
+    before = _rss_anon_mb()
+    t0 = time.perf_counter()
+    if mode == "read_csv":
+        df = pd.read_csv(path)
+        n = len(df)
+    else:
+        df = load_catalog(path)
+        n = len(df)
+        if mode == "catalog+ingredients":
+            df["전성분"]
+    return {"mode": mode, "rows": n, "sec": round(time.perf_counter() - t0, 3), "rss_mb": round(_rss_anon_mb() - before, 1)}
+
+
+def make_synthetic_catalog(src: Path, dst: Path, times: int) -> Path:
+    """src repeated `times` times (product names suffixed so they stay unique)."""
+    import pandas as pd
+
+    df = pd.read_csv(src)
+    parts = []
+    for i in range(times):
+        d = df.copy()
+        d["상품명"] = d["상품명"].astype(str) + f" #{i}"
+        parts.append(d)
+    pd.concat(parts, ignore_index=True).to_csv(dst, index=False, encoding="utf-8-sig")
+    return dst
+
+
+def run_benchmark(times: int, src=CATALOG_CSV) -> List[Dict[str, float]]:
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_synthetic_catalog(Path(src), Path(tmp) / f"catalog_x{times}.csv", times)
+        size_mb = path.stat().st_size / (1 << 20)
+        out = []
+        for mode in ("read_csv", "catalog", "catalog+ingredients"):
+            res = subprocess.run(
+                [sys.executable, __file__, "--bench-child", mode, str(path)],
+                capture_output=True, text=True, check=True,
+            )
+            r = json.loads(res.stdout.strip().splitlines()[-1])
+            r["csv_mb"] = round(size_mb, 1)
+            out.append(r)
+    return out
+
+
+if __name__ == "__main__":
+    import argparse
+
+    sys.path.insert(0, str(BASE_DIR))
+    ap = argparse.ArgumentParser(description="Projected catalog loader / benchmark.")
+    ap.add_argument("--bench", type=int, default=0, help="benchmark on the catalog repeated N times")
+    ap.add_argument("--bench-child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.bench_child:
+        print(json.dumps(_bench_child(*args.bench_child)))
+    elif args.bench:
+        for r in run_benchmark(args.bench):
+            print(f"[catalog] x{args.bench} {r['mode']:<20} rows={r['rows']} csv={r['csv_mb']}MB "
+                  f"time={r['sec']}s rss=+{r['rss_mb']}MB")
+    else:
+        cat = load_catalog()
+        print(f"[catalog] {cat.path} rows={len(cat)} eager={list(cat.frame.columns)} lazy={list(cat.lazy)}")
+        print(cat.frame.dtypes.to_string())
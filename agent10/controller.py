@@ -1,53 +1,8 @@
-# -------------------------------------------------
-# Persona-level brand rule filtering (post brand-sample)
-# -------------------------------------------------
-def _apply_persona_brand_rules(persona_id: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """
-    Persona-level brand filtering / deprioritization.
-    This function must NOT invent brands.
-    It only filters or reorders existing rows.
-    """
-    if not rows:
-        return rows
-
-    # Persona-specific hard rules (minimal, explicit)
-    EXCLUDE_BRANDS_BY_PERSONA = {
-        "persona_6": ["설화수", "헤라"],          # 가성비 → 초고가 제외
-        "persona_2": ["헤라"],                    # 민감 → 향 중심 브랜드 제외
-        "persona_8": ["설화수"],                  # 남성 간편 → 프리미엄 스킵
-    }
-
-    DEPRIORITIZE_BRANDS_BY_PERSONA = {
-        "persona_4": ["설화수"],                  # 트러블 → 고영양 후순위
-    }
-
-    pid = str(persona_id)
-
-    # 1) hard exclude
-    banned = set(EXCLUDE_BRANDS_BY_PERSONA.get(pid, []))
-    if banned:
-        rows = [r for r in rows if str(r.get("brand")) not in banned]
-
-    if not rows:
-        return rows
-
-    # 2) soft deprioritize (stable sort)
-    deprioritized = set(DEPRIORITIZE_BRANDS_BY_PERSONA.get(pid, []))
-
-    def _rank(r):
-        b = str(r.get("brand"))
-        return (1 if b in deprioritized else 0)
-
-    rows = sorted(rows, key=_rank)
-    return rows
 import os
 import time
 import sys
-import csv
 import re
 from pathlib import Path
-import pandas as pd
-import numpy as np
 from typing import Any, Dict, List
 
 CURRENT_DIR = Path(__file__).resolve().parent
@@ -68,8 +23,18 @@ from verifier import MessageVerifier, verify_brand_rules
 from tone_profiles import ToneProfiles
 from market_context_tool import MarketContextTool
 from brand_rules import load_brand_rules
+from product_index import load_product_index
+from shared_catalog import attached_catalog
+from catalog import load_catalog
+from token_ledger import MeteredLLM, TokenLedger, begin_message_budget, end_message_budget
 
 
+# Checks run on the primary (i == 1) row: MessageVerifier.validate plus
+# verifier.verify_brand_rules (non-destructive stub, adds no errors). Stored with every
+# result ("check_set", "checked") so reaudit.py replays exactly these checks; bump the
+# version when either changes.
+CHECK_SET = "validate.v1"
+
 # -------------------------------------------------
 # helpers
 # -------------------------------------------------
@@ -294,55 +259,83 @@ def _choose_brand_rule(brand_rule_list, i: int):
 
 
 # -------------------------------------------------
-# product fallback (raw csv, no pandas)
+# Persona-level brand rule filtering (post brand-sample)
 # -------------------------------------------------
-_PRODUCT_NAME_CACHE = None
+def _apply_persona_brand_rules(persona_id: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Persona-level brand filtering / deprioritization.
+    This function must NOT invent brands.
+    It only filters or reorders existing rows.
+    """
+    if not rows:
+        return rows
 
+    # Persona-specific hard rules (minimal, explicit)
+    EXCLUDE_BRANDS_BY_PERSONA = {
+        "persona_6": ["설화수", "헤라"],          # 가성비 → 초고가 제외
+        "persona_2": ["헤라"],                    # 민감 → 향 중심 브랜드 제외
+        "persona_8": ["설화수"],                  # 남성 간편 → 프리미엄 스킵
+    }
 
-def _load_product_name_cache():
-    global _PRODUCT_NAME_CACHE
-    if _PRODUCT_NAME_CACHE is not None:
-        return _PRODUCT_NAME_CACHE
+    DEPRIORITIZE_BRANDS_BY_PERSONA = {
+        "persona_4": ["설화수"],                  # 트러블 → 고영양 후순위
+    }
+
+    pid = str(persona_id)
+
+    # 1) hard exclude
+    banned = set(EXCLUDE_BRANDS_BY_PERSONA.get(pid, []))
+    if banned:
+        rows = [r for r in rows if str(r.get("brand")) not in banned]
+
+    if not rows:
+        return rows
+
+    # 2) soft deprioritize (stable sort)
+    deprioritized = set(DEPRIORITIZE_BRANDS_BY_PERSONA.get(pid, []))
+
+    def _rank(r):
+        b = str(r.get("brand"))
+        return (1 if b in deprioritized else 0)
 
-    names = []
+    rows = sorted(rows, key=_rank)
+    return rows
+
+
+# -------------------------------------------------
+# product fallback (shared product index, no pandas)
+# -------------------------------------------------
+def _load_product_name_cache():
+    # shared product index (product_index.py): built once per catalog file, catalog order
     try:
-        if PRODUCT_CSV_PATH.exists():
-            with PRODUCT_CSV_PATH.open("r", encoding="utf-8-sig", newline="") as f:
-                reader = csv.DictReader(f)
-                if not reader.fieldnames:
-                    _PRODUCT_NAME_CACHE = []
-                    return _PRODUCT_NAME_CACHE
-
-                # normalize headers
-                field_map = {fn: (fn or "").strip() for fn in reader.fieldnames}
-
-                # find "상품명"
-                name_key = None
-                for k, v in field_map.items():
-                    if v == "상품명":
-                        name_key = k
-                        break
-
-                if not name_key:
-                    _PRODUCT_NAME_CACHE = []
-                    return _PRODUCT_NAME_CACHE
-
-                for row in reader:
-                    raw = row.get(name_key, "")
-                    nm = (raw or "").strip()
-                    if nm and nm.lower() != "nan":
-                        names.append(nm)
+        return load_product_index(PRODUCT_CSV_PATH).names
     except Exception:
-        names = []
+        return []
 
-    _PRODUCT_NAME_CACHE = names
-    return _PRODUCT_NAME_CACHE
 
+def _global_product_fallback(avoid_list=None) -> str:
+    """
+    First catalog product (selector failed). With an ingredient_avoid_list only a
+    product known to contain none of them; "" when that cannot be checked.
+    """
+    from ingredient_index import parse_avoid_list
+
+    if not parse_avoid_list(avoid_list):
+        for nm in _load_product_name_cache():
+            s = nm.strip()
+            if s and s.lower() != "nan":
+                return s
+        return ""
+    try:
+        from ingredient_index import IngredientIndex, iter_bits
 
-def _global_product_fallback() -> str:
-    names = _load_product_name_cache()
-    for nm in names:
-        s = nm.strip()
+        index = load_product_index(PRODUCT_CSV_PATH)
+        ingredients = IngredientIndex.from_product_index(index, load_catalog(PRODUCT_CSV_PATH)["전성분"].tolist())
+        avoid_bits = ingredients.avoid_bits(avoid_list)
+    except Exception:
+        return ""
+    for pid in iter_bits(((1 << len(index.entries)) - 1) & ~avoid_bits):
+        s = index.entries[pid].name.strip()
         if s and s.lower() != "nan":
             return s
     return ""
@@ -352,20 +345,40 @@ def _global_product_fallback() -> str:
 # -------------------------------------------------
 # main
 # -------------------------------------------------
-def main(persona_id, topk=3, use_market_context=False, verbose=True):
+def main(persona_id, topk=3, use_market_context=False, verbose=True, seed=None, run_stats=None,
+         llm=None, prompt_mode=None, output_mode=None):
+    """
+    seed: request seed. Every sampling site (brand re-sample, per-row product pick)
+          draws from its own stream derived from it, and it is recorded in each
+          result so a run can be reproduced exactly. None -> fresh random seed.
+    run_stats: optional dict filled with the run's timing and LLM token ledger
+          (run_stats["tokens"]: per stage / brand / persona prompt+completion tokens).
+    llm: chat client to use instead of OpenAIChatCompletionClient (e.g. offline_llm.OfflineLLM)
+    prompt_mode: "full" | "compact" narrator/planner prompts (None -> AGENT10_PROMPT_MODE)
+    output_mode: "text" | "json" narrator output (json: title + 4 slots in one call;
+          None -> AGENT10_NARRATOR_OUTPUT)
+    """
     t0 = time.time()
 
+    # Heavy numeric deps are imported on first request, not at module import,
+    # so short-lived invocations don't pay for them before doing any work.
+    from sampler import brand_key, cap_scores, derive_rng, gumbel_top_k, make_seed
+
+    seed = make_seed() if seed is None else int(seed)
+
     if verbose:
         print("[controller] START")
         print("[controller] OPENAI_OFFLINE:", os.getenv("OPENAI_OFFLINE", "0"))
         print(f"[controller] DATA_DIR: {DATA_DIR}")
+        print(f"[controller] seed: {seed}")
 
     # 1) rules/tools
     brand_rules = load_brand_rules(RULES_PATH)
     if verbose:
         print("[controller] loaded brand rules:", list(brand_rules.keys()))
 
-    llm = OpenAIChatCompletionClient()
+    if llm is None:
+        llm = OpenAIChatCompletionClient()
     # --- LLM compatibility patch (keep logic; only adapt call shape) ---
     if not hasattr(llm, "generate"):
         if hasattr(llm, "invoke"):
@@ -396,15 +409,22 @@ def main(persona_id, topk=3, use_market_context=False, verbose=True):
         else:
             raise AttributeError("OpenAIChatCompletionClient has no callable interface")
     # ---------------------------------------------------
+    # token accounting: every generate() is recorded per stage (plan/body/title/...)
+    ledger = TokenLedger()
+    llm = MeteredLLM(llm, ledger, persona=persona_id)
     loader = CRMLoader()
     tones = ToneProfiles(DATA_DIR)
     verifier = MessageVerifier()
     # --- FIX: explicit product dataframe injection ---
-    product_df = None
+    product_df = attached_catalog(PRODUCT_CSV_PATH)
     try:
-        if PRODUCT_CSV_PATH.exists():
+        if product_df is not None:
+            # pool worker: memory-mapped catalog attached once by the initializer
+            print(f"[controller] Using shared catalog: {product_df.path} rows={len(product_df)}")
+        elif PRODUCT_CSV_PATH.exists():
+            # projected columns + categoricals; 전성분 / URL parsed only if someone reads them
             print(f"[controller] Loading product CSV: {PRODUCT_CSV_PATH}")
-            product_df = pd.read_csv(PRODUCT_CSV_PATH)
+            product_df = load_catalog(PRODUCT_CSV_PATH)
             print(f"[controller] Product CSV loaded rows={len(product_df)}")
         else:
             print(f"[controller] WARN: product CSV not found: {PRODUCT_CSV_PATH}")
@@ -433,9 +453,7 @@ def main(persona_id, topk=3, use_market_context=False, verbose=True):
         "메이크온": 0.32,
     }
     SOFTMAX_TEMPERATURE = 1.7
-
-    def _brand_key(v: Any) -> str:
-        return str(v).strip().replace("\u200b", "").replace("\ufeff", "").replace(" ", "") if v is not None else ""
+    rng = derive_rng(seed, "brand_resample")
 
     def _get_score(r: Dict[str, Any]) -> float:
         # prefer explicit score fields if present
@@ -447,23 +465,6 @@ def main(persona_id, topk=3, use_market_context=False, verbose=True):
         except Exception:
             return 0.0
 
-    def _cap_score(brand: str, score: float) -> float:
-        b = _brand_key(brand)
-        cap = BRAND_CAP.get(b)
-        return float(min(score, cap)) if cap is not None else float(score)
-
-    def _softmax_probs(vals: List[float], temperature: float) -> List[float]:
-        if not vals:
-            return []
-        t = float(temperature) if float(temperature) > 0 else 1.0
-        x = np.array([float(v) for v in vals], dtype=np.float64) / t
-        x = x - np.max(x)
-        ex = np.exp(x)
-        s = float(np.sum(ex))
-        if s <= 0.0 or not np.isfinite(s):
-            return [1.0 / len(vals)] * len(vals)
-        return [float(p) for p in (ex / s).tolist()]
-
     if isinstance(rows, list) and rows:
         # 1) group by brand, keep only the top-scoring row per brand
         brand_best: Dict[str, Dict[str, Any]] = {}
@@ -472,7 +473,7 @@ def main(persona_id, topk=3, use_market_context=False, verbose=True):
             if not isinstance(r, dict):
                 continue
             b_raw = r.get("brand", "")
-            b = _brand_key(b_raw)
+            b = brand_key(b_raw)
             sc = _get_score(r)
             if (b not in brand_best_score) or (sc > brand_best_score[b]):
                 brand_best[b] = r
@@ -481,30 +482,13 @@ def main(persona_id, topk=3, use_market_context=False, verbose=True):
         brands = list(brand_best.keys())
         if brands:
             # 2) cap + softmax sampling over brand representative scores
-            capped_scores = [_cap_score(br, brand_best_score.get(br, 0.0)) for br in brands]
-            probs = _softmax_probs(capped_scores, SOFTMAX_TEMPERATURE)
+            #    (Gumbel-top-k: sampling without replacement in one vectorized call)
+            capped_scores = cap_scores([brand_best_score.get(br, 0.0) for br in brands], brands, BRAND_CAP)
 
             k = int(topk) if isinstance(topk, int) and topk > 0 else 3
             k = min(k, len(brands))
 
-            # sample without replacement
-            chosen_idxs: List[int] = []
-            available = list(range(len(brands)))
-            p = np.array(probs, dtype=np.float64)
-
-            for _ in range(k):
-                if len(available) == 1:
-                    chosen_idxs.append(available[0])
-                    break
-                p_rem = p[available]
-                s_rem = float(np.sum(p_rem))
-                if s_rem <= 0.0 or not np.isfinite(s_rem):
-                    idx = int(np.random.choice(available))
-                else:
-                    p_rem = p_rem / s_rem
-                    idx = int(np.random.choice(available, p=p_rem))
-                chosen_idxs.append(idx)
-                available.remove(idx)
+            chosen_idxs = [int(j) for j in gumbel_top_k(capped_scores, k, SOFTMAX_TEMPERATURE, rng=rng) if j >= 0]
 
             chosen_brands = [brands[i] for i in chosen_idxs]
             rows = [brand_best[b] for b in chosen_brands]
@@ -520,7 +504,8 @@ def main(persona_id, topk=3, use_market_context=False, verbose=True):
     if verbose:
         print("[controller] persona-brand-filter ->", [(r.get("brand"), r.get("score")) for r in rows])
     # ------------------------------------------------------------------
-    tone_map = tones.load_tone_profile_map()
+    # cached brand -> cluster -> tone index (mapping-compatible with the old tone_profile_map)
+    tone_map = tones.tone_index()
 
     # ✅ 입력 결손 보정은 "여기서" 고정 (planner/narrator/verifier 공통 입력)
     for r in rows:
@@ -542,18 +527,22 @@ def main(persona_id, topk=3, use_market_context=False, verbose=True):
         r["routine_phrase"] = rp
         r["slot2_hints"] = [rp] if rp else []
 
-    planner = ReActReasoningAgent(llm, tone_map)
-    narrator = StrategyNarrator(llm, tone_profile_map=tone_map)
+    planner = ReActReasoningAgent(llm, tone_map, prompt_mode=prompt_mode)
+    narrator = StrategyNarrator(llm, tone_profile_map=tone_map, prompt_mode=prompt_mode, output_mode=output_mode)
 
     results = []
 
     # 3) loop
     for i, row in enumerate(rows, 1):
+        # per-message LLM call budget (planner + narrator); call sites fall back
+        # deterministically once it is spent, the count is recorded with the result
+        budget = begin_message_budget()
         if verbose:
             print(f"[controller] row {i}/{len(rows)} select product")
 
         raw_brand = row.get("brand", "")
         brand = normalize_brand(raw_brand)
+        llm.labels["brand"] = brand
 
         # brand rule pick
         brand_rule_list = brand_rules.get(brand)
@@ -582,7 +571,9 @@ def main(persona_id, topk=3, use_market_context=False, verbose=True):
                 product = selector.select_one(row=row) or {}
                 product_name = _s(product.get("상품명"))
             elif hasattr(selector, "select_product"):
-                chosen_name, chosen_score = selector.select_product(row=row, topk=topk)
+                chosen_name, chosen_score = selector.select_product(
+                    row=row, topk=topk, rng=derive_rng(seed, f"product_select:{i}:{brand}")
+                )
                 product_name = _s(chosen_name)
                 # Keep a dict-like product for downstream if needed
                 product = {"상품명": product_name, "_score": float(chosen_score)}
@@ -592,24 +583,37 @@ def main(persona_id, topk=3, use_market_context=False, verbose=True):
             product_err = f"product_selector_failed: {e}"
             product_name = ""
 
-        if _is_empty_product(product_name):
-            fb = _global_product_fallback()
+        # the selector found nothing the persona may use: no product, never another brand's
+        # or an avoided one (the global fallback is only for a failed selector)
+        product_skip = getattr(selector, "last_skip", "") if not product_err else ""
+        if _is_empty_product(product_name) and not product_skip:
+            fb = _global_product_fallback(row.get("ingredient_avoid_list"))
             if not _is_empty_product(fb):
                 product_name = fb
 
         if _is_empty_product(product_name):
-            errs = ["product_missing(hard_block)"]
+            errs = [f"product_missing({product_skip})" if product_skip else "product_missing(hard_block)"]
             if product_err:
                 errs.insert(0, product_err)
             results.append({
                 "persona_id": row.get("persona_id"),
                 "brand": brand,
+                "seed": seed,
+                **budget.as_dict(),
                 "message": "",
                 "errors": errs,
+                # pipeline errors, not check_set results: reaudit leaves them alone
+                "checked": False,
             })
             continue
 
         row["상품명"] = product_name
+        # product facets from the shared index (narrator branches on flags, no keyword scans)
+        entry = load_product_index(PRODUCT_CSV_PATH).lookup(product_name)
+        if entry is not None:
+            row["is_mask_pack"] = entry.is_mask_pack
+            row["is_device"] = entry.is_device
+            row["is_supplement"] = entry.is_supplement
         # brand_name_slot 결정: 제품 기준 노출 브랜드 분기
         product_anchor = row.get("상품명") or row.get("product_anchor", "")
 
@@ -641,15 +645,22 @@ def main(persona_id, topk=3, use_market_context=False, verbose=True):
             results.append({
                 "persona_id": row.get("persona_id"),
                 "brand": brand,
+                "seed": seed,
+                **budget.as_dict(),
                 "message": "",
                 "errors": ["plan_missing"],
+                # pipeline errors, not check_set results: reaudit leaves them alone
+                "checked": False,
             })
             continue
 
         # must include -> plan
         must_include = brand_rule.get("must_include", "")
         plan["brand_must_include_raw"] = str(must_include)
-        plan["brand_must_include"] = [w.strip() for w in str(must_include).split(",") if w.strip()]
+        must_kw = brand_rule.get("must_include_keywords")
+        if must_kw is None:
+            must_kw = [w.strip() for w in str(must_include).split(",") if w.strip()]
+        plan["brand_must_include"] = list(must_kw)
 
         if verbose:
             print(f"[controller] row {i}/{len(rows)} generate")
@@ -688,6 +699,8 @@ def main(persona_id, topk=3, use_market_context=False, verbose=True):
         # (1) body_len>350 literal warning
         if len(clean_body) > 350:
             literal_warnings.append("body_len>350")
+        # warnings describe this body; the >350 cut below may shorten the stored one
+        warned_body = clean_body
 
         # (2) 옵션 B 컷 로직: verifier 실행 이전, warnings에 body_len>350 있을 때만 동작 (옵션 B)
         if i == 1 and "body_len>350" in literal_warnings:
@@ -755,15 +768,76 @@ def main(persona_id, topk=3, use_market_context=False, verbose=True):
         results.append({
             "persona_id": row.get("persona_id"),
             "brand": brand,
+            "seed": seed,
+            **budget.as_dict(),
             "message": f"{title}\n{body}",
             "errors": errs,
             "warnings": literal_warnings,
+            "checked": i == 1,
+            "check_set": CHECK_SET,
+            **({"warned_body": warned_body} if warned_body != clean_body else {}),
             "plan": plan,
             "row": row,
             "brand_rule": brand_rule,
         })
 
+    end_message_budget()
+
+    elapsed = time.time() - t0
+    if run_stats is not None:
+        calls = [r.get("llm_calls", 0) for r in results]
+        run_stats.update({
+            "persona_id": persona_id,
+            "seed": seed,
+            "rows": len(results),
+            "elapsed_sec": round(elapsed, 3),
+            "tokens": ledger.summary(),
+            "llm_calls_per_message": round(sum(calls) / len(calls), 3) if calls else 0.0,
+            "llm_calls_max": max(calls, default=0),
+            "llm_calls_denied": sum(len(r.get("llm_calls_denied", [])) for r in results),
+        })
     if verbose:
-        print(f"[controller] DONE {time.time() - t0:.2f}s")
+        print(f"[controller] DONE {elapsed:.2f}s")
+        print("[controller] LLM tokens (estimated):\n" + ledger.format_table())
 
-    return results
\ No newline at end of file
+    return results
+
+
+def _main_chunk(jobs):
+    out = []
+    for persona_id, kwargs, with_stats in jobs:
+        if not with_stats:
+            out.append(main(persona_id, **kwargs))
+            continue
+        # per-persona stats (the worker's dict would not reach the parent otherwise);
+        # the llm may be shared by every job of an in-process run: report its delta
+        llm = kwargs.get("llm")
+        sim0 = getattr(llm, "simulated_seconds", 0.0)
+        stats: Dict[str, Any] = {}
+        results = main(persona_id, run_stats=stats, **kwargs)
+        stats["llm_simulated_sec"] = getattr(llm, "simulated_seconds", 0.0) - sim0
+        out.append((results, stats))
+    return out
+
+
+def main_many(persona_ids, processes=None, with_stats=False, **kwargs):
+    """
+    main() over several personas in a process pool (results in input order).
+    Shared artifacts (columnar catalog, affinity scores, persona table) are built
+    once here; workers attach them memory-mapped instead of re-reading the CSV.
+    with_stats: return (results, run_stats) per persona; run_stats also carries
+          "llm_simulated_sec" for clients that simulate latency (OfflineLLM).
+    Campaign runner: prompt_bench.py --processes N.
+    """
+    from shared_catalog import init_worker, prepare_artifacts
+    from workers import ordered_pool_map
+
+    prepare_artifacts(PRODUCT_CSV_PATH)
+    return list(ordered_pool_map(
+        _main_chunk,
+        [(pid, kwargs, with_stats) for pid in persona_ids],
+        initializer=init_worker,
+        initargs=(str(PRODUCT_CSV_PATH),),
+        processes=processes,
+        chunksize=1,
+    ))
@@ -1,4 +1,3 @@
-import pandas as pd
 from pathlib import Path
 import sys
 
@@ -21,12 +20,15 @@ class CRMLoader:
         # print(f"[CRMLoader] Data path resolved to: {self.data_dir}")
 
     def load(self, persona_id, topk):
+        # columnar build (data_build.py) when it is fresh, CSV otherwise
+        from data_build import read_table
+
         # 1. 메인 데이터 로드
         file_path_base = self.data_dir / "persona_brand_tone_part_final.csv"
         if not file_path_base.exists():
             raise FileNotFoundError(f"파일을 찾을 수 없습니다: {file_path_base}")
             
-        base = pd.read_csv(file_path_base)
+        base = read_table(file_path_base)
 
         # 2. 페르소나 메타 데이터 로드
         file_path_meta = self.data_dir / "persona_meta_v2.csv"
@@ -37,7 +39,7 @@ class CRMLoader:
             # 원본 로직 유지를 위해 에러를 띄우는 게 낫습니다.
             raise FileNotFoundError(f"파일을 찾을 수 없습니다: {file_path_meta}")
 
-        persona = pd.read_csv(file_path_meta)
+        persona = read_table(file_path_meta)
 
         # 3. 데이터 병합 및 필터링
         df = base.merge(persona, on="persona_id", how="left")
@@ -51,5 +53,7 @@ class CRMLoader:
         p = self.data_dir / "tone_profile_map.csv"
         if not p.exists():
             return {}
-        df = pd.read_csv(p)
+        from data_build import read_table
+
+        df = read_table(p)
         return dict(zip(df.iloc[:, 0], df.iloc[:, 1]))
\ No newline at end of file
@@ -0,0 +1,241 @@
+# agent10/data_build.py
+# Columnar (Parquet) build of every data/*.csv + format-preferring readers.
+#
+# All loaders used to parse UTF-8-BOM CSVs on every run (object dtypes, "nan"
+# strings, header whitespace). The build converts each data/*.csv once:
+#   data/build/columnar/<stem>.parquet     typed columns (pandas dtypes of the CSV parse)
+#   data/build/columnar/manifest.json      per file: source csv sha256 / size / mtime_ns,
+#                                           row count, column -> dtype
+# read_table() / read_records() return the columnar file whenever it is at least as
+# new as the CSV and the manifest still describes that CSV (size + mtime); otherwise
+# they fall back to parsing the CSV, so an edited CSV is never shadowed by a stale
+# build. pyarrow is optional: without it everything reads the CSVs as before.
+#
+# The CLI then builds the serving artifacts (shared_catalog.prepare_artifacts: columnar
+# catalog, affinity scores, persona x product table), all no-ops when up to date, so a
+# deploy / CI step that runs data_build.py starts with everything the selector loads.
+#
+# Usage:
+#   python agent10/data_build.py            # convert changed CSVs only
+#   python agent10/data_build.py --force
+#   python agent10/data_build.py --no-artifacts
+
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+BASE_DIR = Path(__file__).resolve().parent
+DATA_DIR = BASE_DIR.parent / "data"
+COLUMNAR_DIR = DATA_DIR / "build" / "columnar"
+MANIFEST = "manifest.json"
+
+COLUMNAR_VERSION = 1
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _have_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def parse_csv(csv_path: Path, columns: Optional[Sequence[str]] = None):
+    """The canonical CSV parse (BOM stripped, header whitespace trimmed)."""
+    import pandas as pd
+
+    df = pd.read_csv(csv_path, encoding="utf-8-sig")
+    df.columns = [str(c).strip() for c in df.columns]
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    return df
+
+
+# ---------------------------------------------------------------------------
+# manifest / freshness
+# ---------------------------------------------------------------------------
+# columnar_dir -> ((mtime_ns, size) of manifest.json, manifest dict)
+_MANIFEST_CACHE: Dict[str, Any] = {}
+
+
+def load_manifest(columnar_dir=COLUMNAR_DIR) -> Dict[str, Any]:
+    p = Path(columnar_dir) / MANIFEST
+    try:
+        st = p.stat()
+    except OSError:
+        return {}
+    stamp = (st.st_mtime_ns, st.st_size)
+    hit = _MANIFEST_CACHE.get(str(p))
+    if hit is not None and hit[0] == stamp:
+        return hit[1]
+    try:
+        manifest = json.loads(p.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        manifest = {}
+    _MANIFEST_CACHE[str(p)] = (stamp, manifest)
+    return manifest
+
+
+def columnar_path(csv_path, columnar_dir=COLUMNAR_DIR) -> Optional[Path]:
+    """Parquet file to read instead of csv_path, or None (missing / stale / no pyarrow)."""
+    csv_path = Path(csv_path)
+    entry = load_manifest(columnar_dir).get("files", {}).get(csv_path.name)
+    if not entry:
+        return None
+    pq = Path(columnar_dir) / entry["parquet"]
+    try:
+        cst, pst = csv_path.stat(), pq.stat()
+    except OSError:
+        return None
+    if pst.st_mtime_ns < cst.st_mtime_ns:
+        return None
+    if entry.get("csv_size") != cst.st_size or entry.get("csv_mtime_ns") != cst.st_mtime_ns:
+        return None
+    if not _have_pyarrow():
+        return None
+    return pq
+
+
+# ---------------------------------------------------------------------------
+# readers
+# ---------------------------------------------------------------------------
+def read_table(csv_path, columns: Optional[Sequence[str]] = None, columnar_dir=COLUMNAR_DIR):
+    """DataFrame for a data CSV: columnar build when fresh (column-projected), CSV otherwise."""
+    import pandas as pd
+
+    pq = columnar_path(csv_path, columnar_dir)
+    if pq is not None:
+        if columns is not None:
+            have = set(load_manifest(columnar_dir)["files"][Path(csv_path).name]["columns"])
+            columns = [c for c in columns if c in have]
+        return pd.read_parquet(pq, columns=list(columns) if columns is not None else None)
+    return parse_csv(Path(csv_path), columns)
+
+
+def _cell(v: Any) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, float):
+        if v != v:
+            return ""
+        if v.is_integer():
+            return str(int(v))
+    return str(v)
+
+
+def read_records(
+    csv_path,
+    columns: Optional[Sequence[str]] = None,
+    strip: bool = True,
+    columnar_dir=COLUMNAR_DIR,
+) -> List[Dict[str, str]]:
+    """
+    csv.DictReader-style rows (str values, "" for missing, header names trimmed) for the
+    csv-module consumers; served from the columnar build when fresh.
+    """
+    pq = columnar_path(csv_path, columnar_dir)
+    if pq is None:
+        import csv
+
+        with Path(csv_path).open("r", encoding="utf-8-sig", newline="") as f:
+            rows = [{(k or "").strip(): (v or "") for k, v in r.items() if k is not None} for r in csv.DictReader(f)]
+        if columns is not None:
+            rows = [{c: r[c] for c in columns if c in r} for r in rows]
+    else:
+        df = read_table(csv_path, columns, columnar_dir)
+        cols = list(df.columns)
+        rows = [dict(zip(cols, map(_cell, values))) for values in df.itertuples(index=False, name=None)]
+    if strip:
+        rows = [{k: v.strip() for k, v in r.items()} for r in rows]
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# build
+# ---------------------------------------------------------------------------
+def build_columnar(data_dir=DATA_DIR, columnar_dir=COLUMNAR_DIR, force: bool = False) -> Dict[str, Any]:
+    """Convert every data_dir/*.csv that changed since the last build; returns the manifest."""
+    if not _have_pyarrow():
+        raise RuntimeError("pyarrow is required for the columnar build (pip install pyarrow)")
+
+    data_dir, columnar_dir = Path(data_dir), Path(columnar_dir)
+    columnar_dir.mkdir(parents=True, exist_ok=True)
+    old = load_manifest(columnar_dir)
+    files = {} if force or old.get("version") != COLUMNAR_VERSION else dict(old.get("files", {}))
+
+    for csv_path in sorted(data_dir.glob("*.csv")):
+        st = csv_path.stat()
+        entry = files.get(csv_path.name)
+        if entry and entry.get("csv_size") == st.st_size and entry.get("csv_mtime_ns") == st.st_mtime_ns \
+                and (columnar_dir / entry["parquet"]).exists():
+            continue
+        sha = _sha256(csv_path)
+        if entry and entry.get("csv_sha256") == sha and (columnar_dir / entry["parquet"]).exists():
+            # touched but unchanged: refresh the stat stamp only
+            entry.update(csv_size=st.st_size, csv_mtime_ns=st.st_mtime_ns)
+            os.utime(columnar_dir / entry["parquet"])
+            continue
+
+        t0 = time.perf_counter()
+        df = parse_csv(csv_path)
+        name = f"{csv_path.stem}.parquet"
+        tmp = columnar_dir / f".{name}.tmp{os.getpid()}"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, columnar_dir / name)
+        files[csv_path.name] = {
+            "csv": csv_path.name,
+            "csv_sha256": sha,
+            "csv_size": st.st_size,
+            "csv_mtime_ns": st.st_mtime_ns,
+            "parquet": name,
+            "rows": int(len(df)),
+            "columns": {str(c): str(t) for c, t in df.dtypes.items()},
+            "build_sec": round(time.perf_counter() - t0, 3),
+        }
+        print(f"[data_build] {csv_path.name} -> {name} rows={len(df)}", file=sys.stderr)
+
+    # CSVs that disappeared
+    for gone in [n for n in files if not (data_dir / n).exists()]:
+        files.pop(gone)
+
+    manifest = {"version": COLUMNAR_VERSION, "files": files}
+    tmp = columnar_dir / f".{MANIFEST}.tmp{os.getpid()}"
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, columnar_dir / MANIFEST)
+    return manifest
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Convert data/*.csv into typed Parquet files + manifest.")
+    ap.add_argument("--data-dir", default=str(DATA_DIR))
+    ap.add_argument("--out", default=str(COLUMNAR_DIR))
+    ap.add_argument("--force", action="store_true")
+    ap.add_argument("--no-artifacts", action="store_true", help="Parquet only (skip the serving artifacts)")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    manifest = build_columnar(args.data_dir, args.out, force=args.force)
+    for name, e in manifest["files"].items():
+        print(f"[data_build] {name:<42} rows={e['rows']:<6} cols={len(e['columns'])}")
+    print(f"[data_build] {len(manifest['files'])} files -> {args.out} ({time.perf_counter() - t0:.2f}s)")
+
+    if not args.no_artifacts:
+        from shared_catalog import prepare_artifacts
+
+        t0 = time.perf_counter()
+        prepare_artifacts()
+        print(f"[data_build] serving artifacts up to date ({time.perf_counter() - t0:.2f}s)")
@@ -2,31 +2,37 @@
 import time
 from pathlib import Path
 
+from catalog import load_catalog
 from crm_loader import CRMLoader
 from product_selector import ProductSelector
-from react_reasoning_agent import ReActPlanner
+from react_reasoning_agent import ReActReasoningAgent
 from strategy_narrator import StrategyNarrator
 from verifier import MessageVerifier
 from openai_client import OpenAIChatCompletionClient
 from tone_profiles import ToneProfiles
 from market_context_tool import MarketContextTool
 from brand_rules import load_brand_rules
-from rule_verifier import verify_brand_rules
+from MessageVerifier import verify_brand_rules
+from repair_planner import plan_repairs
+from token_ledger import begin_message_budget, end_message_budget
 
 
 class Executor:
-    def __init__(self, data_dir: Path, use_market_context=False, verbose=True):
+    def __init__(self, data_dir: Path, use_market_context=False, verbose=True, llm=None):
         self.data_dir = Path(data_dir)
         self.use_market_context = use_market_context
         self.verbose = verbose
 
-        self.llm = OpenAIChatCompletionClient()
+        # llm: injectable chat client (e.g. offline_llm.OfflineLLM for benchmarks)
+        self.llm = llm if llm is not None else OpenAIChatCompletionClient()
         self.loader = CRMLoader(self.data_dir)
         self.tones = ToneProfiles(self.data_dir)
         self.verifier = MessageVerifier()
 
         self.product_selector = ProductSelector(
-            self.data_dir / "amore_with_category.csv"
+            df=load_catalog(self.data_dir / "amore_with_category.csv"),
+            name_col="상품명",
+            brand_col="brand",
         )
 
         self.market_tool = MarketContextTool(enabled=use_market_context)
@@ -35,34 +41,36 @@ class Executor:
             str(self.data_dir / "amore_brand_tone_rules.csv")
         )
 
-        tone_map = self.tones.load_tone_profile_map()
-        self.planner = ReActPlanner(
-            llm_client=self.llm,
-            tone_profile_map=tone_map,
-        )
+        # loaded once; the index itself is cached per data_dir and rebuilt only when the CSVs change
+        self.tone_index = self.tones.tone_index()
+        self.planner = ReActReasoningAgent(self.llm, self.tone_index)
         self.narrator = StrategyNarrator(
             llm_client=self.llm,
-            tone_profile_map=tone_map,
+            tone_profile_map=self.tone_index,
         )
 
-    def run(self, persona_id: str, topk: int = 3):
+    def run(self, persona_id: str, topk: int = 3, seed=None):
+        from sampler import derive_rng, make_seed
+
         t0 = time.time()
+        seed = make_seed() if seed is None else int(seed)
 
         if self.verbose:
             print("[executor] load rows")
         rows = self.loader.load(persona_id=persona_id, topk=topk)
 
-        if self.verbose:
-            print("[executor] load tone profiles")
-        self.tones.load_tone_profiles()
-
-        tone_map = self.tones.load_tone_profile_map()
-        self.planner.tone_profile_map = tone_map
-        self.narrator.tone_profile_map = tone_map
+        # tone index: cache hit unless a tone CSV changed since __init__
+        tone_index = self.tones.tone_index()
+        if tone_index is not self.tone_index:
+            self.tone_index = tone_index
+            self.planner.tone_map = tone_index
+            self.narrator.tone_profile_map = tone_index
 
         results = []
 
         for i, row in enumerate(rows, 1):
+            # per-message LLM call budget shared by planner, narrator and repairs
+            budget = begin_message_budget()
             brand = str(row.get("brand", "")).strip()
             if brand not in self.brand_rules:
                 raise RuntimeError(f"[executor] brand rule missing: {brand}")
@@ -89,7 +97,9 @@ class Executor:
                         # Signature mismatch; fall back to row-based contract
                         product = self.product_selector.select_one(row=row)
                 elif hasattr(self.product_selector, "select_product"):
-                    chosen_name, chosen_score = self.product_selector.select_product(row=row, topk=topk)
+                    chosen_name, chosen_score = self.product_selector.select_product(
+                        row=row, topk=topk, rng=derive_rng(seed, f"product_select:{i}:{brand}")
+                    )
                     product = {"상품명": str(chosen_name).strip(), "_score": float(chosen_score)}
                 else:
                     raise AttributeError("ProductSelector must expose select_one(...) or select_product(row, topk)")
@@ -130,13 +140,30 @@ class Executor:
             if errs and not getattr(self.llm, "offline", False):
                 if self.verbose:
                     print(f"[executor] row {i}/{len(rows)} repair: {errs}")
+                tried = set()
                 for _ in range(2):
-                    msg = self.narrator.generate(
-                        row=row,
-                        plan=plan,
-                        brand_rule=brand_rule,
-                        repair_errors=errs,
-                    )
+                    # slot-local errors: rewrite only the responsible slots (title and the
+                    # other slots kept); anything else, or an error a slot repair already
+                    # failed to fix: full regeneration
+                    repair = plan_repairs(errs, body_line, row, tried=tried)
+                    if not repair["unmapped"]:
+                        if self.verbose:
+                            print(f"[executor] row {i}/{len(rows)} slot repair: {repair['slots']}")
+                        msg = self.narrator.repair_slots(msg, repair["slots"], row=row, plan=plan)
+                        tried.update(e for es in repair["slots"].values() for e in es)
+                    else:
+                        # a regeneration needs at least the body call; without it the narrator
+                        # would only rebuild the deterministic fallback message
+                        if budget.remaining < 1:
+                            if self.verbose:
+                                print(f"[executor] row {i}/{len(rows)} call budget spent ({budget.used}), keep last message")
+                            break
+                        msg = self.narrator.generate(
+                            row=row,
+                            plan=plan,
+                            brand_rule=brand_rule,
+                            repair_errors=errs,
+                        )
                     title_line, body_line = msg.split("\n", 1)
                     errs = self.verifier.validate(row, title_line, body_line)
                     errs.extend(
@@ -155,13 +182,16 @@ class Executor:
                 {
                     "persona_id": row.get("persona_id", ""),
                     "brand": brand,
+                    "seed": seed,
                     "part_id": row.get("part_id", ""),
                     "score": row.get("score", ""),
                     "message": msg,
                     "plan": plan,
                     "errors": errs,
+                    **budget.as_dict(),
                 }
             )
+        end_message_budget()
 
         if self.verbose:
             print(f"[executor] runtime {time.time()-t0:.2f}s")
@@ -0,0 +1,124 @@
+# agent10/ingredient_index.py
+# Ingredient inverted index: normalized 전성분 token -> product bitset.
+#
+# Personas carry ingredient_avoid_list (e.g. "향료,에센셜오일"); the catalog carries
+# the full 전성분 string per product. Instead of substring-scanning every product's
+# ingredient text per request, the catalog is tokenized once and every token maps
+# to a bitset (Python int, bit = ProductIndex pid). An avoid list resolves to the
+# OR of the matching postings (memoized), and candidate filtering is a single
+# AND-NOT:  brand_bits & ~avoid_bits.
+
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# 1,2-헥산다이올 / 2,3-부탄다이올 처럼 숫자 사이 콤마는 성분명의 일부
+_SPLIT_RE = re.compile(r"(?<!\d),|,(?!\d)")
+
+# persona avoid term (공백 제거) -> ingredient token patterns
+#   "x"  : token contains x          "=x" : token equals x
+# Category-like terms (에센셜오일, 동물유래 성분 ...) never appear literally in 전성분,
+# so they are expanded to the concrete ingredients seen in the catalog.
+# Terms not listed here match tokens containing the term itself.
+AVOID_TERM_PATTERNS: Dict[str, Tuple[str, ...]] = {
+    "향료": ("향료",),
+    "강향료": ("향료",),
+    "에탄올": ("=에탄올", "=변성알코올", "=알코올"),
+    "고농도에탄올": ("=에탄올", "=변성알코올", "=알코올"),
+    "에센셜오일": (
+        "페퍼민트오일", "스피어민트잎오일", "로즈마리잎오일", "라벤더오일", "레몬껍질오일",
+        "레몬오일", "베르가모트", "유칼립투스잎오일", "캐모마일꽃오일", "라임전초오일",
+        "라임오일", "제라늄꽃오일", "제라늄오일", "오렌지껍질오일", "오렌지꽃오일",
+        "오렌지오일", "장미꽃오일", "티트리잎오일", "소나무잎오일",
+    ),
+    "코메도제닉오일": (
+        "코코넛야자오일", "코코넛오일", "아이소프로필미리스테이트", "아이소프로필팔미테이트",
+        "카카오씨버터", "밀배아오일",
+    ),
+    "동물유래성분": (
+        "라놀린", "비즈왁스", "밀랍", "=꿀", "벌꿀", "꿀추출물", "달팽이", "콜라겐",
+        "프로폴리스", "=카민", "로열젤리", "스쿠알렌",
+    ),
+}
+
+_NONE_VALUES = {"", "-", "nan", "none", "없음"}
+
+
+def normalize_token(s: str) -> str:
+    return "".join(str(s or "").split())
+
+
+def split_ingredients(text: str) -> List[str]:
+    """전성분 문자열 -> normalized ingredient tokens (duplicates removed, order kept)."""
+    if not isinstance(text, str) or not text:
+        return []
+    return list(dict.fromkeys(t for t in (normalize_token(x) for x in _SPLIT_RE.split(text)) if t))
+
+
+def parse_avoid_list(raw) -> Tuple[str, ...]:
+    """ingredient_avoid_list ("향료,에센셜오일" / "-" / NaN) -> normalized terms."""
+    if raw is None:
+        return ()
+    s = str(raw).strip()
+    if s.lower() in _NONE_VALUES:
+        return ()
+    return tuple(dict.fromkeys(t for t in (normalize_token(x) for x in s.split(",")) if t))
+
+
+def iter_bits(bits: int) -> Iterator[int]:
+    """Set bit positions in ascending order (= pids in catalog order)."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class IngredientIndex:
+    def __init__(self, ingredient_texts: Sequence[str]):
+        """ingredient_texts[pid] = 전성분 text of product pid."""
+        self.n_products = len(ingredient_texts)
+        self.postings: Dict[str, int] = {}
+        for pid, text in enumerate(ingredient_texts):
+            bit = 1 << pid
+            for tok in split_ingredients(text):
+                self.postings[tok] = self.postings.get(tok, 0) | bit
+
+        self._term_cache: Dict[str, int] = {}
+        self._avoid_cache: Dict[str, int] = {}
+
+    @classmethod
+    def from_product_index(cls, product_index, texts_by_row: Sequence[str]) -> "IngredientIndex":
+        """Align with ProductIndex pids (texts_by_row is indexed by the source row)."""
+        return cls([texts_by_row[e.row] for e in product_index.entries])
+
+    def tokens_for(self, term: str) -> List[str]:
+        """Vocabulary tokens matched by one avoid term."""
+        term = normalize_token(term)
+        patterns = AVOID_TERM_PATTERNS.get(term, (term,))
+        out = []
+        for tok in self.postings:
+            for p in patterns:
+                if (tok == p[1:]) if p.startswith("=") else (p in tok):
+                    out.append(tok)
+                    break
+        return out
+
+    def term_bits(self, term: str) -> int:
+        term = normalize_token(term)
+        bits = self._term_cache.get(term)
+        if bits is None:
+            bits = 0
+            for tok in self.tokens_for(term):
+                bits |= self.postings[tok]
+            self._term_cache[term] = bits
+        return bits
+
+    def avoid_bits(self, avoid_list) -> int:
+        """Products containing any avoided ingredient (bitset). "-" / empty -> 0."""
+        key = str(avoid_list) if avoid_list is not None else ""
+        bits = self._avoid_cache.get(key)
+        if bits is None:
+            bits = 0
+            for term in parse_avoid_list(avoid_list):
+                bits |= self.term_bits(term)
+            self._avoid_cache[key] = bits
+        return bits
@@ -0,0 +1,183 @@
+# agent10/keyword_automaton.py
+# Aho-Corasick keyword automaton + per-brand rule matcher.
+#
+# verify_brand_rules used to re-split comma strings and run one substring scan
+# per keyword per message. BrandRuleMatcher holds every banned / must_include /
+# viewpoint keyword of all rule rows of a brand in a single automaton, built
+# once, so one pass over the text yields the hits for every rule row and every
+# category. Error strings are identical to MessageVerifier.check_*.
+# build_rule_set_matcher does the same over every rule row of every brand, so an
+# archive audit checks a message against the whole rule set in one pass.
+#
+# Pure stdlib (lists/dicts only) so matchers pickle into the compiled rule artifact.
+
+from collections import deque
+from typing import Any, Dict, FrozenSet, Iterable, List, Sequence, Tuple
+
+RULE_CATEGORIES = ("banned", "must_include", "viewpoint")
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton over a fixed keyword set (substring semantics, overlaps included)."""
+
+    def __init__(self, keywords: Iterable[str] = ()):
+        self.keywords: List[str] = []
+        self._kw_index: Dict[str, int] = {}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        self._built = False
+        for kw in keywords:
+            self.add(kw)
+        self.build()
+
+    def add(self, keyword: str) -> int:
+        """Add a keyword; returns its id. Empty keywords are ignored (-1)."""
+        kw = str(keyword or "")
+        if not kw:
+            return -1
+        if kw in self._kw_index:
+            return self._kw_index[kw]
+
+        kid = len(self.keywords)
+        self.keywords.append(kw)
+        self._kw_index[kw] = kid
+
+        state = 0
+        for ch in kw:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] = self._out[state] + (kid,)
+        self._built = False
+        return kid
+
+    def build(self) -> None:
+        """Compute failure links (BFS) and merge outputs along them."""
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = deque()
+        for nxt in goto[0].values():
+            fail[nxt] = 0
+            queue.append(nxt)
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                cand = goto[f].get(ch, 0)
+                fail[nxt] = cand if cand != nxt else 0
+                if out[fail[nxt]]:
+                    out[nxt] = out[nxt] + out[fail[nxt]]
+        self._built = True
+
+    def find_ids(self, text: str) -> set:
+        """Ids of all keywords occurring in text (single pass)."""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        root = goto[0]
+        found = set()
+        state = 0
+        for ch in text or "":
+            if not state:
+                # fast path: most characters of a message never leave the root
+                state = root.get(ch, 0)
+            else:
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+    def find(self, text: str) -> FrozenSet[str]:
+        """All keywords occurring in text."""
+        kws = self.keywords
+        return frozenset(kws[i] for i in self.find_ids(text))
+
+
+def _rule_keywords(rule_row: Dict[str, Any], field: str) -> Tuple[str, ...]:
+    pre = rule_row.get(f"{field}_keywords")
+    if pre is not None:
+        return tuple(pre)
+    raw = rule_row.get(field, "")
+    if not isinstance(raw, str):
+        return tuple()
+    return tuple(t.strip() for t in raw.split(",") if t.strip())
+
+
+def rule_signature(rule_row: Dict[str, Any]) -> Tuple[Tuple[str, ...], ...]:
+    """Keyword content of a rule row (what the matcher's answer depends on)."""
+    return tuple(_rule_keywords(rule_row, c) for c in RULE_CATEGORIES)
+
+
+def rule_errors(signature: Sequence[Tuple[str, ...]], hits: FrozenSet[str]) -> List[str]:
+    """Error strings for one rule row given the keyword hits of a text."""
+    banned, must_include, viewpoint = signature
+    errors = []
+
+    banned_hits = [k for k in banned if k in hits]
+    if banned_hits:
+        errors.append(f"banned hit: {banned_hits}")
+
+    if must_include and not any(k in hits for k in must_include):
+        errors.append(f"must_include miss: {list(must_include)}")
+
+    if viewpoint and not any(k in hits for k in viewpoint):
+        errors.append(f"viewpoint miss: {list(viewpoint)}")
+
+    return errors
+
+
+class BrandRuleMatcher:
+    """All banned / must_include / viewpoint keywords of a brand's rule rows in one automaton."""
+
+    def __init__(self, brand: str, rule_rows: Sequence[Dict[str, Any]]):
+        self.brand = brand
+        # rule_id -> keyword signature
+        self.signatures: Dict[Any, Tuple[Tuple[str, ...], ...]] = {}
+        keywords: List[str] = []
+        for pos, row in enumerate(rule_rows):
+            sig = rule_signature(row)
+            self.signatures[row.get("rule_id", pos)] = sig
+            for kws in sig:
+                keywords.extend(kws)
+        self.automaton = KeywordAutomaton(keywords)
+
+    def covers(self, rule_row: Dict[str, Any]) -> bool:
+        """True if this matcher was built from exactly this rule row's keywords."""
+        rid = rule_row.get("rule_id")
+        return rid in self.signatures and self.signatures[rid] == rule_signature(rule_row)
+
+    def scan(self, text: str) -> FrozenSet[str]:
+        return self.automaton.find(text)
+
+    def verify(self, text: str, rule_row: Dict[str, Any]) -> List[str]:
+        """Same result as MessageVerifier.verify_brand_rules(text, rule_row)."""
+        return rule_errors(rule_signature(rule_row), self.scan(text))
+
+    def verify_all(self, text: str) -> Dict[Any, List[str]]:
+        """Errors for every rule row of the brand, from a single pass over text."""
+        hits = self.scan(text)
+        return {rid: rule_errors(sig, hits) for rid, sig in self.signatures.items()}
+
+
+def build_brand_matchers(rules: Dict[str, List[Dict[str, Any]]]) -> Dict[str, BrandRuleMatcher]:
+    """brand -> [rule rows] (load_brand_rules shape) -> brand -> matcher."""
+    return {brand: BrandRuleMatcher(brand, rows) for brand, rows in (rules or {}).items()}
+
+
+def build_rule_set_matcher(rules: Dict[str, List[Dict[str, Any]]]) -> BrandRuleMatcher:
+    """
+    One matcher over every rule row of every brand (keyed by rule_id).
+    Archive audits check each message against all rows with a single pass.
+    """
+    rows = [r for brand_rows in (rules or {}).values() for r in brand_rows]
+    return BrandRuleMatcher("", rows)
@@ -3,7 +3,6 @@
 # ✅ 이 파일은 "절대" from market_context_tool import MarketContextTool 같은 라인을 가지면 안 됨.
 
 import os
-print("[MarketContextTool] module loaded")
 
 
 class MarketContextTool:
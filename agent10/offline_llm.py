@@ -0,0 +1,171 @@
+# agent10/offline_llm.py
+# Deterministic offline LLM simulator for benchmarks (no network, no API key).
+#
+# OPENAI_OFFLINE=1 makes OpenAIChatCompletionClient return one fixed dummy string for
+# every call, which is useless for comparing prompt variants. OfflineLLM answers
+# per stage (token_ledger.llm_stage) with a plausible response built from the
+# prompt itself (brand / product / lifestyle parsed out of the user prompt, phrasing
+# picked by a prompt hash), so:
+#   - the same prompt always yields the same text (reproducible benchmarks)
+#   - a prompt that drops a field the copy needs yields copy that fails MessageVerifier
+# Latency is modelled like a hosted chat model: fixed overhead + prefill per prompt
+# token + decode per completion token (estimated tokens). time_scale=0 only accounts
+# the simulated seconds; time_scale=1 also sleeps them.
+#
+# Same call surface as OpenAIChatCompletionClient.generate(); inject with
+#   controller.main(..., llm=OfflineLLM())
+
+import hashlib
+import json
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from token_ledger import current_stage, estimate_prompt_tokens, estimate_tokens
+
+# gpt-4o-mini-like defaults (seconds)
+DEFAULT_OVERHEAD_SEC = 0.35
+DEFAULT_PREFILL_SEC_PER_TOKEN = 0.00004
+DEFAULT_DECODE_SEC_PER_TOKEN = 0.012
+
+_SLOT1 = (
+    "{life} 피부가 먼저 당기는 날이 있죠?",
+    "{life} 오후만 되면 피부 컨디션이 흔들리지 않나요?",
+    "{life} 건조함이 유난히 길게 남는 날이 있어요.",
+)
+_SLOT2 = (
+    "그래서 {brand}의 {product}를 추천드려요. 한 번 바르면 속당김이 금방 줄어들어요!",
+    "이럴 때 {brand} {product} 하나면 충분해요. 피부 결이 바로 정돈되는 게 느껴져요!",
+    "이런 분께 {brand}의 {product}가 잘 맞아요. 바르는 순간부터 촉촉함이 오래가요!",
+)
+_SLOT3 = (
+    "아침 루틴 마지막 단계에 더하면 흡수가 빨라 메이크업 전에도 밀리지 않아요. 짧은 시간에도 피부가 편안해져요.",
+    "루틴 중간 단계에 얹어주면 끈적임 없이 스며들어 다음 단계가 가벼워요. 시간이 지나도 당김이 덜해요.",
+    "세안 후 첫 단계에 쓰면 빠른 흡수로 바로 다음 단계로 넘어갈 수 있어요. 오후까지 촉촉함이 이어져요.",
+)
+_SLOT4 = (
+    "한 번 쓰고 나면 다시 찾게 되는 이유를 알게 될 거예요 ✨",
+    "요즘 자사몰에서 재구매가 잦은 이유가 느껴질 거예요 💧",
+    "다 쓰기 전에 다음 통을 챙기게 되는 타입이에요 ✨",
+)
+
+
+def _pick(options, seed: int, salt: int = 0) -> str:
+    return options[(seed + salt) % len(options)]
+
+
+def _field(pattern: str, text: str) -> str:
+    m = re.search(pattern, text)
+    return m.group(1).strip() if m else ""
+
+
+class OfflineLLM:
+    def __init__(
+        self,
+        overhead_sec: float = DEFAULT_OVERHEAD_SEC,
+        prefill_sec_per_token: float = DEFAULT_PREFILL_SEC_PER_TOKEN,
+        decode_sec_per_token: float = DEFAULT_DECODE_SEC_PER_TOKEN,
+        time_scale: float = 0.0,
+    ):
+        self.offline = True
+        self.model = "offline-sim"
+        self.overhead_sec = overhead_sec
+        self.prefill_sec_per_token = prefill_sec_per_token
+        self.decode_sec_per_token = decode_sec_per_token
+        self.time_scale = time_scale
+        # one entry per call: stage, prompt/completion tokens, simulated seconds
+        self.calls: List[Dict[str, Any]] = []
+
+    @property
+    def simulated_seconds(self) -> float:
+        return sum(c["sim_sec"] for c in self.calls)
+
+    # -------------------------------------------------
+    # responses
+    # -------------------------------------------------
+    def _respond(self, stage: str, system: str, user: str, seed: int) -> str:
+        if stage == "plan":
+            life = _field(r"lifestyle['\"]?\s*[:=]\s*['\"]?([^'\"\n,}]+)", user) or "일상"
+            return f"{life} 속 짧은 준비 시간, 실내외 온도 차, 오후 건조감"
+
+        brand = _field(r"참고하여\s*(.+?)의 마케팅 메시지", user)
+        product = _field(r"추천 제품:\s*([^\n]+)", user)
+        life = _field(r"라이프스타일:\s*([^\n]+)", user)
+        life = re.split(r"[,/|]", life)[0].strip()
+        life = f"{life} 속에서" if life else "바쁜 하루 속에서"
+
+        slots = [
+            _pick(_SLOT1, seed).format(life=life),
+            _pick(_SLOT2, seed, 1).format(brand=brand, product=product),
+            _pick(_SLOT3, seed, 2),
+            _pick(_SLOT4, seed, 3),
+        ]
+        if stage == "body":
+            return "\n\n".join(slots)
+        if stage == "title":
+            brand = _field(r"브랜드:\s*([^\n]+)", user) or brand
+            return f"✨ {brand} 데일리 루틴, 오늘부터 가볍게 시작해요 💧"
+        if stage == "message":
+            # structured output (narrator output_mode="json")
+            out = {"title": f"✨ {brand} 데일리 루틴, 오늘부터 가볍게 시작해요 💧"}
+            out.update({f"slot{n}": text for n, text in enumerate(slots, 1)})
+            return json.dumps(out, ensure_ascii=False)
+        if stage == "insert":
+            body = user.split("[기존 문단]", 1)[-1].strip()
+            lines = body.split("\n")
+            lines.insert(min(2, len(lines)), "그래서 바쁜 날에도 루틴이 흔들리지 않아요.")
+            return "\n".join(lines)
+        if stage == "repair":
+            # one slot rewrite: same phrasing pool as the body, brand / product from the prompt
+            n = int(_field(r"BODY의 slot(\d)", user) or 1)
+            brand = _field(r"브랜드:[ \t]*([^\n]*)", user)
+            product = _field(r"제품:[ \t]*([^\n]*)", user)
+            pool = (_SLOT1, _SLOT2, _SLOT3, _SLOT4)[min(max(n, 1), 4) - 1]
+            return _pick(pool, seed, n).format(life="바쁜 하루 속에서", brand=brand, product=product)
+        if stage == "shorten":
+            last = user.split("[마지막 문장]", 1)[-1].strip()
+            return last[: max(10, len(last) * 2 // 3)].rstrip() + "."
+        return "TITLE: [오프라인 시뮬레이터]\nBODY: 시뮬레이터 기본 응답입니다."
+
+    # -------------------------------------------------
+    # OpenAIChatCompletionClient surface
+    # -------------------------------------------------
+    def chat(self, messages, temperature: float = 0.7, response_format: Optional[Dict[str, Any]] = None) -> str:
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        messages = list(messages or [])
+        system = "\n".join(m.get("content", "") for m in messages if m.get("role") == "system")
+        user = "\n".join(m.get("content", "") for m in messages if m.get("role") != "system")
+        stage = current_stage()
+        seed = int(hashlib.sha1(f"{stage}\n{system}\n{user}".encode("utf-8")).hexdigest()[:8], 16)
+
+        text = self._respond(stage, system, user, seed)
+
+        prompt_tokens = estimate_prompt_tokens(messages)
+        completion_tokens = estimate_tokens(text)
+        sim_sec = (
+            self.overhead_sec
+            + prompt_tokens * self.prefill_sec_per_token
+            + completion_tokens * self.decode_sec_per_token
+        )
+        self.calls.append({
+            "stage": stage,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "sim_sec": sim_sec,
+        })
+        if self.time_scale > 0:
+            time.sleep(sim_sec * self.time_scale)
+        return text
+
+    def generate(
+        self,
+        messages=None,
+        system: Optional[str] = None,
+        user: Optional[str] = None,
+        temperature: float = 0.7,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        if messages is None and system is not None and user is not None:
+            messages = [{"role": "system", "content": system}, {"role": "user", "content": user}]
+        return self.chat(messages=messages, temperature=temperature, response_format=response_format)
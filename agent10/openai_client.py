@@ -2,10 +2,22 @@
 import os
 import time
 
-try:
-    from openai import OpenAI
-except Exception:
-    OpenAI = None
+from agent_logging import DEBUG, get_logger
+
+log = get_logger("openai_client")
+
+
+def _load_openai_class():
+    """
+    Import the OpenAI SDK on demand.
+    The SDK import alone takes ~0.6s; offline runs never need it, so it is
+    deferred until an online client is actually constructed.
+    """
+    try:
+        from openai import OpenAI
+    except Exception:
+        return None
+    return OpenAI
 
 
 class OpenAIChatCompletionClient:
@@ -42,16 +54,17 @@ class OpenAIChatCompletionClient:
         self.client = None
 
         if self.offline:
-            print("[OpenAIClient] OPENAI_OFFLINE=1 -> OFFLINE mode")
+            log.info("OPENAI_OFFLINE=1 -> OFFLINE mode")
             return
 
         if not self.api_key:
-            print("[OpenAIClient] OPENAI_API_KEY not found -> OFFLINE mode")
+            log.warning("OPENAI_API_KEY not found -> OFFLINE mode")
             self.offline = True
             return
 
+        OpenAI = _load_openai_class()
         if OpenAI is None:
-            print("[OpenAIClient] openai package not available -> OFFLINE mode")
+            log.warning("openai package not available -> OFFLINE mode")
             self.offline = True
             return
 
@@ -62,7 +75,7 @@ class OpenAIChatCompletionClient:
                 base_url=self.base_url,
             )
         except Exception as e:
-            print(f"[OpenAIClient] OpenAI init failed: {e}")
+            log.warning("OpenAI init failed: %s", e)
             self.offline = True
             self.client = None
 
@@ -78,9 +91,10 @@ class OpenAIChatCompletionClient:
     # -------------------------------------------------
     # main
     # -------------------------------------------------
-    def chat(self, messages, temperature=0.7):
+    def chat(self, messages, temperature=0.7, response_format=None):
         """
         messages: [{"role": "system"|"user"|"assistant", "content": "..."}]
+        response_format: e.g. {"type": "json_object"} for structured output (optional)
         return: str
         """
 
@@ -88,24 +102,22 @@ class OpenAIChatCompletionClient:
         # type guard: OpenAI API requires list[{"role","content"}]
         # Some upstream code may accidentally pass a string.
         # We coerce string -> [{"role":"user","content": <string>}]
-        # so the request does not 400, while printing a clear debug line.
+        # so the request does not 400, while logging a clear warning.
         # -------------------------------------------------
         if isinstance(messages, str):
-            print("[OpenAIClient] WARN: messages was str -> coercing to chat list")
+            log.warning("messages was str -> coercing to chat list")
             messages = [{"role": "user", "content": messages}]
         elif messages is not None and not isinstance(messages, list):
-            print(f"[OpenAIClient] WARN: messages type={type(messages)} -> using dummy response")
+            log.warning("messages type=%s -> using dummy response", type(messages))
             return self._dummy_response()
 
         # 🔥 실제 호출 직전 라우팅 디버그 (판별용 핵심 로그)
-        print(
-            "[LLM ROUTE DEBUG]",
-            "provider=", self.provider,
-            "model=", self.model,
-            "base_url=", self.base_url,
-            "OPENAI_OFFLINE=", os.getenv("OPENAI_OFFLINE"),
-            "OLLAMA_BASE_URL=", os.getenv("OLLAMA_BASE_URL"),
-        )
+        if log.isEnabledFor(DEBUG):
+            log.debug(
+                "route provider=%s model=%s base_url=%s OPENAI_OFFLINE=%s OLLAMA_BASE_URL=%s",
+                self.provider, self.model, self.base_url,
+                os.getenv("OPENAI_OFFLINE"), os.getenv("OLLAMA_BASE_URL"),
+            )
 
         if self.offline or not self.client:
             return self._dummy_response()
@@ -118,15 +130,17 @@ class OpenAIChatCompletionClient:
 
         for attempt in range(1, max_attempts + 1):
             try:
+                extra = {"response_format": response_format} if response_format else {}
                 resp = self.client.chat.completions.create(
                     model=self.model,
                     messages=messages,
                     temperature=float(temperature),
+                    **extra,
                 )
                 content = resp.choices[0].message.content
                 return (content or "").strip() or "TITLE:\nBODY:"
             except Exception as e:
-                print(f"[OpenAIClient] API Request Error (attempt {attempt}): {e}")
+                log.warning("API request error (attempt %d): %s", attempt, e)
                 if attempt < max_attempts:
                     time.sleep(backoff ** attempt)
                     continue
@@ -140,12 +154,12 @@ class OpenAIChatCompletionClient:
     # -------------------------------------------------
     # compatibility wrapper (for StrategyNarrator)
     # -------------------------------------------------
-    def generate(self, messages=None, system=None, user=None, temperature=0.7):
+    def generate(self, messages=None, system=None, user=None, temperature=0.7, response_format=None):
         # StrategyNarrator may call generate(messages=...)
         if messages is not None:
             if isinstance(messages, str):
-                print("[OpenAIClient] WARN: generate(messages=...) received str; coercing")
-            return self.chat(messages=messages, temperature=temperature)
+                log.warning("generate(messages=...) received str; coercing")
+            return self.chat(messages=messages, temperature=temperature, response_format=response_format)
 
         # Or generate(system, user) style
         if system is not None and user is not None:
@@ -155,6 +169,7 @@ class OpenAIChatCompletionClient:
                     {"role": "user", "content": user},
                 ],
                 temperature=temperature,
+                response_format=response_format,
             )
 
         return self._dummy_response()
@@ -0,0 +1,437 @@
+# agent10/persona_scores.py
+# Materialized persona x product score matrix + per-(persona, brand) top-k.
+#
+# ProductSelector's score for a product only depends on the product (affinity
+# scores, brand cap) and on a few persona fields (ingredient_avoid_list excludes
+# products, a busy/simple lifestyle penalizes devices). Personas are fixed between
+# data refreshes, so the whole table is computed offline in a vectorized batch job:
+#   scores.npy      float32[n_personas, n_products]   (-inf = excluded product)
+#   topk_pid.npy    int32  [n_personas, n_brands, K]  (-1 padded)
+#   topk_score.npy  float32[n_personas, n_brands, K]
+#   meta.json       persona ids + profile signatures, brand keys, K, names digest
+# Columns are ProductIndex pids, brands are ProductIndex brand keys. Rows are
+# computed in chunks sized from a memory budget and streamed into the .npy
+# files, so 100k personas x the full catalog never materializes in RAM. Serving memory-maps the files: select_product becomes a
+# top-k row lookup (merged across the brands matching the filter) + sampling.
+#
+# Usage:
+#   python agent10/persona_scores.py                    # personas from persona_meta_v2.csv
+#   python agent10/persona_scores.py --synthetic 100000 --memory-mb 256
+#   python agent10/persona_scores.py --check            # table == live scoring (CI)
+
+import csv
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from agent_logging import get_logger
+
+log = get_logger("persona_scores")
+
+BASE_DIR = Path(__file__).resolve().parent
+DATA_DIR = BASE_DIR.parent / "data"
+BUILD_DIR = DATA_DIR / "build"
+PERSONAS_CSV = DATA_DIR / "persona_meta_v2.csv"
+
+# 점수식/프로필 해석이 바뀌면 올린다 → 기존 산출물 무효화
+PERSONA_SCORES_VERSION = 1
+
+# per-(persona, brand) list length; select_product(topk <= K) is served from the table
+TOPK = 8
+
+DEVICE_PENALTY = 0.1
+DEVICE_PENALTY_BRANDS = ("메이크온",)
+
+DEFAULT_MEMORY_MB = 256
+
+
+# ---------------------------------------------------------------------------
+# persona profile (the only persona fields the selector score depends on)
+# ---------------------------------------------------------------------------
+def penalizes_devices(lifestyle: Any) -> bool:
+    """바쁜/간편 lifestyle -> devices (and device brands) are down-weighted."""
+    s = str(lifestyle if lifestyle is not None else "")
+    return "바쁜" in s or "간편" in s
+
+
+def profile_signature(row: Dict[str, Any]) -> str:
+    """Canonical form of the score-relevant persona fields (build <-> request consistency check)."""
+    from ingredient_index import parse_avoid_list
+
+    avoid = ",".join(sorted(parse_avoid_list(row.get("ingredient_avoid_list"))))
+    return f"dev={int(penalizes_devices(row.get('lifestyle')))}|avoid={avoid}"
+
+
+def device_mask(index) -> List[bool]:
+    """pid -> product gets the device penalty."""
+    return [e.is_device or any(b in e.brand for b in DEVICE_PENALTY_BRANDS) for e in index.entries]
+
+
+def index_digest(index) -> str:
+    h = hashlib.sha1()
+    for e in index.entries:
+        h.update(e.name.encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# batch build
+# ---------------------------------------------------------------------------
+def _bits_to_mask(bits: int, n: int):
+    import numpy as np
+
+    if not bits:
+        return np.zeros(n, dtype=bool)
+    raw = np.frombuffer(bits.to_bytes((n + 7) // 8, "little"), dtype=np.uint8)
+    return np.unpackbits(raw, bitorder="little")[:n].astype(bool)
+
+
+class _NpyWriter:
+    """Row-chunked .npy writer: header once, then C-order rows appended (nothing kept mapped)."""
+
+    def __init__(self, path: Path, dtype, shape):
+        import numpy as np
+
+        self.dtype = np.dtype(dtype)
+        self.f = open(path, "wb")
+        np.lib.format.write_array_header_1_0(
+            self.f, {"descr": np.lib.format.dtype_to_descr(self.dtype), "fortran_order": False, "shape": tuple(shape)}
+        )
+
+    def write(self, arr) -> None:
+        self.f.write(arr.astype(self.dtype, copy=False).tobytes(order="C"))
+
+    def close(self) -> None:
+        self.f.close()
+
+
+def build_matrix(
+    index,
+    base_scores: Sequence[float],
+    caps: Optional[Dict[str, float]],
+    personas: Sequence[Dict[str, Any]],
+    out_dir: Path,
+    k: int = TOPK,
+    memory_mb: float = DEFAULT_MEMORY_MB,
+    ingredients=None,
+) -> Dict[str, Any]:
+    """
+    Write the score matrix / top-k files for personas into out_dir; returns meta.
+    base_scores[pid] = 0.5 * benefit + 0.5 * identity (ProductSelector's final_score before
+    persona adjustments); caps = ProductSelector.BRAND_CAP.
+    """
+    import numpy as np
+
+    from sampler import brand_key
+
+    n = len(index.entries)
+    m = len(personas)
+    base = np.asarray(base_scores, dtype=np.float64).reshape(n)
+    cap_vec = np.array([(caps or {}).get(brand_key(e.brand), np.inf) for e in index.entries], dtype=np.float64)
+    dev = np.asarray(device_mask(index), dtype=bool)
+
+    brand_keys = sorted(index.by_brand)  # "" = products without a brand (reachable via the all-brands fallback)
+    brand_pids = [np.asarray(index.by_brand[bk], dtype=np.int64) for bk in brand_keys]
+    nb = len(brand_keys)
+
+    def profile_row(p):
+        # same order as the live selector: device penalty, then brand cap, then exclusion
+        row = base * np.where(dev, DEVICE_PENALTY, 1.0) if penalizes_devices(p.get("lifestyle")) else base.copy()
+        row = np.minimum(row, cap_vec)
+        if ingredients is not None:
+            row[_bits_to_mask(ingredients.avoid_bits(p.get("ingredient_avoid_list")), n)] = -np.inf
+        return row
+
+    sigs = [profile_signature(p) for p in personas]
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    scores = _NpyWriter(out_dir / "scores.npy", np.float32, (m, n))
+    topk_pid = _NpyWriter(out_dir / "topk_pid.npy", np.int32, (m, nb, k))
+    topk_score = _NpyWriter(out_dir / "topk_score.npy", np.float32, (m, nb, k))
+
+    # per chunk row: float64 score row + sort keys + int64 argsort + float32 copy (~4 x 8 bytes x n)
+    chunk = max(1, int(memory_mb * (1 << 20) // max(1, n * 8 * 4)))
+    for start in range(0, m, chunk):
+        stop = min(m, start + chunk)
+        # personas sharing a profile share a score row: score / sort distinct profiles only
+        local: Dict[str, int] = {}
+        uniq = []
+        for i in range(start, stop):
+            if sigs[i] not in local:
+                local[sigs[i]] = len(uniq)
+                uniq.append(profile_row(personas[i]))
+        block = np.vstack(uniq)
+        inv = np.fromiter((local[sigs[i]] for i in range(start, stop)), dtype=np.int64, count=stop - start)
+
+        tp = np.full((len(uniq), nb, k), -1, dtype=np.int32)
+        ts = np.full((len(uniq), nb, k), -np.inf, dtype=np.float32)
+        for b, pids in enumerate(brand_pids):
+            sub = block[:, pids]
+            # stable sort on -score: ties keep catalog (pid) order, like the selector's list.sort
+            order = np.argsort(-sub, axis=1, kind="stable")[:, :k]
+            top = np.take_along_axis(sub, order, axis=1)
+            valid = np.isfinite(top)
+            kk = top.shape[1]
+            tp[:, b, :kk] = np.where(valid, pids[order], -1)
+            ts[:, b, :kk] = np.where(valid, top, -np.inf)
+
+        scores.write(block.astype(np.float32)[inv])
+        topk_pid.write(tp[inv])
+        topk_score.write(ts[inv])
+    for w in (scores, topk_pid, topk_score):
+        w.close()
+
+    meta = {
+        "version": PERSONA_SCORES_VERSION,
+        "k": k,
+        "n_personas": m,
+        "n_products": n,
+        "names_sha1": index_digest(index),
+        "brand_keys": brand_keys,
+        "persona_ids": [str(p.get("persona_id", "")) for p in personas],
+        "profile_signatures": sigs,
+        "chunk_rows": chunk,
+        "memory_mb": memory_mb,
+    }
+    (out_dir / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+    return meta
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for c in iter(lambda: f.read(1 << 16), b""):
+            h.update(c)
+    return h.hexdigest()
+
+
+def read_personas(path=PERSONAS_CSV) -> List[Dict[str, str]]:
+    with Path(path).open("r", encoding="utf-8-sig", newline="") as f:
+        return [{(k or "").strip(): (v or "").strip() for k, v in r.items()} for r in csv.DictReader(f)]
+
+
+def catalog_base_scores(index, catalog_csv=None) -> Optional[List[float]]:
+    """0.5 * benefit + 0.5 * identity per pid from the affinity artifact (None if unavailable)."""
+    import affinity_scores as aff
+
+    catalog_csv = Path(catalog_csv or aff.CATALOG_CSV)
+    rows = aff._read_csv(catalog_csv)
+    cols = aff.load_affinity_scores(len(rows), aff.names_digest(r.get("상품명", "") for r in rows), catalog_csv)
+    b, i = cols.get("benefit_score"), cols.get("identity_score")
+    if b is None or i is None:
+        return None
+    return [0.5 * float(b[e.row]) + 0.5 * float(i[e.row]) for e in index.entries]
+
+
+def artifact_dir(personas_csv=PERSONAS_CSV, catalog_csv=None, build_dir=BUILD_DIR, k: int = TOPK) -> Path:
+    import affinity_scores as aff
+    from product_selector import ProductSelector
+
+    catalog_csv = Path(catalog_csv or aff.CATALOG_CSV)
+    key = hashlib.sha256(
+        json.dumps(
+            [PERSONA_SCORES_VERSION, k, _sha256(Path(personas_csv)), aff.artifact_dir(catalog_csv).name,
+             ProductSelector.BRAND_CAP, DEVICE_PENALTY, DEVICE_PENALTY_BRANDS],
+            ensure_ascii=False, sort_keys=True,
+        ).encode("utf-8")
+    ).hexdigest()
+    return Path(build_dir) / f"persona_scores.v{PERSONA_SCORES_VERSION}.{key[:16]}"
+
+
+def build_persona_scores(
+    personas_csv=PERSONAS_CSV,
+    catalog_csv=None,
+    build_dir=BUILD_DIR,
+    k: int = TOPK,
+    memory_mb: float = DEFAULT_MEMORY_MB,
+    personas: Optional[Sequence[Dict[str, Any]]] = None,
+    out: Optional[Path] = None,
+    force: bool = False,
+) -> Path:
+    """Build (or reuse) the artifact for the catalog + personas; returns its directory."""
+    import affinity_scores as aff
+    from ingredient_index import IngredientIndex
+    from product_index import ProductIndex
+    from product_selector import ProductSelector
+
+    catalog_csv = Path(catalog_csv or aff.CATALOG_CSV)
+    out = Path(out) if out is not None else artifact_dir(personas_csv, catalog_csv, build_dir, k)
+    if out.exists() and not force:
+        return out
+
+    index = ProductIndex.from_csv(catalog_csv)
+    base = catalog_base_scores(index, catalog_csv)
+    if base is None:
+        raise RuntimeError("affinity scores unavailable (python agent10/affinity_scores.py)")
+    rows = aff._read_csv(catalog_csv)
+    ingredients = IngredientIndex.from_product_index(index, [r.get("전성분", "") for r in rows])
+
+    tmp = out.with_name(out.name + f".tmp{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    build_matrix(
+        index, base, ProductSelector.BRAND_CAP,
+        personas if personas is not None else read_personas(personas_csv),
+        tmp, k=k, memory_mb=memory_mb, ingredients=ingredients,
+    )
+    if force:
+        shutil.rmtree(out, ignore_errors=True)
+    try:
+        os.replace(tmp, out)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# serving
+# ---------------------------------------------------------------------------
+class PersonaScoreTable:
+    """Read-only view over a built artifact (arrays are memory-mapped)."""
+
+    def __init__(self, path: Path):
+        import numpy as np
+
+        self.path = Path(path)
+        meta = json.loads((self.path / "meta.json").read_text(encoding="utf-8"))
+        self.meta = meta
+        self.k = int(meta["k"])
+        self.names_sha1 = meta["names_sha1"]
+        self.brand_pos = {b: i for i, b in enumerate(meta["brand_keys"])}
+        self.persona_pos = {pid: i for i, pid in enumerate(meta["persona_ids"])}
+        self.signatures = meta["profile_signatures"]
+        self.scores = np.load(self.path / "scores.npy", mmap_mode="r")
+        self.topk_pid = np.load(self.path / "topk_pid.npy", mmap_mode="r")
+        self.topk_score = np.load(self.path / "topk_score.npy", mmap_mode="r")
+
+    def persona_row(self, row: Dict[str, Any]) -> Optional[int]:
+        """Table row for a request row, or None if unknown / its profile changed since the build."""
+        i = self.persona_pos.get(str(row.get("persona_id", "")))
+        if i is None or self.signatures[i] != profile_signature(row):
+            return None
+        return i
+
+    def candidates(self, persona_row: int, brand_keys: Iterable[str], topk: int) -> List[Tuple[int, float]]:
+        """
+        Best topk (pid, score) over the given brands, ordered like the live selector
+        (score desc, catalog order on ties). Per-brand top-k lists merge exactly.
+        """
+        merged: List[Tuple[int, float]] = []
+        for bk in brand_keys:
+            b = self.brand_pos.get(bk)
+            if b is None:
+                continue
+            for pid, s in zip(self.topk_pid[persona_row, b].tolist(), self.topk_score[persona_row, b].tolist()):
+                if pid >= 0:
+                    merged.append((pid, s))
+        merged.sort(key=lambda x: (-x[1], x[0]))
+        return merged[:topk]
+
+
+# path -> PersonaScoreTable
+_TABLE_CACHE: Dict[str, PersonaScoreTable] = {}
+
+
+def load_persona_scores(names_sha1: Optional[str] = None, build_if_missing: bool = True) -> Optional[PersonaScoreTable]:
+    """Table for the default catalog + personas (None if unavailable or built for other products)."""
+    try:
+        path = artifact_dir()
+        if not path.exists():
+            if not build_if_missing:
+                return None
+            path = build_persona_scores()
+        table = _TABLE_CACHE.get(str(path))
+        if table is None:
+            table = _TABLE_CACHE[str(path)] = PersonaScoreTable(path)
+    except (OSError, ValueError, KeyError, RuntimeError, ImportError) as e:
+        log.warning("unavailable: %s", e)
+        return None
+    if names_sha1 and table.names_sha1 != names_sha1:
+        return None
+    return table
+
+
+def check_table(personas_csv=PERSONAS_CSV, catalog_csv=None) -> Dict[str, Any]:
+    """
+    Serve every persona x catalog brand from the built table and from live scoring
+    (ProductSelector) and compare the top-k lists. Never builds: a missing table fails.
+    """
+    import affinity_scores as aff
+    from catalog import load_catalog
+    from product_selector import ProductSelector
+
+    sel = ProductSelector(load_catalog(Path(catalog_csv or aff.CATALOG_CSV)), "상품명", "brand")
+    index = sel._ensure_index()
+    table = sel._score_table()
+    if table is None:
+        raise RuntimeError("persona score table not built for this catalog (python agent10/data_build.py)")
+
+    brands = sorted({e.brand.replace(" ", "").lower() for e in index.entries if e.brand})
+    out: Dict[str, Any] = {"personas": 0, "brands": len(brands), "table_hits": 0, "misses": 0, "mismatches": []}
+    for p in read_personas(personas_csv):
+        out["personas"] += 1
+        for b in brands:
+            served = sel._table_candidates(p, b, table.k)
+            if served is None:
+                out["misses"] += 1
+                continue
+            out["table_hits"] += 1
+            live = sel._live_candidates(p, b, table.k)
+            same = [n for n, _ in served] == [n for n, _ in live] and all(
+                abs(x - y) <= 1e-5 for (_, x), (_, y) in zip(served, live)
+            )
+            if not same:
+                out["mismatches"].append({"persona_id": p.get("persona_id"), "brand": b, "table": served, "live": live})
+    return out
+
+
+def synthetic_personas(n: int, base: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """n personas cycling through the real profiles (scale test for the batch build)."""
+    return [dict(base[i % len(base)], persona_id=f"synthetic_{i}") for i in range(n)]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    sys.path.insert(0, str(BASE_DIR))
+    ap = argparse.ArgumentParser(description="Build the persona x product score matrix + per-brand top-k.")
+    ap.add_argument("--personas", default=str(PERSONAS_CSV))
+    ap.add_argument("--k", type=int, default=TOPK)
+    ap.add_argument("--memory-mb", type=float, default=DEFAULT_MEMORY_MB)
+    ap.add_argument("--synthetic", type=int, default=0, help="build for N synthetic personas into --out")
+    ap.add_argument("--out", default="", help="output directory (default: versioned dir under data/build)")
+    ap.add_argument("--force", action="store_true")
+    ap.add_argument("--check", action="store_true", help="compare the built table with live scoring (exit 1 on a difference)")
+    args = ap.parse_args()
+
+    if args.check:
+        res = check_table(args.personas)
+        print(f"[persona_scores] check personas={res['personas']} brands={res['brands']} "
+              f"table_hits={res['table_hits']} misses={res['misses']} mismatches={len(res['mismatches'])}")
+        for m in res["mismatches"][:5]:
+            print(f"  {json.dumps(m, ensure_ascii=False)}")
+        sys.exit(1 if res["misses"] or res["mismatches"] else 0)
+
+    personas = None
+    if args.synthetic:
+        personas = synthetic_personas(args.synthetic, read_personas(args.personas))
+    out = Path(args.out) if args.out else None
+    if personas is not None and out is None:
+        out = BUILD_DIR / f"persona_scores.synthetic{args.synthetic}"
+
+    t0 = time.perf_counter()
+    path = build_persona_scores(
+        args.personas, k=args.k, memory_mb=args.memory_mb, personas=personas, out=out,
+        force=args.force or personas is not None,
+    )
+    meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+    print(
+        f"[persona_scores] {path} personas={meta['n_personas']} products={meta['n_products']} "
+        f"brands={len(meta['brand_keys'])} k={meta['k']} chunk_rows={meta['chunk_rows']} "
+        f"{time.perf_counter() - t0:.2f}s"
+    )
@@ -0,0 +1,401 @@
+# agent10/pipeline_profile.py
+# Built-in profiling mode for run_agent10_test.py / prompt_bench.py / batch_jobs.py (--profile DIR).
+#
+# The pipeline entry points are wrapped for the duration of the run, so every sample /
+# call is attributed to the stage that was running:
+#   select  ProductSelector.select_product
+#   plan    ReActReasoningAgent.plan
+#   narrate StrategyNarrator.generate
+#   repair  StrategyNarrator.repair_slots
+#   verify  MessageVerifier.verify / validate, verify_brand_rules (verifier + MessageVerifier)
+#   other   everything else (catalog / rules / tone index loading, controller glue)
+# The outermost stage wins (a verifier call made from inside the narrator stays "narrate").
+#
+# Modes:
+#   cprofile (default) - deterministic: one cProfile.Profile per stage, switched on stage
+#                        entry / exit. Call counts are exact and identical between runs
+#                        of the same persona / seed against OfflineLLM.
+#   sample             - stack sampler thread (sys._current_frames) every --profile-interval
+#                        seconds: exact stacks, low overhead, statistical counts. Self time
+#                        per component counts the deepest frame of that component, so
+#                        library calls (re, json ...) are charged to their caller.
+#
+# Output (DIR):
+#   profile_<stage>.prof   pstats dump per stage (cprofile mode; snakeviz / pstats)
+#   profile_<stage>.txt    top self-time functions of the stage
+#   stacks.collapsed       "stage;frame;frame <microseconds>" per line (flamegraph.pl,
+#                          speedscope, inferno). In cprofile mode the stacks are rebuilt
+#                          from the caller -> callee edges, time split in proportion.
+#   profile_summary.json   mode, per-stage wall seconds / entries, top-N per component
+# and the top N self-time functions of the narrator, verifier and selector are printed.
+
+import cProfile
+import importlib
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PROFILE_MODES = ("cprofile", "sample")
+DEFAULT_TOP = 15
+DEFAULT_INTERVAL_SEC = 0.001
+OTHER = "other"
+
+# (stage, module, attribute path)
+STAGE_ENTRIES: List[Tuple[str, str, str]] = [
+    ("select", "product_selector", "ProductSelector.select_product"),
+    ("plan", "react_reasoning_agent", "ReActReasoningAgent.plan"),
+    ("narrate", "strategy_narrator", "StrategyNarrator.generate"),
+    ("repair", "strategy_narrator", "StrategyNarrator.repair_slots"),
+    ("verify", "verifier", "MessageVerifier.verify"),
+    ("verify", "verifier", "MessageVerifier.validate"),
+    ("verify", "verifier", "verify_brand_rules"),
+    ("verify", "MessageVerifier", "verify_brand_rules"),
+]
+
+# components for the top-N report: source files (basename) that belong to each
+COMPONENTS: Dict[str, Tuple[str, ...]] = {
+    "narrator": ("strategy_narrator.py", "tone_templates.py"),
+    "verifier": ("verifier.py", "MessageVerifier.py", "keyword_automaton.py", "repair_planner.py"),
+    "selector": ("product_selector.py", "product_index.py", "ingredient_index.py", "sampler.py", "persona_scores.py"),
+}
+
+# collapsed-stack pruning (cprofile mode): deeper paths, and paths under 0.01% of the
+# stage's time (at least 10us), are folded into the parent frame's self time
+_MAX_DEPTH = 64
+_MIN_US = 10
+_MIN_FRACTION = 1e-4
+
+_ADDR_RE = re.compile(r" at 0x[0-9a-fA-F]+")
+
+
+def _label(func: Tuple[str, int, str]) -> str:
+    """pstats key (file, line, name) -> "module:name" ("~" file = builtin)."""
+    filename, _, name = func
+    if filename == "~":
+        # "<built-in method __new__ of type object at 0x7f...>": drop the address (stable across runs)
+        return _ADDR_RE.sub("", name).replace(";", ",")
+    path = Path(filename)
+    module = path.parent.name if path.stem == "__init__" else path.stem
+    return f"{module}:{name}".replace(";", ",")
+
+
+def _component(filename: str) -> str:
+    base = Path(filename).name
+    for comp, files in COMPONENTS.items():
+        if base in files:
+            return comp
+    return ""
+
+
+class PipelineProfiler:
+    """
+    with PipelineProfiler("prof_out", mode="cprofile", top=15) as prof:
+        controller.main(..., llm=OfflineLLM())
+    prof.report() -> summary dict (also written to prof_out/profile_summary.json)
+    """
+
+    def __init__(self, out_dir: Any, mode: str = "cprofile", top: int = DEFAULT_TOP,
+                 interval: float = DEFAULT_INTERVAL_SEC):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"unknown profile mode {mode!r} (expected one of {PROFILE_MODES})")
+        self.out_dir = Path(out_dir)
+        self.mode = mode
+        self.top = int(top)
+        self.interval = float(interval)
+
+        self.stage_seconds: Counter = Counter()
+        self.stage_entries: Counter = Counter()
+        self._stack: List[str] = [OTHER]
+        self._since = 0.0
+        self._restore: List[Tuple[Any, str, Any]] = []
+
+        # cprofile mode
+        self._profiles: Dict[str, cProfile.Profile] = {}
+        # sample mode: (stage, stack labels root-first) -> samples, (stage, leaf file, name) ->
+        # samples, (component, file, name) of the deepest frame of each component -> samples
+        self._samples: Counter = Counter()
+        self._leaf: Counter = Counter()
+        self._component_hits: Counter = Counter()
+        self._n_samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ident = 0
+        self._switch_interval = 0.0
+
+    # -------------------------------------------------
+    # stage switching
+    # -------------------------------------------------
+    def _switch(self, stage: str) -> None:
+        now = time.perf_counter()
+        cur = self._stack[-1]
+        self.stage_seconds[cur] += now - self._since
+        self._since = now
+        if self.mode == "cprofile" and stage != cur:
+            self._profiles[cur].disable()
+            self._profiles.setdefault(stage, cProfile.Profile()).enable()
+
+    def _wrap(self, stage: str, fn: Callable) -> Callable:
+        prof = self
+
+        def _staged(*args: Any, **kwargs: Any) -> Any:
+            if len(prof._stack) > 1:  # outermost stage wins
+                return fn(*args, **kwargs)
+            prof.stage_entries[stage] += 1
+            prof._switch(stage)
+            prof._stack.append(stage)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                prof._switch(OTHER)
+                prof._stack.pop()
+
+        _staged.__name__ = getattr(fn, "__name__", "staged")
+        _staged.__wrapped__ = fn  # type: ignore[attr-defined]
+        return _staged
+
+    def _install(self) -> None:
+        for stage, mod_name, attr in STAGE_ENTRIES:
+            mod = importlib.import_module(mod_name)
+            owner_name, _, name = attr.rpartition(".")
+            owner = getattr(mod, owner_name) if owner_name else mod
+            orig = owner.__dict__.get(name) if isinstance(owner, type) else getattr(owner, name, None)
+            if orig is None:
+                continue
+            staged = self._wrap(stage, orig)
+            self._restore.append((owner, name, orig))
+            setattr(owner, name, staged)
+            if owner_name:
+                continue
+            # module-level functions are imported by name (controller: from verifier import verify_brand_rules)
+            for other in list(sys.modules.values()):
+                if other is mod or getattr(other, "__file__", None) is None:
+                    continue
+                if Path(other.__file__).parent == Path(mod.__file__).parent and getattr(other, name, None) is orig:
+                    self._restore.append((other, name, orig))
+                    setattr(other, name, staged)
+
+    def _uninstall(self) -> None:
+        for owner, name, orig in reversed(self._restore):
+            setattr(owner, name, orig)
+        self._restore = []
+
+    # -------------------------------------------------
+    # sampler
+    # -------------------------------------------------
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._ident)
+            if frame is None:
+                continue
+            stage = self._stack[-1]
+            stack = []
+            seen = set()
+            leaf = (frame.f_code.co_filename, frame.f_code.co_name)
+            while frame is not None:
+                code = frame.f_code
+                stack.append(_label((code.co_filename, code.co_firstlineno, code.co_name)))
+                # time in library code (re, json, pandas ...) is charged to the calling component frame
+                comp = _component(code.co_filename)
+                if comp and comp not in seen:
+                    seen.add(comp)
+                    self._component_hits[(comp, code.co_filename, code.co_name)] += 1
+                frame = frame.f_back
+            stack.reverse()
+            self._samples[(stage, tuple(stack))] += 1
+            self._leaf[(stage,) + leaf] += 1
+            self._n_samples += 1
+
+    # -------------------------------------------------
+    # context manager
+    # -------------------------------------------------
+    def __enter__(self) -> "PipelineProfiler":
+        self._install()
+        self._since = time.perf_counter()
+        if self.mode == "cprofile":
+            self._profiles[OTHER] = cProfile.Profile()
+            self._profiles[OTHER].enable()
+        else:
+            # the sampler only runs when the main thread releases the GIL: switch at the sample rate
+            self._switch_interval = sys.getswitchinterval()
+            sys.setswitchinterval(min(self._switch_interval, self.interval))
+            self._ident = threading.get_ident()
+            self._thread = threading.Thread(target=self._sample_loop, name="agent10-profiler", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stage_seconds[self._stack[-1]] += time.perf_counter() - self._since
+        if self.mode == "cprofile":
+            self._profiles[self._stack[-1]].disable()
+        else:
+            self._stop.set()
+            if self._thread is not None:
+                self._thread.join()
+            sys.setswitchinterval(self._switch_interval)
+        self._uninstall()
+
+    # -------------------------------------------------
+    # reports
+    # -------------------------------------------------
+    def _self_times(self) -> Dict[str, List[Tuple[str, str, float, int]]]:
+        """stage -> [(filename, label, self seconds, calls or samples), ...] sorted by self time."""
+        out: Dict[str, List[Tuple[str, str, float, int]]] = {}
+        if self.mode == "cprofile":
+            for stage, prof in self._profiles.items():
+                st = pstats.Stats(prof)
+                rows = [(f[0], _label(f), v[2], v[1]) for f, v in st.stats.items()]  # type: ignore[attr-defined]
+                out[stage] = sorted(rows, key=lambda r: -r[2])
+        else:
+            per: Dict[str, List[Tuple[str, str, float, int]]] = {}
+            for (stage, filename, name), n in self._leaf.items():
+                per.setdefault(stage, []).append((filename, _label((filename, 0, name)), n * self.interval, n))
+            out = {s: sorted(rows, key=lambda r: -r[2]) for s, rows in per.items()}
+        return out
+
+    def _collapsed(self) -> Counter:
+        """(stage;frame;...;frame) -> microseconds."""
+        folded: Counter = Counter()
+        if self.mode == "sample":
+            for (stage, stack), n in self._samples.items():
+                folded[";".join((stage,) + stack)] += int(n * self.interval * 1e6)
+            return folded
+
+        for stage, prof in self._profiles.items():
+            stats = pstats.Stats(prof).stats  # type: ignore[attr-defined]
+            stage_folded: Counter = Counter()
+            callees: Dict[Any, Dict[Any, Tuple[float, float]]] = {}
+            for func, (_, _, _, _, callers) in stats.items():
+                for caller, edge in callers.items():
+                    callees.setdefault(caller, {})[func] = (edge[2], edge[3])  # (tt, ct) along this edge
+            # root share: time not reached through any recorded caller (a stage entry, or a
+            # frame already running when the stage's profile was switched back on)
+            roots = []
+            for func, (_, _, _, ct, callers) in stats.items():
+                via = sum(edge[3] for caller, edge in callers.items() if caller != func)
+                if ct > 0 and ct - via > ct * 1e-3:
+                    roots.append((func, (ct - via) / ct))
+
+            total_us = sum(v[2] for v in stats.values()) * 1e6
+            min_us = max(_MIN_US, total_us * _MIN_FRACTION)
+
+            def walk(func: Any, path: Tuple[str, ...], share: float, seen: frozenset) -> None:
+                _, _, tt, ct, _ = stats[func]
+                path = path + (_label(func),)
+                if len(path) > _MAX_DEPTH:
+                    stage_folded[";".join(path)] += ct * share * 1e6
+                    return
+                self_us = tt * share * 1e6
+                for child, (_, edge_ct) in callees.get(func, {}).items():
+                    if child in seen:
+                        continue  # recursion: already counted in the outer frame's time
+                    child_ct = stats[child][3]
+                    if edge_ct * share * 1e6 < min_us or not child_ct:
+                        self_us += edge_ct * share * 1e6
+                        continue
+                    walk(child, path, edge_ct * share / child_ct, seen | {child})
+                stage_folded[";".join(path)] += self_us
+
+            for root, share in roots:
+                walk(root, (stage,), share, frozenset({root}))
+            # edge times of mutually recursive frames (import machinery) overlap: rescale
+            # so the stage's stacks add up to its measured total
+            scale = total_us / sum(stage_folded.values()) if stage_folded else 0.0
+            for stack, us in stage_folded.items():
+                folded[stack] += int(us * scale)
+        return Counter({k: v for k, v in folded.items() if v > 0})
+
+    def _format_table(self, rows: List[Tuple[str, str, float, int]], count_label: str) -> str:
+        lines = [f"{'self_ms':>10}{count_label:>10}  function"]
+        for _, label, sec, n in rows[: self.top]:
+            lines.append(f"{sec * 1000:>10.2f}{n:>10}  {label}")
+        return "\n".join(lines)
+
+    def report(self, verbose: bool = True) -> Dict[str, Any]:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        count_label = "calls" if self.mode == "cprofile" else "samples"
+        self_times = self._self_times()
+
+        for stage, rows in self_times.items():
+            (self.out_dir / f"profile_{stage}.txt").write_text(
+                f"[{stage}] top self time ({self.mode})\n" + self._format_table(rows, count_label) + "\n",
+                encoding="utf-8",
+            )
+        if self.mode == "cprofile":
+            for stage, prof in self._profiles.items():
+                prof.dump_stats(str(self.out_dir / f"profile_{stage}.prof"))
+
+        folded = self._collapsed()
+        with (self.out_dir / "stacks.collapsed").open("w", encoding="utf-8") as f:
+            for stack, us in sorted(folded.items()):
+                f.write(f"{stack} {us}\n")
+
+        # top-N per component, over every stage
+        merged: Dict[Tuple[str, str], List[float]] = {}
+        if self.mode == "cprofile":
+            for rows in self_times.values():
+                for filename, label, sec, n in rows:
+                    acc = merged.setdefault((filename, label), [0.0, 0])
+                    acc[0] += sec
+                    acc[1] += n
+        else:
+            for (_, filename, name), n in self._component_hits.items():
+                merged[(filename, _label((filename, 0, name)))] = [n * self.interval, n]
+        components: Dict[str, List[Dict[str, Any]]] = {}
+        for comp in COMPONENTS:
+            rows = sorted(((fn, lb, v[0], v[1]) for (fn, lb), v in merged.items() if _component(fn) == comp),
+                          key=lambda r: -r[2])
+            components[comp] = [
+                {"function": lb, "self_ms": round(sec * 1000, 3), count_label: n} for _, lb, sec, n in rows[: self.top]
+            ]
+
+        summary = {
+            "mode": self.mode,
+            "interval_sec": self.interval if self.mode == "sample" else None,
+            "samples": self._n_samples if self.mode == "sample" else None,
+            "stages": {
+                s: {"seconds": round(self.stage_seconds[s], 4), "entries": self.stage_entries.get(s, 0)}
+                for s in sorted(self.stage_seconds)
+            },
+            "top_self_time": components,
+            "files": sorted(p.name for p in self.out_dir.iterdir()),
+        }
+        (self.out_dir / "profile_summary.json").write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+        if verbose:
+            print(self.format_report(summary, count_label))
+        return summary
+
+    def format_report(self, summary: Dict[str, Any], count_label: str) -> str:
+        buf = io.StringIO()
+        buf.write(f"[profile] mode={self.mode} out={self.out_dir}\n")
+        buf.write(f"{'stage':<10}{'seconds':>10}{'entries':>9}\n")
+        for s, b in summary["stages"].items():
+            buf.write(f"{s:<10}{b['seconds']:>10.3f}{b['entries']:>9}\n")
+        for comp, rows in summary["top_self_time"].items():
+            buf.write(f"[profile] top {self.top} self time: {comp}\n")
+            buf.write(f"{'self_ms':>10}{count_label:>10}  function\n")
+            for r in rows:
+                buf.write(f"{r['self_ms']:>10.2f}{r[count_label]:>10}  {r['function']}\n")
+        return buf.getvalue().rstrip("\n")
+
+
+def add_profile_args(ap: Any) -> None:
+    """--profile DIR / --profile-mode / --profile-top / --profile-interval for the runner CLIs."""
+    ap.add_argument("--profile", default="", metavar="DIR",
+                    help="profile the run (per-stage profiles, stacks.collapsed, top self time) into DIR")
+    ap.add_argument("--profile-mode", choices=PROFILE_MODES, default=os.getenv("AGENT10_PROFILE_MODE", "cprofile"))
+    ap.add_argument("--profile-top", type=int, default=DEFAULT_TOP)
+    ap.add_argument("--profile-interval", type=float, default=DEFAULT_INTERVAL_SEC, help="sample mode period (seconds)")
+
+
+def profiler_from_args(args: Any) -> Optional[PipelineProfiler]:
+    if not getattr(args, "profile", ""):
+        return None
+    return PipelineProfiler(args.profile, mode=args.profile_mode, top=args.profile_top, interval=args.profile_interval)
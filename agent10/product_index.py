@@ -0,0 +1,292 @@
+# agent10/product_index.py
+# Shared product-name index (selector / verifier / controller fallback).
+#
+# Product names used to be normalized three different ways, with regexes run on
+# every lookup. The index is built once per catalog file and holds, per unique
+# product name (first occurrence wins, catalog order preserved):
+#   pid (canonical id), name, normalized key (no whitespace), volume-stripped key
+#   (10ml/30ml ... removed), brand, category, subcategory, source row position
+# Exact / normalized / volume-stripped lookups are dict hits; normalization of
+# names coming from elsewhere (anchors, LLM output) is memoized.
+#
+# Facets: one pid bitset per category / subcategory / derived product type
+# (mask_pack, device, supplement), so category restriction is a bitset AND and
+# per-product type checks are flag reads instead of keyword scans.
+
+import csv
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_CATALOG_CSV = BASE_DIR.parent / "data" / "amore_with_category.csv"
+
+_WS_RE = re.compile(r"\s+")
+_VOLUME_RE = re.compile(r"\d+(ml|ML|mL)")
+
+# derived product type -> (categories, subcategories, name keywords)
+# name keywords keep the old heuristics (narrator mask-pack check, selector "디바이스" in name).
+# mask_pack ignores subcategory 마스크팩: the catalog puts 팩트 / 리필팩 / 팩패드 there too.
+PRODUCT_TYPES: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[str, ...]]] = {
+    "mask_pack": ((), (), ("마스크", "시트", "sheet")),
+    "device": (("디바이스",), ("스킨기기",), ("디바이스",)),
+    "supplement": (("건기식",), ("기능성식품",), ()),
+}
+
+
+@lru_cache(maxsize=65536)
+def name_variants(name: str) -> Tuple[str, str]:
+    """(whitespace-stripped key, volume-stripped key) for a product name."""
+    key = _WS_RE.sub("", name or "")
+    return key, _VOLUME_RE.sub("", key).strip()
+
+
+def normalize_product_key(name: str) -> str:
+    """Lookup key used by the verifier: whitespace and ml volume tokens removed."""
+    return name_variants(name or "")[1]
+
+
+def brand_filter_key(v: Any) -> str:
+    """Selector brand matching key (spaces removed, lowercase)."""
+    return str(v).strip().replace(" ", "").lower() if v is not None else ""
+
+
+class ProductEntry(NamedTuple):
+    pid: int
+    name: str
+    key: str
+    stripped_key: str
+    brand: str
+    brand_key: str
+    category: str
+    subcategory: str
+    row: int
+    types: FrozenSet[str] = frozenset()
+
+    @property
+    def is_mask_pack(self) -> bool:
+        return "mask_pack" in self.types
+
+    @property
+    def is_device(self) -> bool:
+        return "device" in self.types
+
+    @property
+    def is_supplement(self) -> bool:
+        return "supplement" in self.types
+
+
+def product_types(name: str, category: str, subcategory: str) -> FrozenSet[str]:
+    out = []
+    for t, (cats, subs, kws) in PRODUCT_TYPES.items():
+        if category in cats or subcategory in subs or any(k in name for k in kws):
+            out.append(t)
+    return frozenset(out)
+
+
+class ProductIndex:
+    def __init__(self, records: Iterable[Dict[str, Any]], name_col: str = "상품명", brand_col: str = "brand"):
+        self.entries: List[ProductEntry] = []
+        self.by_name: Dict[str, int] = {}
+        self.by_key: Dict[str, int] = {}
+        self.by_stripped: Dict[str, int] = {}
+        self.by_brand: Dict[str, List[int]] = {}
+        self._brand_filter_cache: Dict[str, Tuple[int, ...]] = {}
+        self._brand_bits_cache: Dict[str, int] = {}
+        # "category:스킨케어" / "subcategory:마스크팩" / "type:device" -> pid bitset
+        self.facets: Dict[str, int] = {}
+        self._brand_map: Optional[Dict[str, str]] = None
+
+        for pos, rec in enumerate(records):
+            name = _clean(rec.get(name_col))
+            if not name or name in self.by_name:
+                continue
+            key, stripped = name_variants(name)
+            brand = _clean(rec.get(brand_col))
+            category = _clean(rec.get("category"))
+            subcategory = _clean(rec.get("subcategory"))
+            e = ProductEntry(
+                pid=len(self.entries),
+                name=name,
+                key=key,
+                stripped_key=stripped,
+                brand=brand,
+                brand_key=brand_filter_key(brand),
+                category=category,
+                subcategory=subcategory,
+                row=pos,
+                types=product_types(name, category, subcategory),
+            )
+            bit = 1 << e.pid
+            for facet in self._facet_keys(e):
+                self.facets[facet] = self.facets.get(facet, 0) | bit
+            self.entries.append(e)
+            self.by_name[name] = e.pid
+            self.by_key.setdefault(key, e.pid)
+            if stripped:
+                self.by_stripped.setdefault(stripped, e.pid)
+            self.by_brand.setdefault(e.brand_key, []).append(e.pid)
+
+    # ---- constructors ----
+    @classmethod
+    def from_csv(cls, path=DEFAULT_CATALOG_CSV) -> "ProductIndex":
+        path = Path(path)
+        if not path.exists():
+            return cls([])
+        from data_build import columnar_path, read_records
+
+        if columnar_path(path) is not None:
+            # fresh columnar build: only the indexed columns are read
+            return cls(read_records(path, ["상품명", "brand", "category", "subcategory"], strip=False))
+        with path.open("r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f)
+            if reader.fieldnames:
+                reader.fieldnames = [(fn or "").strip() for fn in reader.fieldnames]
+            return cls(reader)
+
+    @classmethod
+    def from_frame(cls, df: Any, name_col: str = "상품명", brand_col: str = "brand") -> "ProductIndex":
+        """Build from an already loaded DataFrame (row positions refer to df rows)."""
+        cols = [c for c in (name_col, brand_col, "category", "subcategory") if c in df.columns]
+        values = {c: df[c].tolist() for c in cols}
+        n = len(df)
+        return cls(({c: values[c][i] for c in cols} for i in range(n)), name_col=name_col, brand_col=brand_col)
+
+    # ---- lookups ----
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def names(self) -> List[str]:
+        return [e.name for e in self.entries]
+
+    def lookup(self, name: str) -> Optional[ProductEntry]:
+        """Exact name -> whitespace-normalized -> volume-stripped match."""
+        if not name:
+            return None
+        pid = self.by_name.get(name)
+        if pid is None:
+            key, stripped = name_variants(name)
+            pid = self.by_key.get(key)
+            if pid is None:
+                pid = self.by_stripped.get(stripped)
+            if pid is None:
+                # input still carries volume variants the stripped form lost
+                pid = self.by_stripped.get(key)
+        return self.entries[pid] if pid is not None else None
+
+    def brand_of(self, name: str) -> str:
+        e = self.lookup(name)
+        return e.brand if e is not None else ""
+
+    def brand_map(self) -> Dict[str, str]:
+        """Volume-stripped key -> brand (first occurrence); shared, do not mutate."""
+        if self._brand_map is None:
+            m: Dict[str, str] = {}
+            for e in self.entries:
+                if e.stripped_key and e.brand:
+                    m.setdefault(e.stripped_key, e.brand)
+            self._brand_map = m
+        return self._brand_map
+
+    def for_brand(self, filter_brand: str) -> Tuple[int, ...]:
+        """
+        pids whose brand matches the selector filter (substring either way, catalog order).
+        "" -> all products. Resolved once per filter over the distinct brands.
+        """
+        fk = brand_filter_key(filter_brand)
+        hit = self._brand_filter_cache.get(fk)
+        if hit is not None:
+            return hit
+        if not fk:
+            pids = tuple(range(len(self.entries)))
+        else:
+            ok = set(self.brand_keys_for(fk))
+            pids = tuple(e.pid for e in self.entries if e.brand_key in ok)
+        self._brand_filter_cache[fk] = pids
+        return pids
+
+    def brand_keys_for(self, filter_brand: str) -> List[str]:
+        """Distinct brand keys matched by the selector filter ("" -> all, incl. brandless)."""
+        fk = brand_filter_key(filter_brand)
+        if not fk:
+            return list(self.by_brand)
+        # products without a brand never match a brand filter
+        return [bk for bk in self.by_brand if bk and (fk in bk or bk in fk)]
+
+    @staticmethod
+    def _facet_keys(e: ProductEntry) -> List[str]:
+        keys = [f"type:{t}" for t in e.types]
+        if e.category:
+            keys.append(f"category:{e.category}")
+        if e.subcategory:
+            keys.append(f"subcategory:{e.subcategory}")
+        return keys
+
+    def facet_bits(self, facet: str) -> int:
+        """pid bitset of one facet ("category:스킨케어", "subcategory:마스크팩", "type:device")."""
+        return self.facets.get(facet, 0)
+
+    def category_bits(self, categories) -> int:
+        """
+        Union of the given category / subcategory values (list or comma string).
+        A value may be a bare name (matched as category or subcategory) or a facet key.
+        """
+        if isinstance(categories, str):
+            categories = categories.split(",")
+        bits = 0
+        for c in categories or ():
+            c = str(c).strip()
+            if not c:
+                continue
+            if ":" in c:
+                bits |= self.facets.get(c, 0)
+            else:
+                bits |= self.facets.get(f"category:{c}", 0) | self.facets.get(f"subcategory:{c}", 0)
+        return bits
+
+    def brand_bits(self, filter_brand: str) -> int:
+        """for_brand() as a pid bitset (bit i = pid i), for AND-NOT filtering."""
+        fk = brand_filter_key(filter_brand)
+        bits = self._brand_bits_cache.get(fk)
+        if bits is None:
+            bits = 0
+            for pid in self.for_brand(fk):
+                bits |= 1 << pid
+            self._brand_bits_cache[fk] = bits
+        return bits
+
+
+def _clean(v: Any) -> str:
+    if v is None:
+        return ""
+    s = str(v).strip()
+    return "" if s.lower() == "nan" else s
+
+
+# path -> ((mtime_ns, size), ProductIndex)
+_INDEX_CACHE: Dict[str, Tuple[Tuple[int, int], ProductIndex]] = {}
+
+
+def load_product_index(path=DEFAULT_CATALOG_CSV) -> ProductIndex:
+    """Catalog index, built once per process and rebuilt when the file changes."""
+    path = Path(path)
+    try:
+        st = path.stat()
+        stamp = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        stamp = (0, 0)
+    cached = _INDEX_CACHE.get(str(path))
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    from shared_catalog import attached_catalog
+
+    # pool workers attach the memory-mapped catalog instead of re-reading the CSV
+    shared = attached_catalog(path)
+    if shared is not None:
+        idx = ProductIndex(shared.records(["상품명", "brand", "category", "subcategory"]))
+    else:
+        idx = ProductIndex.from_csv(path)
+    _INDEX_CACHE[str(path)] = (stamp, idx)
+    return idx
@@ -1,11 +1,29 @@
 from __future__ import annotations
 from typing import Any, Dict, List, Optional, Tuple
-import sys
 import random
-import numpy as np
-import pandas as pd
 from pathlib import Path
 
+from agent_logging import DEBUG, get_logger
+
+log = get_logger("product_selector")
+
+# (catalog path, mtime_ns, size, name_col, brand_col, rows) -> index state shared by every
+# selector over that file: controller.main() builds a fresh ProductSelector per call.
+_INDEX_CACHE: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+
+
+def _catalog_key(df: Any, name_col: Optional[str], brand_col: Optional[str]) -> Optional[Tuple[Any, ...]]:
+    """Cache key for catalogs that know their file (Catalog / SharedCatalog); None for plain frames."""
+    path = getattr(df, "path", None)
+    if not isinstance(path, (str, Path)):  # plain DataFrame (or a column named "path")
+        return None
+    try:
+        st = Path(path).stat()
+    except OSError:
+        return None
+    return (str(path), st.st_mtime_ns, st.st_size, name_col, brand_col, len(df))
+
+
 class ProductSelector:
     """
     [ProductSelector v4.0 - Self Healing]
@@ -29,42 +47,142 @@ class ProductSelector:
 
     def _brand_key(self, raw: Any) -> str:
         """Normalize brand string for dictionary lookup."""
-        s = self._s(raw)
-        return s.replace(" ", "")
+        from sampler import brand_key
+
+        return brand_key(raw)
 
     def _apply_brand_cap(self, score: float, brand_raw: Any) -> float:
         """Method A: cap score by brand."""
-        b = self._brand_key(brand_raw)
-        cap = self.BRAND_CAP.get(b)
-        if cap is None:
-            return float(score)
-        return float(min(score, cap))
-
-    def _softmax_probs(self, scores: List[float], temperature: float) -> List[float]:
-        """Method B: brand-level softmax sampling over scores (numerically stable)."""
-        if not scores:
-            return []
-        t = float(temperature) if float(temperature) > 0 else 1.0
-        x = np.array(scores, dtype=np.float64) / t
-        x = x - np.max(x)
-        ex = np.exp(x)
-        s = float(np.sum(ex))
-        if s <= 0.0 or not np.isfinite(s):
-            # fallback to uniform
-            return [1.0 / len(scores)] * len(scores)
-        probs = (ex / s).tolist()
-        return [float(p) for p in probs]
+        from sampler import cap_scores
+
+        return float(cap_scores([score], [brand_raw], self.BRAND_CAP)[0])
 
     def __init__(self, df: Optional[Any] = None, name_col: Optional[str] = None, brand_col: Optional[str] = None):
-        print(">>> [DEBUG] ProductSelector v4.0 (Self-Healing) Loaded", file=sys.stdout, flush=True)
+        log.debug("ProductSelector v4.0 (Self-Healing) loaded")
         self.df = df
         self.name_col = name_col
         self.brand_col = brand_col
+        self._index = None
+        self._index_src = None
+        self._state: Dict[str, Any] = {}
+        self.last_skip = ""
 
     def configure(self, df: Any, name_col: str, brand_col: str) -> None:
         self.df = df
         self.name_col = name_col
         self.brand_col = brand_col
+        self._index = None
+        self._index_src = None
+
+    def _ensure_index(self):
+        """
+        Shared product index over the current df (one entry per unique product name,
+        first row wins), rebuilt only when df / columns change. Per-product score
+        columns are pulled once as positional arrays. Catalogs loaded from a file share
+        this state across selectors per (path, mtime, size), like load_product_index.
+        """
+        src = (id(self.df), self.name_col, self.brand_col)
+        if self._index is not None and self._index_src == src:
+            return self._index
+
+        key = _catalog_key(self.df, self.name_col, self.brand_col)
+        state = _INDEX_CACHE.get(key) if key is not None else None
+        if state is None:
+            state = self._build_index_state()
+            if key is not None:
+                _INDEX_CACHE[key] = state
+        self._state = state
+        self._index = state["index"]
+        self._index_src = src
+        self._score_cols = state["score_cols"]
+        self._scores_from_artifact = state["scores_from_artifact"]
+        return self._index
+
+    def _build_index_state(self) -> Dict[str, Any]:
+        from product_index import ProductIndex
+
+        index = ProductIndex.from_frame(self.df, self.name_col, self.brand_col)
+        score_cols = {
+            c: self.df[c].tolist() for c in ("benefit_score", "identity_score") if c in self.df.columns
+        }
+        from_artifact = False
+        if len(score_cols) < 2:
+            # catalog has no score columns -> offline affinity artifact (memory-mapped,
+            # used only if it is row-aligned with this df). Built by prepare_artifacts /
+            # affinity_scores.py, never on the serving path.
+            from affinity_scores import load_affinity_scores, names_digest
+
+            digest = names_digest(self.df[self.name_col].tolist())
+            for c, arr in load_affinity_scores(len(self.df), digest, build_if_missing=False).items():
+                score_cols.setdefault(c, arr)
+            from_artifact = len(score_cols) == 2
+        if len(score_cols) < 2:
+            log.warning("no affinity scores for %d products, every product ties at 0.0 "
+                        "(build them: python agent10/data_build.py)", len(self.df))
+        return {
+            "index": index,
+            "score_cols": score_cols,
+            "scores_from_artifact": from_artifact,
+            "table": None,
+            # 전성분 inverted index: built on the first live-scored request (table hits never
+            # touch the 전성분 column, which is most of the catalog's bytes)
+            "ingredients": None,
+        }
+
+    def _ingredient_index(self):
+        """전성분 inverted index (ingredient_avoid_list 제외용), same pids as the product index."""
+        state = self._state
+        if state["ingredients"] is None and "전성분" in self.df.columns:
+            from ingredient_index import IngredientIndex
+
+            state["ingredients"] = IngredientIndex.from_product_index(self._index, self.df["전성분"].tolist())
+        return state["ingredients"]
+
+    def _score_table(self):
+        """
+        Precomputed persona x product top-k table (persona_scores.py), only when this
+        selector scores from the same affinity artifact and product index it was built from.
+        """
+        state = self._state
+        if state["table"] is None:
+            state["table"] = False
+            if self._scores_from_artifact:
+                from persona_scores import index_digest, load_persona_scores
+
+                # built by prepare_artifacts / persona_scores.py, never on the serving path
+                state["table"] = load_persona_scores(index_digest(self._index), build_if_missing=False) or False
+                if state["table"] is False:
+                    log.warning("no persona score table for this catalog, products are scored live "
+                                "(build it: python agent10/data_build.py)")
+        return state["table"] or None
+
+    def _table_candidates(self, row: Dict[str, Any], target_brand: str, topk: int) -> Optional[List[Tuple[str, float]]]:
+        """Candidates from the precomputed table, or None when the request must be scored live."""
+        if row.get("allowed_categories") or "전성분" not in self.df.columns:
+            return None
+        table = self._score_table()
+        if table is None or topk > table.k:
+            return None
+        i = table.persona_row(row)
+        if i is None:
+            return None
+        index = self._index
+        brand_keys = index.brand_keys_for(target_brand) if target_brand else []
+        hits = table.candidates(i, brand_keys, topk) if brand_keys else []
+        if not hits and brand_keys:
+            # the brand has products, the avoid list excluded all of them: no other brand's product
+            self._skip(row, target_brand)
+            return []
+        if not hits:
+            hits = table.candidates(i, index.brand_keys_for(""), topk)
+            if not hits:
+                self._skip(row, "")
+        return [(index.entries[pid].name, s) for pid, s in hits]
+
+    def _skip(self, row: Dict[str, Any], target_brand: str) -> None:
+        self.last_skip = "ingredient_avoid_list"
+        log.warning("ingredient_avoid_list=%r excludes every product of %r (persona=%s): no product",
+                    row.get("ingredient_avoid_list"), target_brand or "*", row.get("persona_id"))
 
     def _s(self, val: Any) -> str:
         return str(val).strip() if val is not None else ""
@@ -74,7 +192,8 @@ class ProductSelector:
         if self.df is not None and not self.df.empty:
             return
 
-        print(">>> [DEBUG] 🚨 DataFrame is missing! Attempting auto-load...", file=sys.stdout, flush=True)
+        log.info("DataFrame is missing, attempting auto-load")
+        from catalog import load_catalog
 
         current_dir = Path(__file__).resolve().parent
         candidates = [
@@ -83,54 +202,105 @@ class ProductSelector:
             Path("/Users/mac/Desktop/AMORE/Amore-Crm-Explainable-Agent/data/amore_with_category.csv"),
         ]
 
+        from shared_catalog import attached_catalog
+
         for path in candidates:
+            # pool workers: memory-mapped catalog attached by the initializer
+            shared = attached_catalog(path)
+            if shared is not None and not shared.empty:
+                self.df = shared
+                self.name_col = "상품명" if "상품명" in shared.columns else shared.columns[0]
+                self.brand_col = "brand" if "brand" in shared.columns else "브랜드"
+                log.info("attached shared catalog %s (%d products)", shared.path, len(shared))
+                return
             if path.exists():
                 try:
-                    print(f">>> [DEBUG] Found data file at: {path}", file=sys.stdout, flush=True)
-                    self.df = pd.read_csv(path)
+                    log.info("found data file at %s", path)
+                    self.df = load_catalog(path)
                     self.name_col = "상품명" if "상품명" in self.df.columns else self.df.columns[0]
                     self.brand_col = "brand" if "brand" in self.df.columns else "브랜드"
-                    print(f">>> [DEBUG] Auto-loaded {len(self.df)} products.", file=sys.stdout, flush=True)
+                    log.info("auto-loaded %d products", len(self.df))
                     return
                 except Exception as e:
-                    print(f">>> [DEBUG] Failed to load {path}: {e}", file=sys.stdout, flush=True)
+                    log.warning("failed to load %s: %s", path, e)
 
-        print(">>> [DEBUG] ❌ CRITICAL: Could not auto-load any data file.", file=sys.stdout, flush=True)
+        log.error("could not auto-load any data file")
 
-    def select_product(self, row: Dict[str, Any], topk: int = 3) -> Tuple[str, float]:
+    def select_product(self, row: Dict[str, Any], topk: int = 3, rng: Optional[Any] = None) -> Tuple[str, float]:
         # 1. 데이터 확인 및 자가 복구
         self._ensure_df_loaded()
 
         if self.df is None or self.df.empty:
             return "추천 제품 없음 (데이터 로드 실패)", 0.0
 
+        # "" or why the last call returned no product ("ingredient_avoid_list")
+        self.last_skip = ""
+
         # 2. 타겟 브랜드 확인
         target_brand_raw = row.get("brand", "")
         target_brand = self._s(target_brand_raw).replace(" ", "").lower()
-        print(f">>> [DEBUG] Target Brand: '{target_brand}'", file=sys.stdout, flush=True)
-
-        def _get_candidates(filter_brand: str = ""):
-            cands = []
-            unique_names = self.df[self.name_col].unique()
-            for name in unique_names:
-                sub_df = self.df[self.df[self.name_col] == name]
-                if sub_df.empty:
-                    continue
+        log.debug("target brand: %r", target_brand)
 
-                p_brand_raw = self._s(sub_df.iloc[0][self.brand_col])
-                p_brand = p_brand_raw.replace(" ", "").lower()
+        self._ensure_index()
 
-                if filter_brand:
-                    if (filter_brand not in p_brand) and (p_brand not in filter_brand):
-                        continue
+        # persona x product table lookup (fixed personas, precomputed offline)
+        top_candidates = self._table_candidates(row, target_brand, topk)
+        if top_candidates is not None:
+            log.debug("table hit persona=%s -> %d candidates", row.get("persona_id"), len(top_candidates))
+        else:
+            top_candidates = self._live_candidates(row, target_brand, topk)
+        if not top_candidates:
+            # nothing the persona may use (avoid list): no product rather than an avoided one
+            # or another brand's; the reason is left in last_skip for the caller
+            return "", 0.0
+        return self._sample(top_candidates, rng)
+
+    def _live_candidates(self, row: Dict[str, Any], target_brand: str, topk: int) -> List[Tuple[str, float]]:
+        """Best topk (name, score) scored on the fly (the persona table holds the same ranking)."""
+        index = self._ensure_index()
+        benefit = self._score_cols.get("benefit_score")
+        identity = self._score_cols.get("identity_score")
+
+        # products containing any avoided ingredient ("-" / empty -> none)
+        avoid_bits = 0
+        ingredients = self._ingredient_index()
+        if ingredients is not None:
+            avoid_bits = ingredients.avoid_bits(row.get("ingredient_avoid_list"))
+            if avoid_bits and log.isEnabledFor(DEBUG):
+                log.debug("ingredient_avoid_list=%r excludes %d products",
+                          row.get("ingredient_avoid_list"), bin(avoid_bits).count("1"))
+
+        # optional per-persona category restriction (category / subcategory names or facet keys)
+        allow_bits = -1  # all products
+        allowed = row.get("allowed_categories")
+        if allowed:
+            bits = index.category_bits(allowed)
+            if bits:
+                allow_bits = bits
+            else:
+                log.debug("allowed_categories=%r matches no products (ignored)", allowed)
+
+        from ingredient_index import iter_bits
+
+        from persona_scores import penalizes_devices
+
+        penalize_devices = penalizes_devices(row.get("lifestyle", ""))
 
-                sim_benefit = float(sub_df.iloc[0]["benefit_score"]) if "benefit_score" in sub_df.columns else 0.0
-                sim_identity = float(sub_df.iloc[0]["identity_score"]) if "identity_score" in sub_df.columns else 0.0
+        def _get_candidates(filter_brand: str = ""):
+            cands = []
+            # brand filter (substring either way) resolved once per brand by the index;
+            # category facets ANDed in, avoided ingredients removed with a single AND-NOT
+            for pid in iter_bits(index.brand_bits(filter_brand) & allow_bits & ~avoid_bits):
+                e = index.entries[pid]
+                name = e.name
+                p_brand_raw = e.brand
+
+                sim_benefit = float(benefit[e.row]) if benefit is not None else 0.0
+                sim_identity = float(identity[e.row]) if identity is not None else 0.0
                 final_score = (0.5 * sim_benefit) + (0.5 * sim_identity)
 
-                lifestyle = str(row.get("lifestyle", ""))
-                if "바쁜" in lifestyle or "간편" in lifestyle:
-                    if "메이크온" in p_brand_raw or "디바이스" in name:
+                if penalize_devices:
+                    if "메이크온" in p_brand_raw or e.is_device:
                         final_score *= 0.1
 
                 # Method A: brand score cap (prevents collapse)
@@ -140,32 +310,31 @@ class ProductSelector:
             return cands
 
         candidates = []
-        if target_brand:
+        if target_brand and index.brand_bits(target_brand) & allow_bits:
             candidates = _get_candidates(target_brand)
-            print(f">>> [DEBUG] Found {len(candidates)} products for '{target_brand}'", file=sys.stdout, flush=True)
+            log.debug("found %d products for %r", len(candidates), target_brand)
+            if not candidates:
+                # the brand has products, the avoid list excluded all of them: no other brand's product
+                self._skip(row, target_brand)
+                return []
 
         if not candidates:
-            print(">>> [DEBUG] ⚠️ No products found! Fallback to ALL brands.", file=sys.stdout, flush=True)
+            log.debug("no products found, falling back to all brands")
             candidates = _get_candidates("")
-
-        if not candidates:
-            first_prod = self.df.iloc[0][self.name_col]
-            return first_prod, 0.1
+            if not candidates and avoid_bits:
+                self._skip(row, "")
 
         candidates.sort(key=lambda x: x[1], reverse=True)
-        top_candidates = candidates[:topk]
+        return candidates[:topk]
 
+    def _sample(self, top_candidates: List[Tuple[str, float]], rng: Optional[Any] = None) -> Tuple[str, float]:
         best = top_candidates[0]
-        print(f">>> [DEBUG] Selected: {best[0]} ({best[1]:.4f})", file=sys.stdout, flush=True)
+        log.debug("selected: %s (%.4f)", best[0], best[1])
 
-        # Method B: softmax sampling (flattens small score gaps)
-        scores = [float(c[1]) for c in top_candidates]
-        probs = self._softmax_probs(scores, self.SOFTMAX_TEMPERATURE)
+        # Method B: softmax sampling (flattens small score gaps), shared Gumbel-top-k sampler
+        from sampler import sample_one
 
-        if probs and len(probs) == len(top_candidates):
-            idx = int(np.random.choice(len(top_candidates), p=probs))
-            chosen = top_candidates[idx]
-        else:
-            chosen = top_candidates[0]
+        idx = sample_one([float(c[1]) for c in top_candidates], self.SOFTMAX_TEMPERATURE, rng=rng)
+        chosen = top_candidates[idx] if idx >= 0 else top_candidates[0]
 
-        return chosen[0], float(chosen[1])
\ No newline at end of file
+        return chosen[0], float(chosen[1])
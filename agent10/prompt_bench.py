@@ -0,0 +1,203 @@
+# agent10/prompt_bench.py
+# Prompt mode benchmark: full vs compact narrator / planner prompts.
+#
+# Runs controller.main() for the same personas and seeds once per prompt mode
+# against the offline simulator (offline_llm.OfflineLLM), and reports:
+#   - estimated prompt / completion tokens per stage (token_ledger)
+#   - simulated LLM latency (overhead + prefill + decode model) and pipeline wall time
+#   - quality: MessageVerifier.verify() errors/warnings and validate() errors per message
+#
+# Usage:
+#   python agent10/prompt_bench.py                  # 20 personas, seed 7
+#   python agent10/prompt_bench.py --personas 50 --json out.json
+#   python agent10/prompt_bench.py --personas 5 --profile prof/   # pipeline_profile over both modes
+#   python agent10/prompt_bench.py --personas 8 --processes 2 --check-sequential
+#       # personas in a process pool attached to the shared catalog (controller.main_many),
+#       # checked against the in-process run (same messages / token counts)
+
+import contextlib
+import csv
+import hashlib
+import io
+import json
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List
+
+BASE_DIR = Path(__file__).resolve().parent
+PERSONA_CSV = BASE_DIR.parent / "data" / "persona_meta_v2.csv"
+
+
+def _persona_ids(limit: int) -> List[str]:
+    with PERSONA_CSV.open("r", encoding="utf-8-sig", newline="") as f:
+        ids = list(dict.fromkeys((r.get("persona_id") or "").strip() for r in csv.DictReader(f)))
+    return [p for p in ids if p][:limit]
+
+
+def _split_message(message: str):
+    title, _, body = (message or "").partition("\n")
+    return title.replace("TITLE:", "", 1).strip(), body.replace("BODY:", "", 1).strip()
+
+
+def _run_personas(mode: str, persona_ids: List[str], seed: int, topk: int, output_mode: str, processes: int):
+    """(results, run_stats, simulated LLM sec) per persona + pipeline wall time."""
+    from controller import main, main_many
+    from offline_llm import OfflineLLM
+
+    kwargs = dict(topk=topk, verbose=False, seed=seed, prompt_mode=mode, output_mode=output_mode)
+    t0 = time.perf_counter()
+    # controller progress prints are not part of the benchmark output
+    with contextlib.redirect_stdout(io.StringIO()):
+        if processes > 1:
+            # process pool over the shared memory-mapped catalog (controller.main_many)
+            runs = [(results, stats, stats["llm_simulated_sec"]) for results, stats in
+                    main_many(persona_ids, processes=processes, with_stats=True, llm=OfflineLLM(), **kwargs)]
+            return runs, time.perf_counter() - t0
+        runs = []
+        wall = 0.0
+        for pid in persona_ids:
+            llm = OfflineLLM()
+            stats: Dict[str, Any] = {}
+            t1 = time.perf_counter()
+            results = main(pid, run_stats=stats, llm=llm, **kwargs)
+            wall += time.perf_counter() - t1
+            runs.append((results, stats, llm.simulated_seconds))
+    return runs, wall
+
+
+def run_mode(
+    mode: str, persona_ids: List[str], seed: int, topk: int = 3, output_mode: str = "text", processes: int = 1,
+) -> Dict[str, Any]:
+    from verifier import MessageVerifier
+
+    verifier = MessageVerifier()
+    stage_tokens: Counter = Counter()
+    stage_calls: Counter = Counter()
+    verify_errors: Counter = Counter()
+    verify_warnings: Counter = Counter()
+    validate_errors: Counter = Counter()
+    n_messages = 0
+    n_clean = 0
+    sim_sec = 0.0
+    messages = hashlib.sha1()
+
+    runs, wall = _run_personas(mode, persona_ids, seed, topk, output_mode, processes)
+    for results, stats, llm_sec in runs:
+        sim_sec += llm_sec
+
+        for stage, b in stats["tokens"]["by_stage"].items():
+            stage_tokens[(stage, "prompt")] += b["prompt_tokens"]
+            stage_tokens[(stage, "completion")] += b["completion_tokens"]
+            stage_calls[stage] += b["calls"]
+
+        for r in results:
+            if not r.get("message"):
+                continue
+            n_messages += 1
+            messages.update(r["message"].encode("utf-8") + b"\0")
+            title, body = _split_message(r["message"])
+            plan = dict(r.get("plan") or {})
+            plan.setdefault("brand_name_slot", (r.get("row") or {}).get("brand_name_slot"))
+            v = verifier.verify({"title": title, "body": body}, plan)
+            verify_errors.update(v["errors"])
+            verify_warnings.update(v["warnings"])
+            errs = verifier.validate(r.get("row") or {}, title, body)
+            validate_errors.update(errs)
+            if not v["errors"] and not errs:
+                n_clean += 1
+
+    stages = sorted(stage_calls)
+    return {
+        "mode": mode,
+        "output_mode": output_mode,
+        "personas": len(persona_ids),
+        "messages": n_messages,
+        "clean_messages": n_clean,
+        "llm_calls": sum(stage_calls.values()),
+        "prompt_tokens": sum(v for (s, k), v in stage_tokens.items() if k == "prompt"),
+        "completion_tokens": sum(v for (s, k), v in stage_tokens.items() if k == "completion"),
+        "by_stage": {
+            s: {
+                "calls": stage_calls[s],
+                "prompt_tokens": stage_tokens[(s, "prompt")],
+                "completion_tokens": stage_tokens[(s, "completion")],
+            }
+            for s in stages
+        },
+        "simulated_llm_sec": round(sim_sec, 3),
+        "pipeline_wall_sec": round(wall, 3),
+        "processes": processes,
+        "messages_sha1": messages.hexdigest(),
+        "verify_errors": dict(verify_errors),
+        "verify_warnings": dict(verify_warnings),
+        "validate_errors": dict(validate_errors),
+    }
+
+
+def _pct(new: float, old: float) -> str:
+    return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+
+def print_report(full: Dict[str, Any], compact: Dict[str, Any]) -> None:
+    print(f"[prompt_bench] personas={full['personas']} output={full['output_mode']} "
+          f"messages={full['messages']}/{compact['messages']} llm_calls={full['llm_calls']}/{compact['llm_calls']}")
+    print(f"{'stage':<10}{'full':>10}{'compact':>10}{'change':>10}   (prompt tokens)")
+    for s in sorted(set(full["by_stage"]) | set(compact["by_stage"])):
+        a = full["by_stage"].get(s, {}).get("prompt_tokens", 0)
+        b = compact["by_stage"].get(s, {}).get("prompt_tokens", 0)
+        print(f"{s:<10}{a:>10}{b:>10}{_pct(b, a):>10}")
+    print(f"{'TOTAL':<10}{full['prompt_tokens']:>10}{compact['prompt_tokens']:>10}"
+          f"{_pct(compact['prompt_tokens'], full['prompt_tokens']):>10}")
+    print(f"simulated LLM latency  full={full['simulated_llm_sec']:.2f}s compact={compact['simulated_llm_sec']:.2f}s "
+          f"({_pct(compact['simulated_llm_sec'], full['simulated_llm_sec'])})")
+    print(f"pipeline wall time     full={full['pipeline_wall_sec']:.2f}s compact={compact['pipeline_wall_sec']:.2f}s")
+    for r in (full, compact):
+        print(f"quality[{r['mode']:<7}] clean={r['clean_messages']}/{r['messages']} "
+              f"verify_errors={r['verify_errors']} validate_errors={r['validate_errors']} "
+              f"warnings={r['verify_warnings']}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    sys.path.insert(0, str(BASE_DIR))
+    ap = argparse.ArgumentParser(description="Compare full vs compact prompts on the offline simulator.")
+    ap.add_argument("--personas", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--output", choices=("text", "json"), default="text", help="narrator output mode")
+    ap.add_argument("--json", default="", help="write both reports to this file")
+    ap.add_argument("--processes", type=int, default=1, help="run personas in a process pool (controller.main_many)")
+    ap.add_argument("--check-sequential", action="store_true",
+                    help="with --processes: also run in-process, exit 1 if messages or token counts differ")
+    from pipeline_profile import add_profile_args, profiler_from_args
+
+    add_profile_args(ap)
+    args = ap.parse_args()
+
+    from shared_catalog import ensure_artifacts
+
+    ensure_artifacts()
+    ids = _persona_ids(args.personas)
+    profiler = profiler_from_args(args)
+    with profiler if profiler is not None else contextlib.nullcontext():
+        full = run_mode("full", ids, args.seed, output_mode=args.output, processes=args.processes)
+        compact = run_mode("compact", ids, args.seed, output_mode=args.output, processes=args.processes)
+    print_report(full, compact)
+    if args.check_sequential and args.processes > 1:
+        diff = []
+        for pooled in (full, compact):
+            seq = run_mode(pooled["mode"], ids, args.seed, output_mode=args.output)
+            for key in ("messages", "messages_sha1", "prompt_tokens", "completion_tokens", "llm_calls"):
+                if pooled[key] != seq[key]:
+                    diff.append(f"{pooled['mode']}.{key}: pool={pooled[key]} sequential={seq[key]}")
+        print(f"[prompt_bench] processes={args.processes} vs sequential: {'OK' if not diff else 'DIFF'}")
+        for d in diff:
+            print(f"  {d}")
+        if diff:
+            sys.exit(1)
+    if profiler is not None:
+        profiler.report()
+    if args.json:
+        Path(args.json).write_text(json.dumps({"full": full, "compact": compact}, ensure_ascii=False, indent=2), encoding="utf-8")
@@ -1,6 +1,25 @@
+import re
+
+from token_ledger import acquire_call, llm_stage, prompt_mode_from
+
+
+def _norm_field(value):
+    """
+    Persona field value as the planner prompt sees it: whitespace collapsed, no spaces
+    around commas. CRM exports differ only in spacing ("속건조, 피지" / "속건조,피지"),
+    so equivalent personas produce the same prompt (batch_jobs dedups by prompt hash).
+    """
+    if not isinstance(value, str):
+        return value
+    return re.sub(r"\s*,\s*", ",", " ".join(value.split()))
+
+
 class ReActReasoningAgent:
-    def __init__(self, llm, tone_map):
+    def __init__(self, llm, tone_map, prompt_mode=None):
         self.llm = llm
+        # "full" | "compact" (token_ledger.prompt_mode_from, AGENT10_PROMPT_MODE)
+        self.prompt_mode = prompt_mode_from(prompt_mode)
+        # ToneIndex (tone_profiles.load_tone_index) 또는 구버전 dict
         self.tone_map = tone_map
 
         # LLM이 사고(확장)해도 되는 페르소나 컬럼 화이트리스트
@@ -32,6 +51,56 @@ class ReActReasoningAgent:
             "cta_style",
         ]
 
+    def _plan_prompt_full(self, expandable_context, market_context):
+        prompt = f"""
+                    다음 페르소나 정보를 바탕으로,
+                    문장에서 활용할 수 있는 '상황·맥락 확장 힌트'만 정리하라.
+
+                    [절대 규칙]
+                    - 마케팅 문구 작성 금지
+                    - 문장 생성 금지
+                    - 추천/평가/비교/판단 표현 금지
+                    - 감정 과장 금지
+                    - 짧은 구문(phrase) 형태로만 작성
+                    - 원문 문자열을 바꾸거나 대체하지 말 것
+
+                    [입력 페르소나 맥락]
+                    {expandable_context}
+                """
+        if market_context:
+            prompt += f"""
+
+                    [외부 컨텍스트 (참고용)]
+                    {market_context}
+
+                    [주의]
+                    - 위 외부 컨텍스트는 사고 참고용이다.
+                    - 문장 생성, 표현 선택, 광고 카피에는 직접 반영하지 말 것.
+                    """
+        return prompt
+
+    def _plan_prompt_compact(self, expandable_context, market_context):
+        """compact 모드: 들여쓰기/dict repr 없이 값 있는 필드만 "key: value" 한 줄씩."""
+        lines = [
+            f"{k}: {v}" for k, v in expandable_context.items()
+            if str(v).strip() and str(v).strip() not in ("-", "nan")
+        ]
+        prompt = (
+            "다음 페르소나 정보로 문장에 활용할 '상황·맥락 확장 힌트'만 짧은 구문(phrase)으로 정리하라.\n"
+            "마케팅 문구·문장 생성·추천/평가/비교/판단·감정 과장 금지, 원문 문자열 변경 금지.\n"
+            "\n[페르소나]\n" + "\n".join(lines) + "\n"
+        )
+        if market_context:
+            prompt += f"\n[외부 컨텍스트 - 사고 참고용, 카피에 직접 반영 금지]\n{market_context}\n"
+        return prompt
+
+    def _tone_rules(self, row):
+        # brand -> cluster -> tone descriptions (ToneIndex); dict fallback keeps the old lookup
+        resolve = getattr(self.tone_map, "resolve", None)
+        if resolve is not None:
+            return resolve(brand=row.get("brand"), cluster=row.get("brand_tone_cluster"))
+        return self.tone_map.get(str(row.get("brand_tone_cluster")), "")
+
     def plan(self, row):
         outline = [
             "라이프스타일과 환경 맥락 제시",
@@ -50,7 +119,7 @@ class ReActReasoningAgent:
         # -------------------------------------------------
         expandable_context = {}
         for k in self.expandable_fields:
-            v = row.get(k)
+            v = _norm_field(row.get(k))
             if v:
                 expandable_context[k] = v
 
@@ -61,34 +130,15 @@ class ReActReasoningAgent:
         # 3. lifestyle / persona 맥락 확장 (문장 생성 금지)
         # -------------------------------------------------
         lifestyle_expanded = ""
-        if expandable_context:
+        # (call budget exhausted -> no expansion hints, same as an LLM failure)
+        if expandable_context and acquire_call("plan"):
             try:
-                prompt = f"""
-                    다음 페르소나 정보를 바탕으로,
-                    문장에서 활용할 수 있는 '상황·맥락 확장 힌트'만 정리하라.
-
-                    [절대 규칙]
-                    - 마케팅 문구 작성 금지
-                    - 문장 생성 금지
-                    - 추천/평가/비교/판단 표현 금지
-                    - 감정 과장 금지
-                    - 짧은 구문(phrase) 형태로만 작성
-                    - 원문 문자열을 바꾸거나 대체하지 말 것
-
-                    [입력 페르소나 맥락]
-                    {expandable_context}
-                """
-                if market_context:
-                    prompt += f"""
-
-                    [외부 컨텍스트 (참고용)]
-                    {market_context}
-
-                    [주의]
-                    - 위 외부 컨텍스트는 사고 참고용이다.
-                    - 문장 생성, 표현 선택, 광고 카피에는 직접 반영하지 말 것.
-                    """
-                lifestyle_expanded = self.llm.generate(prompt).strip()
+                if self.prompt_mode == "compact":
+                    prompt = self._plan_prompt_compact(expandable_context, market_context)
+                else:
+                    prompt = self._plan_prompt_full(expandable_context, market_context)
+                with llm_stage("plan"):
+                    lifestyle_expanded = self.llm.generate(prompt).strip()
             except Exception:
                 lifestyle_expanded = ""
 
@@ -97,7 +147,7 @@ class ReActReasoningAgent:
         # -------------------------------------------------
         return {
             "message_outline": outline,
-            "tone_rules": self.tone_map.get(str(row.get("brand_tone_cluster")), ""),
+            "tone_rules": self._tone_rules(row),
             "persona_fields": {k: row.get(k) for k in row},  # 🔒 기존 그대로
             "lifestyle_expanded": lifestyle_expanded,        # ➕ 사고 결과
         }
\ No newline at end of file
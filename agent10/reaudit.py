@@ -0,0 +1,421 @@
+# agent10/reaudit.py
+# Offline re-audit of stored controller results against the CURRENT checks.
+#
+# When brand rules or verifier logic change, compliance needs to know which
+# already-sent messages would now fail (and which old failures are gone).
+# This streams historical result files and re-runs a check set:
+#   validate.v1              MessageVerifier.validate only: what controller.main runs on its
+#                            primary row (verifier.verify_brand_rules there is a no-op stub)
+#   validate.v1+brand_rules  + compiled keyword matchers (MessageVerifier.verify_brand_rules)
+# plus _detect_literal_warnings (controller.py) for every row, and writes a diff report:
+#   - <out>.diffs.jsonl : one line per record whose errors/warnings changed
+#   - <out>.report.json : totals + per-brand counts (records, errors before/after,
+#                         new / cleared, per error code)
+#
+# Input: JSONL (optionally .gz) of controller.main() result records, or Parquet
+# with the same columns (nested fields as structs or JSON strings; needs pyarrow).
+# Records are streamed in chunks through workers.ordered_pool_map, so memory is
+# bounded by chunksize x max_pending regardless of archive size.
+#
+# Only like is compared with like:
+#   - errors are audited on the rows the controller checked ("checked": the i == 1
+#     row of each main() call); the other rows carry no check results
+#   - every record stores the check set that produced its errors ("check_set"). When
+#     it differs from the audited set (--check-set, default controller.CHECK_SET), a
+#     baseline pass re-runs the stored set first and the diff is baseline -> audited,
+#     so it shows what the check change does, not what the stored archive lacks.
+#     Unknown stored sets are counted (unknown_check_set) and their errors skipped.
+#   - literal warnings are recomputed on the body the controller checked ("warned_body"
+#     when the >350 cut shortened the stored message)
+# Archives written before these fields existed: check_set validate.v1, and the first
+# record of each consecutive (persona_id, seed) run is taken as the checked row.
+#
+# Usage:
+#   python agent10/reaudit.py outputs/2026-09/*.jsonl --out outputs/reaudit_2026-09
+#   python agent10/reaudit.py archive.parquet --processes 8 --chunksize 2000
+#   python agent10/reaudit.py archive.jsonl --check-set validate.v1+brand_rules
+
+import argparse
+import gzip
+import json
+import sys
+import time
+from collections import Counter, defaultdict, deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+AGENT_DIR = Path(__file__).resolve().parent
+if str(AGENT_DIR) not in sys.path:
+    sys.path.insert(0, str(AGENT_DIR))
+
+# record fields the checks need; everything else stays in the parent process
+_ROW_FIELDS = ("brand", "brand_name_slot", "brand_name", "skin_concern")
+_PLAN_FIELDS = ("product_anchor", "brand_name_slot")
+_RULE_FIELDS = ("brand", "rule_id", "banned", "must_include", "viewpoint")
+
+# check set id -> checks run on a checked row (see controller.CHECK_SET)
+CHECK_SETS: Dict[str, tuple] = {
+    "validate.v1": ("validate",),
+    "validate.v1+brand_rules": ("validate", "brand_rules"),
+}
+LEGACY_CHECK_SET = "validate.v1"
+
+
+# -------------------------------------------------
+# writing / reading result files
+# -------------------------------------------------
+def append_results_jsonl(results: List[Dict[str, Any]], path) -> None:
+    """Append controller.main() results to a JSONL archive (one record per line)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as f:
+        for r in results or []:
+            f.write(json.dumps(r, ensure_ascii=False, default=str) + "\n")
+
+
+def _maybe_json(v: Any) -> Any:
+    if isinstance(v, str) and v[:1] in ("{", "["):
+        try:
+            return json.loads(v)
+        except ValueError:
+            return v
+    return v
+
+
+def _iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _iter_parquet(path: Path, batch_size: int) -> Iterator[Dict[str, Any]]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("[reaudit] Parquet 입력에는 pyarrow가 필요합니다 (pip install pyarrow)") from e
+
+    pf = pq.ParquetFile(str(path))
+    for batch in pf.iter_batches(batch_size=batch_size):
+        for rec in batch.to_pylist():
+            for k in ("plan", "row", "brand_rule", "errors", "warnings"):
+                if k in rec:
+                    rec[k] = _maybe_json(rec[k])
+            yield rec
+
+
+def iter_records(paths: Iterable, batch_size: int = 4096) -> Iterator[Dict[str, Any]]:
+    """Stream result records from JSONL(.gz) / Parquet files, in file order."""
+    for p in paths:
+        p = Path(p)
+        if p.suffix == ".parquet":
+            yield from _iter_parquet(p, batch_size)
+        else:
+            yield from _iter_jsonl(p)
+
+
+def _pick(d: Any, fields) -> Dict[str, Any]:
+    if not isinstance(d, dict):
+        return {}
+    return {k: d[k] for k in fields if k in d}
+
+
+def slim_record(rec: Dict[str, Any]) -> Dict[str, Any]:
+    """Only what the checks read (keeps worker IPC small)."""
+    return {
+        "persona_id": rec.get("persona_id"),
+        "brand": rec.get("brand") or "",
+        "seed": rec.get("seed"),
+        "message": rec.get("message") or "",
+        "errors": list(rec.get("errors") or []),
+        "warnings": list(rec.get("warnings") or []),
+        "checked": rec.get("checked"),
+        "check_set": rec.get("check_set") or LEGACY_CHECK_SET,
+        "warned_body": rec.get("warned_body"),
+        "row": _pick(rec.get("row"), _ROW_FIELDS),
+        "plan": _pick(rec.get("plan"), _PLAN_FIELDS),
+        "brand_rule": _pick(rec.get("brand_rule"), _RULE_FIELDS),
+    }
+
+
+# -------------------------------------------------
+# checks (worker side)
+# -------------------------------------------------
+_AUDIT_STATE: Dict[str, Any] = {}
+
+
+def _init_audit_worker(product_brand_map: Dict[str, str], rules_csv: str, check_set: str) -> None:
+    from brand_rules import load_compiled_brand_rules, normalize_brand
+    from controller import _detect_literal_warnings
+    from verifier import MessageVerifier
+
+    _AUDIT_STATE.clear()
+    _AUDIT_STATE.update({
+        "verifier": MessageVerifier(product_brand_map=product_brand_map),
+        "rules": load_compiled_brand_rules(rules_csv),
+        "normalize_brand": normalize_brand,
+        "literal_warnings": _detect_literal_warnings,
+        "check_set": check_set,
+    })
+
+
+def _split_message(message: str):
+    # controller stores f"{title}\n{body}" with "TITLE:" / "BODY:" prefixes
+    title, _, body = (message or "").partition("\n")
+    if not body and not title.startswith("TITLE"):
+        title, body = "", title
+    return title, body
+
+
+def _current_rule(brand: str, stored_rule: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Current version of the rule row the message was generated under."""
+    rows = _AUDIT_STATE["rules"]["rules"].get(brand) or []
+    if not rows:
+        return None
+    rid = stored_rule.get("rule_id")
+    if rid is not None:
+        for r in rows:
+            if r.get("rule_id") == rid:
+                return r
+    return rows[0]
+
+
+def _run_checks(check_set: str, brand: str, row: Dict[str, Any], title: str, body: str,
+                stored_rule: Dict[str, Any]) -> List[str]:
+    st = _AUDIT_STATE
+    checks = CHECK_SETS[check_set]
+    errors: List[str] = []
+    if "validate" in checks:
+        errors.extend(st["verifier"].validate(row, title, body))
+    if "brand_rules" in checks:
+        rule = _current_rule(brand, stored_rule)
+        matcher = st["rules"]["matchers"].get(brand) if rule is not None else None
+        if matcher is not None:
+            errors.extend(matcher.verify(body.replace("BODY:", "", 1).strip(), rule))
+    return errors
+
+
+def audit_record(rec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Re-run the audited check set on one slim record -> {"brand", "errors", "warnings"}
+    (+ "baseline": the stored check set re-run, when it differs). errors is None for rows
+    the controller did not check and for unknown stored check sets.
+    """
+    st = _AUDIT_STATE
+    brand = st["normalize_brand"](rec.get("brand") or "")
+    row = dict(rec.get("row") or {})
+    row.setdefault("brand", brand)
+    plan = rec.get("plan") or {}
+
+    title, body = _split_message(rec.get("message") or "")
+    out: Dict[str, Any] = {"brand": brand, "errors": None}
+
+    stored_set = rec.get("check_set") or LEGACY_CHECK_SET
+    if rec.get("checked") and stored_set in CHECK_SETS:
+        out["errors"] = _run_checks(st["check_set"], brand, row, title, body, rec.get("brand_rule") or {})
+        if stored_set != st["check_set"]:
+            out["baseline"] = _run_checks(stored_set, brand, row, title, body, rec.get("brand_rule") or {})
+
+    warned_body = rec.get("warned_body") or body.replace("BODY:", "", 1).strip()
+    warnings = st["literal_warnings"](
+        clean_body=warned_body,
+        brand=brand,
+        product_name=plan.get("product_anchor") or "",
+        skin_concern=row.get("skin_concern", ""),
+    )
+    if len(warned_body) > 350:
+        warnings.append("body_len>350")
+    out["warnings"] = warnings
+    return out
+
+
+def _audit_chunk(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [audit_record(r) for r in records]
+
+
+# -------------------------------------------------
+# diff report (parent side)
+# -------------------------------------------------
+def error_code(e: str) -> str:
+    """'banned hit: [...]' -> 'banned hit' (keyword lists would explode the counters)."""
+    return str(e).split(":", 1)[0].strip()
+
+
+class ReauditReport:
+    def __init__(self):
+        self.records = 0
+        self.checked = 0
+        self.baseline = 0
+        self.unknown_check_set = 0
+        self.changed = 0
+        self.brands: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
+            "records": 0,
+            "with_errors_before": 0,
+            "with_errors_after": 0,
+            "new_errors": Counter(),
+            "cleared_errors": Counter(),
+            "new_warnings": Counter(),
+            "cleared_warnings": Counter(),
+        })
+
+    def add(self, old: Dict[str, Any], new: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Account one record; returns its diff line if anything changed."""
+        self.records += 1
+        b = self.brands[new["brand"] or old.get("brand") or ""]
+        b["records"] += 1
+
+        before: List[str] = []
+        after: List[str] = []
+        if new["errors"] is not None:
+            self.checked += 1
+            self.baseline += "baseline" in new
+            before = new["baseline"] if "baseline" in new else old["errors"]
+            after = new["errors"]
+            b["with_errors_before"] += bool(before)
+            b["with_errors_after"] += bool(after)
+        elif old.get("checked") and old.get("check_set") not in CHECK_SETS:
+            self.unknown_check_set += 1
+
+        diff = {
+            "new_errors": [e for e in after if e not in before],
+            "cleared_errors": [e for e in before if e not in after],
+            "new_warnings": [w for w in new["warnings"] if w not in old["warnings"]],
+            "cleared_warnings": [w for w in old["warnings"] if w not in new["warnings"]],
+        }
+        if not any(diff.values()):
+            return None
+
+        for key, items in diff.items():
+            b[key].update(error_code(x) for x in items)
+        self.changed += 1
+        return {
+            "persona_id": old.get("persona_id"),
+            "brand": new["brand"],
+            "seed": old.get("seed"),
+            **diff,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        brands = {}
+        for name, b in sorted(self.brands.items()):
+            brands[name] = {k: (dict(v) if isinstance(v, Counter) else v) for k, v in b.items()}
+        return {
+            "records": self.records,
+            "checked": self.checked,
+            "baseline": self.baseline,
+            "unknown_check_set": self.unknown_check_set,
+            "changed": self.changed,
+            "brands": brands,
+        }
+
+
+def reaudit(
+    paths: Iterable,
+    out_prefix,
+    processes: Optional[int] = None,
+    chunksize: int = 1000,
+    batch_size: int = 4096,
+    rules_csv=None,
+    product_catalog_path: Optional[str] = None,
+    check_set: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Stream `paths`, re-run `check_set` (default controller.CHECK_SET), write <out_prefix>.diffs.jsonl / .report.json."""
+    from brand_rules import RULES_CSV, load_compiled_brand_rules
+    from controller import CHECK_SET
+    from verifier import MessageVerifier
+    from workers import ordered_pool_map
+
+    check_set = check_set or CHECK_SET
+    if check_set not in CHECK_SETS:
+        raise ValueError(f"unknown check set {check_set!r} (expected one of {sorted(CHECK_SETS)})")
+    rules_csv = str(rules_csv or RULES_CSV)
+    # compile once in the parent so workers only unpickle the artifact
+    load_compiled_brand_rules(rules_csv)
+    brand_map = MessageVerifier(product_catalog_path=product_catalog_path).product_brand_map()
+
+    out_prefix = Path(out_prefix)
+    out_prefix.parent.mkdir(parents=True, exist_ok=True)
+    diffs_path = out_prefix.with_name(out_prefix.name + ".diffs.jsonl")
+    report_path = out_prefix.with_name(out_prefix.name + ".report.json")
+
+    report = ReauditReport()
+    t0 = time.perf_counter()
+
+    # the parent keeps the slim records of in-flight chunks only (same order as results)
+    def _slim_stream(pending):
+        prev_run = None
+        for rec in iter_records(paths, batch_size=batch_size):
+            s = slim_record(rec)
+            run_key = (s["persona_id"], s["seed"])
+            if s["checked"] is None:
+                # legacy record: the first row of a main() call is the one it checked
+                s["checked"] = run_key != prev_run and bool(s["message"])
+            prev_run = run_key
+            pending.append(s)
+            yield s
+
+    pending = deque()
+    results = ordered_pool_map(
+        _audit_chunk,
+        _slim_stream(pending),
+        initializer=_init_audit_worker,
+        initargs=(brand_map, rules_csv, check_set),
+        processes=processes,
+        chunksize=chunksize,
+    )
+    with diffs_path.open("w", encoding="utf-8") as out:
+        for new in results:
+            line = report.add(pending.popleft(), new)
+            if line is not None:
+                out.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+    summary = report.to_dict()
+    summary["elapsed_sec"] = round(time.perf_counter() - t0, 3)
+    summary["check_set"] = check_set
+    summary["rules_csv"] = rules_csv
+    summary["inputs"] = [str(p) for p in paths]
+    with report_path.open("w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    summary["diffs_path"] = str(diffs_path)
+    summary["report_path"] = str(report_path)
+    return summary
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Re-audit stored agent10 results against the current verifiers.")
+    ap.add_argument("inputs", nargs="+", help="result files (.jsonl, .jsonl.gz, .parquet)")
+    ap.add_argument("--out", default=None, help="output prefix (default: <first input>.reaudit)")
+    ap.add_argument("--processes", type=int, default=None, help="worker processes (default: AGENT10_WORKERS / CPU count)")
+    ap.add_argument("--chunksize", type=int, default=1000)
+    ap.add_argument("--batch-size", type=int, default=4096, help="Parquet read batch size")
+    ap.add_argument("--rules-csv", default=None)
+    ap.add_argument("--catalog", default=None, help="product catalog CSV for the product→brand map")
+    ap.add_argument("--check-set", default=None, choices=sorted(CHECK_SETS),
+                    help="checks to audit against (default: the controller's current CHECK_SET)")
+    args = ap.parse_args()
+
+    inputs = [Path(p) for p in args.inputs]
+    missing = [str(p) for p in inputs if not p.exists()]
+    if missing:
+        ap.error(f"input not found: {missing}")
+
+    out = args.out or str(inputs[0]) + ".reaudit"
+    s = reaudit(
+        inputs,
+        out,
+        processes=args.processes,
+        chunksize=args.chunksize,
+        batch_size=args.batch_size,
+        rules_csv=args.rules_csv,
+        product_catalog_path=args.catalog,
+        check_set=args.check_set,
+    )
+    rate = s["records"] / s["elapsed_sec"] * 60 if s["elapsed_sec"] else 0.0
+    print(f"[reaudit] check_set={s['check_set']} records={s['records']} checked={s['checked']} "
+          f"baseline={s['baseline']} unknown_check_set={s['unknown_check_set']} changed={s['changed']} "
+          f"elapsed={s['elapsed_sec']}s ({rate:.0f}/min)")
+    print(f"[reaudit] diffs  -> {s['diffs_path']}")
+    print(f"[reaudit] report -> {s['report_path']}")
@@ -0,0 +1,126 @@
+# agent10/repair_planner.py
+# Slot-level repair planning (Executor verify -> repair loop).
+#
+# A failed check used to trigger a full narrator.generate(..., repair_errors=errs):
+# body + title + length inserts again, although most errors sit in one slot of the
+# 4-line BODY. plan_repairs() maps every error to the slot(s) responsible:
+#   brand_missing / product_missing -> slot2 (product proposal), or the slot that
+#                                      already names the product
+#   viewpoint miss                  -> slot2
+#   must_include miss               -> slot3 (사용감 / 체감)
+#   banned hit: [...]               -> every slot containing a hit keyword
+#   nl_anomaly                      -> every slot matching an anomaly pattern
+#   slot_count<4                    -> the empty slots
+#   body_too_short                  -> the shortest slot
+# A body collapsed into fewer than 4 lines has no slot boundaries to work with: its
+# errors (except slot_count<4, which fills the empty slots) are left unmapped.
+# StrategyNarrator.repair_slots() then rewrites only those slots (one short prompt per
+# slot, neighbours as context) and keeps the title and the other slots byte-identical.
+# Errors that are not local to the copy (product_brand_mismatch, unknown codes) are
+# returned as "unmapped": the caller falls back to the full regeneration. So are errors
+# a slot repair already tried and did not fix (tried=...): must_include / viewpoint
+# misses have no deterministic slot fix, the rewrite either lands the keyword or the
+# whole message is regenerated.
+
+import ast
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from verifier import NL_ANOMALY_PATTERNS
+
+SLOT_IDS = (1, 2, 3, 4)
+
+# error code -> slot when the error does not point at a specific text span
+_DEFAULT_SLOT = {
+    "brand_missing": 2,
+    "product_missing": 2,
+    "viewpoint": 2,
+    "must_include": 3,
+}
+
+
+def parse_error(err: str) -> Tuple[str, List[str]]:
+    """
+    ("banned", ["즉각적 효과"]) for "banned hit: ['즉각적 효과']" (MessageVerifier.check_*),
+    (err, []) for the bare verifier codes (brand_missing, slot_count<4, ...).
+    """
+    err = str(err or "").strip()
+    for prefix, code in (("banned hit:", "banned"), ("must_include miss:", "must_include"), ("viewpoint miss:", "viewpoint")):
+        if err.startswith(prefix):
+            try:
+                kws = ast.literal_eval(err[len(prefix):].strip())
+            except (ValueError, SyntaxError):
+                kws = []
+            return code, [str(k) for k in kws if str(k).strip()]
+    return err, []
+
+
+def split_body(body: str) -> List[str]:
+    """BODY text (with or without the "BODY:" label) -> exactly 4 slot lines ("" for missing)."""
+    body = re.sub(r"^\s*BODY:\s*", "", body or "")
+    lines = [ln.strip() for ln in body.split("\n")]
+    lines = [ln for ln in lines if ln][:4]
+    return lines + [""] * (4 - len(lines))
+
+
+def _slots_matching(slots: List[str], pred) -> List[int]:
+    return [n for n, text in zip(SLOT_IDS, slots) if text and pred(text)]
+
+
+def plan_repairs(
+    errors: List[str],
+    body: str,
+    row: Optional[Dict[str, Any]] = None,
+    tried: Optional[Iterable[str]] = None,
+) -> Dict[str, Any]:
+    """
+    {"slots": {slot_id: [error, ...]}, "unmapped": [error, ...]} for one message.
+    Slot ids are 1-based; errors are kept verbatim so the narrator can read the keywords.
+    tried: errors already sent to a slot repair; if they are still reported they are unmapped.
+    """
+    row = row or {}
+    slots = split_body(body)
+    product = str(row.get("상품명", "") or "").strip()
+    out: Dict[int, List[str]] = {}
+    unmapped: List[str] = []
+
+    def _add(slot_ids: List[int], err: str) -> None:
+        for n in slot_ids:
+            out.setdefault(n, [])
+            if err not in out[n]:
+                out[n].append(err)
+
+    collapsed = not all(slots)
+    tried = set(tried or ())
+    for err in errors or []:
+        code, kws = parse_error(err)
+        if err in tried:
+            unmapped.append(err)
+        elif code == "slot_count<4":
+            _add([n for n, t in zip(SLOT_IDS, slots) if not t], err)
+        elif collapsed:
+            unmapped.append(err)
+        elif code == "banned":
+            # no slot contains the keyword (hit across a line break): not slot-local
+            hit = _slots_matching(slots, lambda t: any(k in t for k in kws))
+            if hit:
+                _add(hit, err)
+            else:
+                unmapped.append(err)
+        elif code == "nl_anomaly":
+            hit = _slots_matching(slots, lambda t: any(re.search(p, t) for p in NL_ANOMALY_PATTERNS))
+            if hit:
+                _add(hit, err)
+            else:
+                unmapped.append(err)
+        elif code == "body_too_short":
+            _add([min(SLOT_IDS, key=lambda n: len(slots[n - 1]))], err)
+        elif code in ("brand_missing", "product_missing"):
+            named = _slots_matching(slots, lambda t: product in t) if product and code == "brand_missing" else []
+            _add(named[:1] or [_DEFAULT_SLOT[code]], err)
+        elif code in _DEFAULT_SLOT:
+            _add([_DEFAULT_SLOT[code]], err)
+        else:
+            unmapped.append(err)
+
+    return {"slots": dict(sorted(out.items())), "unmapped": unmapped}
@@ -1,10 +1,10 @@
 import os
 import sys
+import csv
 import time
 import threading
 from pathlib import Path
 import random
-import pandas as pd
 
 START = time.time()
 
@@ -106,6 +106,21 @@ except Exception:
     # 런 스크립트 레벨에서만 안전하게 무시
     pass
 
+# -------------------------------------------------
+# 2-2. --profile DIR (pipeline_profile)
+#   - OfflineLLM + 고정 seed(AGENT10_SEED, 기본 7) + seed 기반 persona 선택
+#     → 같은 입력이면 같은 호출 경로: 실행 간 프로파일 비교 가능
+# -------------------------------------------------
+import argparse  # noqa: E402
+import contextlib  # noqa: E402
+
+from pipeline_profile import add_profile_args, profiler_from_args  # noqa: E402
+
+_ap = argparse.ArgumentParser(description="agent10 single-persona test run")
+add_profile_args(_ap)
+ARGS = _ap.parse_args()
+profiler = profiler_from_args(ARGS)
+
 # -------------------------------------------------
 # 3. Controller 실행 (진행이 보이도록 래핑)
 # -------------------------------------------------
@@ -114,18 +129,42 @@ from controller import main  # noqa: E402
 
 log("controller.main ready")
 
+# 오프라인 산출물(affinity scores / persona table / columnar catalog): 최신이면 no-op.
+# 서빙 경로(ProductSelector)는 만들지 않고 읽기만 한다.
+from shared_catalog import ensure_artifacts  # noqa: E402
+
+ensure_artifacts()
+log("artifacts ready")
+
 # -------------------------------------------------
 # Persona 랜덤 선택 (실험 조건 레이어)
 # -------------------------------------------------
+# pandas를 쓰지 않고 csv 모듈로 persona_id만 읽는다 (cold-start 비용 절감)
 persona_csv = DATA_DIR_ABS / "persona_meta_v2.csv"
-df_persona = pd.read_csv(persona_csv)
-
-persona_ids = df_persona["persona_id"].dropna().unique().tolist()
+with persona_csv.open("r", encoding="utf-8-sig", newline="") as f:
+    persona_ids = list(dict.fromkeys(
+        (r.get("persona_id") or "").strip()
+        for r in csv.DictReader(f)
+        if (r.get("persona_id") or "").strip()
+    ))
 if not persona_ids:
     raise RuntimeError("persona_meta_v2.csv에 persona_id가 없습니다.")
 
-persona_id = random.choice(persona_ids)
-log(f"SELECTED persona_id (RANDOM): {persona_id}")
+# AGENT10_SEED가 있으면 동일 입력 → 동일 샘플링/프롬프트 (재현/캐시용)
+run_seed = os.getenv("AGENT10_SEED")
+run_seed = int(run_seed) if run_seed not in (None, "") else None
+
+run_llm = None
+if profiler is not None:
+    from offline_llm import OfflineLLM
+
+    run_seed = 7 if run_seed is None else run_seed
+    run_llm = OfflineLLM()
+    persona_id = random.Random(run_seed).choice(persona_ids)
+    log(f"SELECTED persona_id (PROFILE seed={run_seed}): {persona_id}")
+else:
+    persona_id = random.choice(persona_ids)
+    log(f"SELECTED persona_id (RANDOM): {persona_id}")
 
 spinner_thread = threading.Thread(
     target=_spinner,
@@ -136,15 +175,20 @@ spinner_thread.start()
 
 results = None
 err = None
+run_stats = {}
 
 try:
-    log("CALL main(persona_id=persona_id, topk=3, use_market_context=False, verbose=True)")
-    results = main(
-        persona_id=persona_id,
-        topk=3,
-        use_market_context=False,
-        verbose=True,
-    )
+    log(f"CALL main(persona_id=persona_id, topk=3, use_market_context=False, verbose=True, seed={run_seed})")
+    with profiler if profiler is not None else contextlib.nullcontext():
+        results = main(
+            persona_id=persona_id,
+            topk=3,
+            use_market_context=False,
+            verbose=True,
+            seed=run_seed,
+            run_stats=run_stats,
+            llm=run_llm,
+        )
     log("RETURN from controller.main")
 except Exception as e:
     err = e
@@ -156,11 +200,36 @@ if err:
     log(f"ERROR raised from controller.main: {repr(err)}")
     raise err
 
+# AGENT10_RESULTS_JSONL가 있으면 결과를 아카이브(JSONL)에 추가 → reaudit.py 입력
+results_jsonl = os.getenv("AGENT10_RESULTS_JSONL", "").strip()
+if results_jsonl and results:
+    from reaudit import append_results_jsonl
+
+    append_results_jsonl(results, results_jsonl)
+    log(f"results appended -> {results_jsonl}")
+
+# AGENT10_RUN_STATS_JSON가 있으면 타이밍 + 토큰 집계(stage/brand/persona)를 JSON으로 저장
+run_stats["wall_sec"] = round(time.time() - START, 3)
+run_stats_json = os.getenv("AGENT10_RUN_STATS_JSON", "").strip()
+if run_stats_json:
+    import json
+
+    Path(run_stats_json).write_text(json.dumps(run_stats, ensure_ascii=False, indent=2), encoding="utf-8")
+    log(f"run stats -> {run_stats_json}")
+
+if profiler is not None:
+    print("\n" + "=" * 70)
+    profiler.report()
+
 # -------------------------------------------------
 # 4. 결과 요약
 # -------------------------------------------------
 print("\n" + "=" * 70)
-print(f"[DONE] {ts()} | rows={len(results)}")
+print(f"[DONE] {ts()} | rows={len(results)} | seed={results[0].get('seed') if results else run_seed}")
+_tok = run_stats.get("tokens", {}).get("totals", {})
+print(f"[TOKENS] llm_calls={_tok.get('calls', 0)} prompt={_tok.get('prompt_tokens', 0)} "
+      f"completion={_tok.get('completion_tokens', 0)} over_budget={_tok.get('over_budget', 0)} "
+      f"calls/message={run_stats.get('llm_calls_per_message', 0)} (max {run_stats.get('llm_calls_max', 0)})")
 print("=" * 70, flush=True)
 
 # -------------------------------------------------
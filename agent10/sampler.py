@@ -0,0 +1,112 @@
+# agent10/sampler.py
+# Shared anti-collapse sampler (brand cap + temperature softmax, without replacement).
+#
+# Used by controller (brand re-sampling) and ProductSelector (product sampling).
+# Sampling without replacement is done with the Gumbel-top-k trick:
+#   argtopk(scores / T + Gumbel(0, 1)) ~ sequential softmax sampling without replacement
+# gumbel_top_k also takes an (n_rows, n) matrix and samples every row in one call.
+# Callers sample per request (controller.main draws from derive_rng(seed, site)), so no
+# campaign-level matrix helper is kept: it could not reproduce the per-request streams.
+
+import secrets
+import zlib
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+
+# -------------------------------------------------
+# per-request RNG streams
+# - one seed per request, one independent stream per sampling site
+# - streams depend only on (seed, site), never on global state or thread
+#   scheduling, so identical inputs reproduce identical prompts
+# -------------------------------------------------
+def make_seed() -> int:
+    """Fresh request seed (non-negative, fits in int64 / JSON)."""
+    return secrets.randbits(63)
+
+
+def derive_rng(seed: int, site: str) -> np.random.Generator:
+    """
+    Independent Generator for one sampling site of one request.
+    The site name is hashed with crc32 (stable across processes, unlike hash()).
+    """
+    site_key = zlib.crc32(str(site).encode("utf-8"))
+    return np.random.default_rng(np.random.SeedSequence(entropy=int(seed), spawn_key=(site_key,)))
+
+
+def brand_key(v: Any) -> str:
+    """Normalize brand string for cap lookup (zero-width chars / spaces removed)."""
+    if v is None:
+        return ""
+    return str(v).strip().replace("\u200b", "").replace("\ufeff", "").replace(" ", "")
+
+
+def cap_scores(scores: Any, brands: Sequence[Any], caps: Optional[Dict[str, float]]) -> np.ndarray:
+    """
+    Method A: cap scores per brand.
+    `scores` is (n_brands,) or (n_rows, n_brands); `brands` labels the last axis.
+    Brands without a cap keep their score.
+    """
+    x = np.asarray(scores, dtype=np.float64)
+    if not caps:
+        return x.copy()
+    cap_vec = np.array([caps.get(brand_key(b), np.inf) for b in brands], dtype=np.float64)
+    return np.minimum(x, cap_vec)
+
+
+def gumbel_top_k(
+    scores: Any,
+    k: int,
+    temperature: float = 1.0,
+    rng: Optional[np.random.Generator] = None,
+) -> np.ndarray:
+    """
+    Sample `k` indices without replacement from softmax(scores / temperature).
+
+    - scores: (n,) or (n_rows, n) float array; non-finite entries are never drawn.
+    - returns int64 indices, (k,) or (n_rows, k), in draw order.
+      Rows with fewer than k drawable entries are padded with -1.
+    """
+    x = np.asarray(scores, dtype=np.float64)
+    squeeze = x.ndim == 1
+    if squeeze:
+        x = x[None, :]
+
+    n_rows, n = x.shape
+    k = max(0, min(int(k), n))
+    if k == 0 or n_rows == 0:
+        out = np.full((n_rows, k), -1, dtype=np.int64)
+        return out[0] if squeeze else out
+
+    rng = rng if rng is not None else np.random.default_rng()
+    t = float(temperature) if float(temperature) > 0 else 1.0
+
+    valid = np.isfinite(x)
+    gumbel = -np.log(-np.log(rng.uniform(np.finfo(np.float64).tiny, 1.0, size=x.shape)))
+    keys = np.where(valid, x / t + gumbel, -np.inf)
+
+    if k < n:
+        part = np.argpartition(-keys, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(n), (n_rows, n))
+    order = np.argsort(-np.take_along_axis(keys, part, axis=1), axis=1, kind="stable")
+    idx = np.take_along_axis(part, order, axis=1).astype(np.int64)
+
+    # pad draws beyond the number of drawable entries
+    n_valid = valid.sum(axis=1, keepdims=True)
+    idx = np.where(np.arange(k)[None, :] < n_valid, idx, -1)
+
+    return idx[0] if squeeze else idx
+
+
+def sample_one(
+    scores: Iterable[float],
+    temperature: float = 1.0,
+    rng: Optional[np.random.Generator] = None,
+) -> int:
+    """Draw a single index from softmax(scores / temperature); -1 if nothing is drawable."""
+    x = np.asarray(list(scores), dtype=np.float64)
+    if x.size == 0:
+        return -1
+    return int(gumbel_top_k(x, 1, temperature=temperature, rng=rng)[0])
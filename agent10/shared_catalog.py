@@ -0,0 +1,254 @@
+# agent10/shared_catalog.py
+# Memory-mapped columnar product catalog shared read-only by pool workers.
+#
+# Every controller.main() call used to pd.read_csv() the catalog (~1.7 MB, mostly
+# long 전성분 strings), and every extra lookup (product index, verifier brand map)
+# re-read it with the csv module, so N workers held N private copies.
+# The catalog is converted once into a columnar artifact under data/build/:
+#   catalog.v{VER}.{sha16}/meta.json          columns, n_rows, source sha256, names digest
+#                         /c{i}.offsets.npy   int64[n_rows + 1]  byte offsets into the blob
+#                         /c{i}.utf8          UTF-8 blob of column i (values concatenated)
+# Workers attach with np.load(mmap_mode="r") / np.memmap: attaching is a few
+# open() calls, the pages are shared through the OS page cache, and a value is
+# only decoded when it is read, so RSS does not grow with the catalog. Affinity
+# scores (affinity_scores.py) and the persona top-k table (persona_scores.py) are
+# already memory-mapped artifacts and are shared the same way.
+#
+# SharedCatalog duck-types the small DataFrame surface the selector uses
+# (len / empty / columns / catalog[col].tolist()).
+#
+# prepare_artifacts() builds the catalog plus the affinity / persona-score artifacts;
+# data_build.py and the CLI entry points (ensure_artifacts) run it, the serving path
+# (ProductSelector) only loads what is there.
+#
+# Usage:
+#   python agent10/shared_catalog.py          # build (no-op if up to date)
+
+import csv
+import hashlib
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from agent_logging import get_logger
+
+log = get_logger("shared_catalog")
+
+BASE_DIR = Path(__file__).resolve().parent
+DATA_DIR = BASE_DIR.parent / "data"
+BUILD_DIR = DATA_DIR / "build"
+CATALOG_CSV = DATA_DIR / "amore_with_category.csv"
+
+SHARED_CATALOG_VERSION = 1
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def artifact_dir(catalog_csv=CATALOG_CSV, build_dir=BUILD_DIR) -> Path:
+    return Path(build_dir) / f"catalog.v{SHARED_CATALOG_VERSION}.{_sha256(Path(catalog_csv))[:16]}"
+
+
+def build_shared_catalog(catalog_csv=CATALOG_CSV, build_dir=BUILD_DIR, force: bool = False) -> Path:
+    """CSV -> columnar artifact (same rows / order as csv.DictReader and pd.read_csv)."""
+    import numpy as np
+
+    from affinity_scores import names_digest
+
+    catalog_csv = Path(catalog_csv)
+    out = artifact_dir(catalog_csv, build_dir)
+    if out.exists() and not force:
+        return out
+
+    with catalog_csv.open("r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = [(h or "").strip() for h in next(reader, [])]
+        cols: List[List[str]] = [[] for _ in header]
+        for rec in reader:
+            for i in range(len(header)):
+                cols[i].append(rec[i] if i < len(rec) else "")
+
+    tmp = out.with_name(out.name + f".tmp{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for i, values in enumerate(cols):
+        encoded = [v.encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        np.save(tmp / f"c{i}.offsets.npy", offsets)
+        (tmp / f"c{i}.utf8").write_bytes(b"".join(encoded))
+
+    n_rows = len(cols[0]) if cols else 0
+    name_col = header.index("상품명") if "상품명" in header else None
+    meta = {
+        "version": SHARED_CATALOG_VERSION,
+        "source": catalog_csv.name,
+        "source_sha256": _sha256(catalog_csv),
+        "columns": header,
+        "n_rows": n_rows,
+        "names_sha1": names_digest(cols[name_col]) if name_col is not None else "",
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    if force:
+        shutil.rmtree(out, ignore_errors=True)
+    try:
+        os.replace(tmp, out)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return out
+
+
+class StringColumn:
+    """Read-only string column over (offsets, blob) memmaps; values decode on access."""
+
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        a, b = int(self._offsets[i]), int(self._offsets[i + 1])
+        return bytes(self._blob[a:b]).decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def tolist(self) -> List[str]:
+        return list(self)
+
+
+class SharedCatalog:
+    """Attached (memory-mapped, read-only) catalog artifact."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.meta = json.loads((self.path / "meta.json").read_text(encoding="utf-8"))
+        self.columns: List[str] = list(self.meta["columns"])
+        self.n_rows = int(self.meta["n_rows"])
+        self.names_sha1 = self.meta.get("names_sha1", "")
+        self._cols: Dict[str, StringColumn] = {}
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    @property
+    def empty(self) -> bool:
+        return self.n_rows == 0
+
+    def __contains__(self, col: str) -> bool:
+        return col in self.columns
+
+    def __getitem__(self, col: str) -> StringColumn:
+        sc = self._cols.get(col)
+        if sc is None:
+            import numpy as np
+
+            i = self.columns.index(col)  # ValueError for unknown columns
+            offsets = np.load(self.path / f"c{i}.offsets.npy", mmap_mode="r")
+            blob_path = self.path / f"c{i}.utf8"
+            # np.memmap rejects empty files
+            blob = np.memmap(blob_path, dtype=np.uint8, mode="r") if blob_path.stat().st_size else b""
+            sc = self._cols[col] = StringColumn(offsets, blob)
+        return sc
+
+    def records(self, columns: Optional[List[str]] = None) -> Iterator[Dict[str, str]]:
+        """Row dicts over a column projection (for ProductIndex and friends)."""
+        cols = [c for c in (columns or self.columns) if c in self.columns]
+        views = [self[c] for c in cols]
+        for i in range(self.n_rows):
+            yield {c: v[i] for c, v in zip(cols, views)}
+
+
+# ---------------------------------------------------------------------------
+# per-process attachment
+# ---------------------------------------------------------------------------
+# source CSV path -> SharedCatalog (attached by the worker initializer or on demand)
+_ATTACHED: Dict[str, SharedCatalog] = {}
+
+
+def attach_catalog(catalog_csv=CATALOG_CSV, build_dir=BUILD_DIR, build_if_missing: bool = True) -> Optional[SharedCatalog]:
+    """Attach the artifact for catalog_csv in this process (cached); None if unavailable."""
+    key = str(Path(catalog_csv).resolve())
+    cat = _ATTACHED.get(key)
+    if cat is not None:
+        return cat
+    try:
+        path = artifact_dir(catalog_csv, build_dir)
+        if not path.exists():
+            if not build_if_missing:
+                return None
+            path = build_shared_catalog(catalog_csv, build_dir)
+        cat = _ATTACHED[key] = SharedCatalog(path)
+    except (OSError, ValueError, KeyError, ImportError) as e:
+        log.warning("unavailable: %s", e)
+        return None
+    return cat
+
+
+def attached_catalog(catalog_csv=CATALOG_CSV) -> Optional[SharedCatalog]:
+    """Catalog already attached in this process (never builds / attaches)."""
+    return _ATTACHED.get(str(Path(catalog_csv).resolve()))
+
+
+def prepare_artifacts(catalog_csv=CATALOG_CSV) -> Path:
+    """
+    Build every shared artifact in the parent before a pool starts (no-ops when up to
+    date), so workers only attach and never race each other building them.
+    """
+    from affinity_scores import build_affinity_scores
+
+    path = build_shared_catalog(catalog_csv)
+    build_affinity_scores(catalog_csv)
+    if Path(catalog_csv).resolve() == CATALOG_CSV.resolve():
+        from persona_scores import build_persona_scores
+
+        build_persona_scores()
+    return path
+
+
+def ensure_artifacts(catalog_csv=CATALOG_CSV) -> Optional[Path]:
+    """
+    prepare_artifacts() for the CLI entry points (run_agent10_test / batch_jobs /
+    prompt_bench), called once at startup: the serving path only loads artifacts.
+    A failed build is logged and the run continues with live scoring.
+    """
+    try:
+        return prepare_artifacts(catalog_csv)
+    except Exception as e:
+        log.warning("artifact build failed (%s): products are scored live without affinity scores", e)
+        return None
+
+
+def init_worker(catalog_csv=CATALOG_CSV) -> None:
+    """Pool initializer: attach the shared catalog once per worker."""
+    attach_catalog(catalog_csv, build_if_missing=False)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    sys.path.insert(0, str(BASE_DIR))
+    ap = argparse.ArgumentParser(description="Build the memory-mapped columnar catalog.")
+    ap.add_argument("--catalog", default=str(CATALOG_CSV))
+    ap.add_argument("--force", action="store_true")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    path = build_shared_catalog(args.catalog, force=args.force)
+    cat = SharedCatalog(path)
+    print(f"[shared_catalog] {path} rows={cat.n_rows} columns={len(cat.columns)} {time.perf_counter() - t0:.2f}s")
@@ -0,0 +1,199 @@
+# agent10/startup_budget.py
+# Startup (cold-start) budget check.
+#
+# Cron invocations and autoscaled containers pay the import cost of the
+# pipeline on every start. This script runs `python -X importtime` in a fresh
+# interpreter, parses the per-module timings and fails (exit 1) when:
+#   - the cumulative import time of the target module exceeds the budget, or
+#   - a heavy dependency (pandas / numpy / openai / sklearn) is imported eagerly.
+# For controller it then times the first request in another fresh interpreter:
+# import + one offline controller.main() row (brand rules, catalog, product index,
+# selector artifacts, plan / narrate / verify on OfflineLLM) and fails when that
+# time-to-first-request exceeds its own budget. One untimed run goes first, so
+# artifacts a deploy builds (data/build/) are not billed to startup.
+#
+# Usage:
+#   python agent10/startup_budget.py
+#   python agent10/startup_budget.py --budget-ms 200 --module controller
+#   python agent10/startup_budget.py --first-request-budget-ms 800
+
+import argparse
+import csv
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+AGENT_DIR = Path(__file__).resolve().parent
+
+DEFAULT_MODULE = "controller"
+DEFAULT_BUDGET_MS = float(os.getenv("AGENT10_IMPORT_BUDGET_MS", "250"))
+DEFAULT_FIRST_REQUEST_BUDGET_MS = float(os.getenv("AGENT10_FIRST_REQUEST_BUDGET_MS", "1500"))
+PERSONA_CSV = AGENT_DIR.parent / "data" / "persona_meta_v2.csv"
+
+# one offline row, controller progress prints swallowed; the timings are the last stdout line
+_FIRST_REQUEST_CODE = """
+import contextlib, io, json, time
+t0 = time.perf_counter()
+import controller
+t1 = time.perf_counter()
+from offline_llm import OfflineLLM
+with contextlib.redirect_stdout(io.StringIO()):
+    results = controller.main({persona_id!r}, topk=1, verbose=False, seed=7, llm=OfflineLLM())
+t2 = time.perf_counter()
+print(json.dumps({{"import_ms": (t1 - t0) * 1000.0, "request_ms": (t2 - t1) * 1000.0, "rows": len(results)}}))
+"""
+
+# Heavy dependencies that must only be imported on first use.
+DEFERRED_MODULES = ["pandas", "numpy", "openai", "sklearn", "pyarrow"]
+
+# "import time:       188 |     291096 |             openai.types.graders"
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """Parse `-X importtime` output into (module, self_us, cumulative_us, depth)."""
+    out = []
+    for line in stderr.splitlines():
+        m = _IMPORTTIME_LINE.match(line)
+        if not m:
+            continue
+        self_us, cum_us, indent, name = m.groups()
+        # importtime indents nested imports by two spaces per level
+        depth = max(0, (len(indent) - 1) // 2)
+        out.append((name, int(self_us), int(cum_us), depth))
+    return out
+
+
+def measure_import(module: str) -> Dict[str, object]:
+    """Import `module` in a fresh interpreter and return timings."""
+    code = f"import {module}"
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(AGENT_DIR), env.get("PYTHONPATH", "")]).rstrip(os.pathsep)
+
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=str(AGENT_DIR),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - t0) * 1000.0
+
+    if proc.returncode != 0:
+        raise RuntimeError(f"[startup_budget] `{code}` failed:\n{proc.stderr[-2000:]}")
+
+    entries = parse_importtime(proc.stderr)
+    top = [e for e in entries if e[3] == 0]
+    target = next((e for e in top if e[0] == module), None)
+    imported = {e[0] for e in entries}
+
+    return {
+        "module": module,
+        "wall_ms": wall_ms,
+        "import_ms": (target[2] / 1000.0) if target else 0.0,
+        "entries": entries,
+        "eager_heavy": [m for m in DEFERRED_MODULES if m in imported],
+    }
+
+
+def _first_persona_id() -> str:
+    with PERSONA_CSV.open("r", encoding="utf-8-sig", newline="") as f:
+        return next((r.get("persona_id") or "").strip() for r in csv.DictReader(f) if (r.get("persona_id") or "").strip())
+
+
+def measure_first_request(persona_id: str) -> Dict[str, float]:
+    """Import controller + one offline main() row in a fresh interpreter; returns timings (ms)."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(AGENT_DIR), env.get("PYTHONPATH", "")]).rstrip(os.pathsep)
+    env["OPENAI_OFFLINE"] = "1"
+
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", _FIRST_REQUEST_CODE.format(persona_id=persona_id)],
+        cwd=str(AGENT_DIR),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - t0) * 1000.0
+    if proc.returncode != 0:
+        raise RuntimeError(f"[startup_budget] first request failed:\n{proc.stderr[-2000:]}")
+
+    out = json.loads(proc.stdout.strip().splitlines()[-1])
+    out["first_request_ms"] = out["import_ms"] + out["request_ms"]
+    out["wall_ms"] = wall_ms
+    return out
+
+
+def check_first_request(budget_ms: float = DEFAULT_FIRST_REQUEST_BUDGET_MS, repeat: int = 3) -> bool:
+    """Time-to-first-request check (best of `repeat`, after one untimed warm-up run)."""
+    persona_id = _first_persona_id()
+    measure_first_request(persona_id)  # builds missing artifacts / brand-rule cache, untimed
+    runs = [measure_first_request(persona_id) for _ in range(max(1, int(repeat)))]
+    best = min(runs, key=lambda r: r["first_request_ms"])
+
+    print(f"[startup_budget] first request persona={persona_id} total={best['first_request_ms']:.1f}ms "
+          f"(import={best['import_ms']:.1f}ms main={best['request_ms']:.1f}ms rows={best['rows']}) "
+          f"wall={best['wall_ms']:.1f}ms budget={budget_ms:.1f}ms")
+    if not best["rows"]:
+        print("[startup_budget] FAIL: first request produced no rows")
+        return False
+    if best["first_request_ms"] > budget_ms:
+        print(f"[startup_budget] FAIL: time-to-first-request {best['first_request_ms']:.1f}ms > budget {budget_ms:.1f}ms")
+        return False
+    return True
+
+
+def check(
+    module: str = DEFAULT_MODULE,
+    budget_ms: float = DEFAULT_BUDGET_MS,
+    repeat: int = 3,
+    top_n: int = 10,
+    first_request_budget_ms: float = DEFAULT_FIRST_REQUEST_BUDGET_MS,
+) -> bool:
+    """
+    Run the budget check and print a report.
+    The best of `repeat` runs is used so a single noisy run does not fail CI.
+    module == "controller" also checks time-to-first-request (0 budget -> skipped).
+    """
+    runs = [measure_import(module) for _ in range(max(1, int(repeat)))]
+    best = min(runs, key=lambda r: r["import_ms"])
+
+    print(f"[startup_budget] module={module} import={best['import_ms']:.1f}ms "
+          f"wall={best['wall_ms']:.1f}ms budget={budget_ms:.1f}ms")
+
+    slowest = sorted(best["entries"], key=lambda e: e[1], reverse=True)[:top_n]
+    for name, self_us, cum_us, _ in slowest:
+        print(f"  self={self_us / 1000.0:7.2f}ms  cum={cum_us / 1000.0:7.2f}ms  {name}")
+
+    ok = True
+    if best["eager_heavy"]:
+        print(f"[startup_budget] FAIL: heavy modules imported at startup: {best['eager_heavy']}")
+        ok = False
+    if best["import_ms"] > budget_ms:
+        print(f"[startup_budget] FAIL: import time {best['import_ms']:.1f}ms > budget {budget_ms:.1f}ms")
+        ok = False
+    if module == "controller" and first_request_budget_ms > 0:
+        ok = check_first_request(first_request_budget_ms, repeat) and ok
+    if ok:
+        print("[startup_budget] OK")
+    return ok
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Fail when agent10 cold-start exceeds its import / first-request budget.")
+    ap.add_argument("--module", default=DEFAULT_MODULE)
+    ap.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--first-request-budget-ms", type=float, default=DEFAULT_FIRST_REQUEST_BUDGET_MS,
+                    help="import + one offline controller.main() row (0 = skip)")
+    args = ap.parse_args()
+
+    sys.exit(0 if check(args.module, args.budget_ms, args.repeat, args.top, args.first_request_budget_ms) else 1)
@@ -1,8 +1,15 @@
 
 # agent10/strategy_narrator.py
+import json
+import os
 import re
 from typing import Any, Dict, List, Optional, Tuple
 
+from agent_logging import get_logger
+from token_ledger import acquire_call, llm_stage, prompt_mode_from
+
+log = get_logger("strategy_narrator")
+
 # Optional import for tone_templates
 try:
     from tone_templates import SLOT4_PAD_POOL, PAD_POOL
@@ -22,6 +29,62 @@ except Exception:
     brand_rules = None
 
 
+# -------------------------------------------------
+# Structured output (output_mode="json"): one call -> title + 4 slots
+# -------------------------------------------------
+OUTPUT_MODES = ("text", "json")
+STRUCTURED_KEYS = ("title", "slot1", "slot2", "slot3", "slot4")
+
+STRUCTURED_OUTPUT_BLOCK = """
+[출력 형식 - JSON]
+- 아래 키만 가진 JSON 객체 하나만 출력하세요 (설명/코드블록/다른 키 금지):
+  {"title": "...", "slot1": "...", "slot2": "...", "slot3": "...", "slot4": "..."}
+- slot1~slot4: 위 규칙의 4개 문단을 각 키에 하나씩 (빈 줄 구분 대신 키로 나눔, 문단 안 줄바꿈 금지)
+- title: 25~40자 제목, 이모지 1~2개 포함, BODY 문장 재사용 금지, 설명체/하다체 금지
+"""
+
+
+def parse_structured_message(text: Any) -> Dict[str, str]:
+    """
+    Strict parse of the structured response: exactly one JSON object with exactly
+    STRUCTURED_KEYS, every value a non-empty string. Raises ValueError otherwise
+    (no fence stripping / paragraph recovery).
+    """
+    if isinstance(text, dict):
+        text = text.get("text", "")
+    try:
+        obj = json.loads(text)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"structured output is not JSON: {e}") from None
+    if not isinstance(obj, dict):
+        raise ValueError(f"structured output is {type(obj).__name__}, expected object")
+    if set(obj) != set(STRUCTURED_KEYS):
+        raise ValueError(f"structured output keys {sorted(obj)} != {list(STRUCTURED_KEYS)}")
+    out: Dict[str, str] = {}
+    for k in STRUCTURED_KEYS:
+        v = obj[k]
+        if not isinstance(v, str) or not v.strip():
+            raise ValueError(f"structured output field {k!r} must be a non-empty string")
+        out[k] = v.strip()
+    return out
+
+
+# Brand isolation: ban any "프리메라의 메이크온" or "프리메라 메이크온" or similar hybrids
+def _brand_isolation_filter(text: str) -> str:
+    # Only remove explicit hybrid strings, do NOT infer or replace brands
+    text = re.sub(r"(프리메라의\s*메이크온|프리메라\s*메이크온|아모레\s*메이크온|아모레퍼시픽\s*메이크온)", "메이크온", text)
+    return text
+
+
+# slot roles named in the slot repair prompt (repair_slots)
+REPAIR_SLOT_ROLES = {
+    1: "상황/공감 도입",
+    2: "연결어로 시작하는 제품 제안",
+    3: "사용감/루틴 체감",
+    4: "부담 없는 마무리",
+}
+
+
 class StrategyNarrator:
     def _force_inject_brand(self, text: str, brand: str, product: str) -> str:
         """
@@ -111,6 +174,12 @@ class StrategyNarrator:
     ):
         self.llm = llm_client
         self.tone_profile_map = tone_profile_map or {}
+        # prompt_mode: "full" (기존 프롬프트 그대로) | "compact" (조건부 블록만 + 중복 규칙 제거)
+        self.prompt_mode = prompt_mode_from(kwargs.get("prompt_mode"))
+        # output_mode: "text" (본문/제목 2회 호출) | "json" (제목+slot1..4 JSON 1회 호출)
+        self.output_mode = str(kwargs.get("output_mode") or os.getenv("AGENT10_NARRATOR_OUTPUT", "") or "text").strip().lower()
+        if self.output_mode not in OUTPUT_MODES:
+            raise ValueError(f"unknown narrator output mode {self.output_mode!r} (expected one of {OUTPUT_MODES})")
         # pad_pool: argument > PAD_POOL from tone_templates > fallback default
         if pad_pool is not None:
             self.pad_pool = pad_pool
@@ -603,7 +672,15 @@ class StrategyNarrator:
         return ""
 
     def _is_mask_pack(self, row: Dict[str, Any]) -> bool:
-        """Heuristic: detect sheet/mask pack products."""
+        """Detect sheet/mask pack products.
+
+        Controller sets row["is_mask_pack"] from the product index facets (O(1) read);
+        the keyword heuristic below is kept for rows that do not carry the flag.
+        """
+        flag = row.get("is_mask_pack")
+        if isinstance(flag, bool):
+            return flag
+
         hay = " ".join(
             [
                 self._s(row.get("상품명")),
@@ -943,8 +1020,13 @@ class StrategyNarrator:
             {"role": "system", "content": "너는 광고 카피 편집자다."},
             {"role": "user", "content": prompt},
         ]
-        out = self.llm.generate(messages=messages)
-        shortened = out["text"] if isinstance(out, dict) else out
+        if acquire_call("shorten"):
+            with llm_stage("shorten"):
+                out = self.llm.generate(messages=messages)
+            shortened = out["text"] if isinstance(out, dict) else out
+        else:
+            # call budget exhausted: plain truncation below
+            shortened = last_sentence
         # Clean result
         shortened = self._hard_clean(shortened)
         # Ensure it's not longer than allowed
@@ -970,7 +1052,16 @@ class StrategyNarrator:
         - Asks LLM to insert exactly ONE sentence.
         - Sentence must be ad-style, connective, no new facts.
         - Insertion position is 자유 (LLM decides).
+        - Call budget exhausted: deterministic fact-based expansion sentence instead.
         """
+        if not acquire_call("insert"):
+            lines = self._split_4lines(body)
+            for slot_id in (3, 2):
+                exp = self._build_slot23_expansion_sentence(row, plan, slot_id)
+                if exp and exp not in body:
+                    lines[slot_id - 1] = self._enforce_slot_punct(self._hard_clean(f"{lines[slot_id - 1]} {exp}"), slot_id)
+                    return self._join_4lines(lines)
+            return body
         prompt = f"""
 아래 광고 문단은 글자 수가 부족합니다.
 의미를 바꾸지 말고, **접속사로 시작하는 광고 문장 1문장만** 추가해 주세요.
@@ -990,7 +1081,8 @@ class StrategyNarrator:
             {"role": "system", "content": "너는 마케팅 카피 편집자다."},
             {"role": "user", "content": prompt},
         ]
-        out = self.llm.generate(messages=messages)
+        with llm_stage("insert"):
+            out = self.llm.generate(messages=messages)
         text = out["text"] if isinstance(out, dict) else out
         # Preserve slot/newline structure
         text = self._hard_clean_keep_newlines(text)
@@ -1009,6 +1101,8 @@ class StrategyNarrator:
         """
         시스템 프롬프트: STRICT SLOT-ONLY, TITLE/BODY 예시·라벨·구조 금지
         """
+        if self.prompt_mode == "compact":
+            return self._build_system_prompt_compact(brand_name)
         base_prompt = """
 너는 고객 상담자나 CS 직원이 아니다.
 너는 내부 마케팅 담당자다.
@@ -1094,6 +1188,34 @@ class StrategyNarrator:
 """
         return base_prompt + brand_rule_block
 
+    def _build_system_prompt_compact(self, brand_name: str) -> str:
+        """
+        compact 모드 시스템 프롬프트: full 버전과 같은 규칙을 한 번씩만 기술
+        (톤앤매너/품질 규칙의 금지어, 말투, slot4 마무리, 느낌표 상한 병합).
+        """
+        return """
+너는 내부 마케팅 담당자다(상담원/CS 아님). 정보 나열이 아니라 정제된 광고 카피 문단을 쓴다.
+
+[슬롯 구성]
+- BODY는 4개 슬롯(4문단), 슬롯당 2~3문장. slot2+slot3은 하나의 광고 문단처럼 이어져도 된다.
+- slot1: 상황 도입/공감. '?' 최대 1회, '!'·이모지 금지.
+- slot2: "그래서/이럴 때/이런 분께" 같은 연결어로 제품 제안(제품명 1회 이상). '?'·이모지 금지, '!' 1~2회.
+- slot3: 사용 장면을 설명하지 말고 체감/사용감을 이어 붙인다. slot2와 같은 부호 규칙.
+- slot4: 단정적·확신형 마무리 + 구매 행동을 떠올리게 하는 구체성(예: "한 번 쓰고 다시 찾게 되는 타입이에요"). 문제 제기형 질문 금지(제안형 질문만 허용), '!' 0~1회, 이모지 ✨/💧 1회.
+- 느낌표는 BODY 전체 최대 2회.
+
+[표현]
+- 추상적 찬양·감정 호소 대신 체감 결과로 쓴다(예: "속당김이 줄어요", "오후에도 화장이 밀리지 않아요").
+- 금지어: 완벽한, 최고의, 해결책, 동반자, 필수템, 인생템, 기적, 혁신, 세련된 느낌, 자신감 있는 하루, 여유로운 아침.
+- 해요체 기본, "~해요"만 반복하지 말고 "~죠/~돼요"로 변주. ~입니다/~합니다/설명체/하다체 금지.
+- "~인 것 같아요", "손이 자주 가는 편이에요" 같은 회화체 완곡 금지. 동료가 경험담을 말하듯 담백하게.
+
+[절대 규칙]
+- 입력 값을 그대로 복사하지 않는다(콤마/슬래시/파이프 나열, "높음" 같은 등급, "선호/유형/채널" 같은 필드명 노출 금지).
+- 모든 문장은 완전한 문장으로 끝내고 . ! ? 로 끊는다.
+- 브랜드는 하나만 쓴다. 제품명 속 브랜드가 CSV brand보다 우선이며, "프리메라 메이크온"·"아모레 메이크온" 같은 혼종 표기는 오답이다.
+"""
+
     def _build_user_prompt(
         self,
         row: Dict[str, Any],
@@ -1138,6 +1260,8 @@ class StrategyNarrator:
         plan: Dict[str, Any],
         brand_rule: Dict[str, Any],
     ) -> str:
+        if self.prompt_mode == "compact":
+            return self._build_user_prompt_compact(row, plan, brand_rule)
         brand_name = self._s(row.get("brand", ""))
         product_name = self._s(row.get("상품명", "제품"))
         # --- Persona guards (Fear Factor / Time / Tone) ---
@@ -1146,14 +1270,6 @@ class StrategyNarrator:
         time_of_use = self._s(persona_fields.get("time_of_use") or row.get("time_of_use", ""))
         tone_pref = self._s(persona_fields.get("message_tone_preference") or row.get("message_tone_preference", ""))
 
-        is_sensitive = any(k in skin_concern for k in ["민감", "홍조", "따가움"])
-
-        negative_keywords: List[str] = []
-        preferred_keywords: List[str] = []
-        if is_sensitive:
-            negative_keywords = ["고농축", "영양", "활력", "채워", "리치", "탄탄", "밀도", "집중 케어"]
-            preferred_keywords = ["진정", "장벽", "편안", "순한", "부드럽", "다독", "안정"]
-
         prompt = f"""
 [작성 지시]
 아래 정보를 참고하여 {brand_name}의 마케팅 메시지를 작성하세요.
@@ -1228,8 +1344,17 @@ class StrategyNarrator:
 - 첫 번째 언급: 제품 풀 네임 사용
 - 두 번째 언급부터: "이 크림"처럼 짧게 줄여 지칭
 """
+        prompt += self._persona_guard_blocks(skin_concern, time_of_use, tone_pref)
+        return prompt
+
+    def _persona_guard_blocks(self, skin_concern: str, time_of_use: str, tone_pref: str) -> str:
+        """Persona guards (Fear Factor / Time / Tone): each block only when its trigger holds."""
+        prompt = ""
+        is_sensitive = any(k in skin_concern for k in ["민감", "홍조", "따가움"])
         # --- Negative keyword guard (Sensitive / Redness / Stinging) ---
         if is_sensitive:
+            negative_keywords = ["고농축", "영양", "활력", "채워", "리치", "탄탄", "밀도", "집중 케어"]
+            preferred_keywords = ["진정", "장벽", "편안", "순한", "부드럽", "다독", "안정"]
             prompt += f"""
 [민감성/홍조/따가움 금지어 규칙]
 - 다음 단어/뉘앙스는 절대 사용 금지: {", ".join(negative_keywords)}
@@ -1260,6 +1385,82 @@ class StrategyNarrator:
 """
         return prompt
 
+    # 성분 -> 효능 맥락 (compact: 전성분에 실제로 있는 성분만 프롬프트에 포함)
+    _INGREDIENT_BENEFITS = (
+        ("아데노신", "탄력/주름 케어 맥락"),
+        ("세라마이드", "장벽/속당김 완화 맥락"),
+        ("나이아신아마이드", "톤/맑기(미백) 맥락"),
+    )
+
+    def _build_user_prompt_compact(
+        self,
+        row: Dict[str, Any],
+        plan: Dict[str, Any],
+        brand_rule: Dict[str, Any],
+    ) -> str:
+        """
+        compact 모드 user 프롬프트.
+        - 조건부 블록(안티에이징 타게팅, 성분 효능, 작성 팁, 제품명 표기)은 트리거가 있을 때만
+        - 시스템 프롬프트와 겹치는 부호/복사 금지/브랜드 규칙은 생략 (마스크팩 규칙은 generate()가 추가)
+        - 고객 정보는 값이 있는 항목만 "항목: 값" 한 줄씩
+        """
+        brand_name = self._s(row.get("brand", ""))
+        product_name = self._s(row.get("상품명", "제품"))
+        persona_fields = plan.get("persona_fields") or {}
+
+        def _field(k: str) -> str:
+            return self._s(persona_fields.get(k) or row.get(k))
+
+        skin_concern = self._s(row.get("skin_concern", ""))
+        skin_type = _field("skin_type")
+        time_of_use = _field("time_of_use")
+        tone_pref = _field("message_tone_preference")
+        lifestyle = self._s(row.get("lifestyle", ""))
+        texture = self._safe_hint(_field("texture_preference"), "texture")
+        prefs = [h for h in (
+            texture,
+            self._safe_hint(_field("finish_preference"), "finish"),
+            self._safe_hint(_field("scent_preference"), "scent"),
+        ) if h]
+        ingredient_text = self._get_ingredient_text(row)
+
+        info = [("라이프스타일", lifestyle), ("피부 고민", skin_concern), ("추천 제품", product_name),
+                ("제형/마무리/향 취향", ", ".join(prefs)), ("주요 성분", ingredient_text)]
+        prompt = (
+            "\n[작성 지시]\n"
+            f"아래 정보를 참고하여 {brand_name}의 마케팅 메시지를 작성하세요.\n"
+            "- 출력은 4개 문단(슬롯)만, 문단 사이는 빈 줄(\\n\\n)로 구분\n"
+            "- 제품명은 2~3문단 어딘가에 자연스럽게 1회 이상 포함\n"
+            "\n[고객 정보]\n"
+            + "".join(f"- {k}: {v}\n" for k, v in info if v)
+        )
+
+        benefits = [f"  · {ing}: {ctx}\n" for ing, ctx in self._INGREDIENT_BENEFITS if ing in ingredient_text]
+        if benefits:
+            prompt += "\n[효능 기반 표현 규칙]\n- 성분 기반 효능을 결과 중심으로 풀어 써라.\n" + "".join(benefits)
+
+        if "건성" in skin_type or any(k in skin_concern for k in ["주름", "탄력", "안티에이징"]):
+            prompt += (
+                "\n[페르소나 타게팅 강제 규칙]\n"
+                "- 사용 금지: 피지 · 트러블 · 유분 · 산뜻 · 상쾌 · 쿨링 · 진정 위주\n"
+                "- 중심 개념: 속건조 · 주름 · 탄력 저하 · 밀도 · 영양감 · 고농축 · 집중 케어 · 리페어(회복)\n"
+                "- 제형은 '가볍다/산뜻하다' 대신 '끈적임 없이 고농축 영양만 남긴다', '밀도 있게 채워준다'로 재해석\n"
+                "- 마무리 인상은 '탄탄하게 채워진 느낌', '다음 날까지 이어지는 밀도감'\n"
+            )
+
+        tips = []
+        if texture:
+            tips.append("- 선호 제형이 주는 실제 사용감을 구체적으로 묘사 (예: 세미매트 → \"바로 마스크를 써도 묻어나지 않아요\")\n")
+        if lifestyle:
+            tips.append("- 라이프스타일과 제품 효능을 인과관계로 연결 (예: 바쁜 아침 → 빠른 흡수)\n")
+        if tips:
+            prompt += "\n[작성 팁]\n" + "".join(tips)
+
+        if len(product_name.split()) >= 3:
+            prompt += "\n[제품명 표기 규칙]\n- 첫 언급은 풀 네임, 두 번째부터는 \"이 크림\"처럼 짧게 지칭\n"
+
+        prompt += self._persona_guard_blocks(skin_concern, time_of_use, tone_pref)
+        return prompt
 
     # -------------------------
     # New slot helper prompt builders
@@ -1328,12 +1529,6 @@ class StrategyNarrator:
         product_name = self._s(row.get("상품명", ""))
 
         # Brand detection logic removed: always use row["brand"] as brand_name.
-        # Brand isolation: ban any "프리메라의 메이크온" or "프리메라 메이크온" or similar hybrids
-        def _brand_isolation_filter(text: str) -> str:
-            # Only remove explicit hybrid strings, do NOT infer or replace brands
-            text = re.sub(r"(프리메라의\s*메이크온|프리메라\s*메이크온|아모레\s*메이크온|아모레퍼시픽\s*메이크온)", "메이크온", text)
-            return text
-
         skin_concern = self._s(row.get("skin_concern", ""))
         lifestyle_raw = self._as_text(row.get("lifestyle", ""))
         lifestyle_phrase = self._lifestyle_phrase(lifestyle_raw)
@@ -1422,12 +1617,13 @@ class StrategyNarrator:
                 "- '영양', '고농축', '집중 케어', '리페어', '장벽', '주름', '탄력' 등 영양/리페어/안티에이징/장벽 중심 표현은 절대 사용 금지.\n"
                 "- 반드시 '맑은 피부', '톤업', '광채', '화사함', '메이크업 부스터', '메이크업 지속', '메이크업 전에', '화장이 잘 받게' 등으로만 효능을 표현하세요.\n"
             )
-        # 4. Brand isolation (ban any hybrid string)
-        extra_instructions += (
-            "\n[브랜드 표기 강제 규칙]\n"
-            "- 본문/제목에서 '프리메라의 메이크온', '프리메라 메이크온', '아모레 메이크온' 등 혼종 브랜드 표기는 즉시 오답입니다.\n"
-            "- 반드시 단일 브랜드명만 사용하세요.\n"
-        )
+        # 4. Brand isolation (ban any hybrid string); compact: already in the system prompt
+        if self.prompt_mode != "compact":
+            extra_instructions += (
+                "\n[브랜드 표기 강제 규칙]\n"
+                "- 본문/제목에서 '프리메라의 메이크온', '프리메라 메이크온', '아모레 메이크온' 등 혼종 브랜드 표기는 즉시 오답입니다.\n"
+                "- 반드시 단일 브랜드명만 사용하세요.\n"
+            )
         # 5. Slot-level constraints (slot3 must always mention routine/time, slot4 must fit length)
         extra_instructions += (
             "\n[슬롯별 규칙]\n"
@@ -1437,22 +1633,42 @@ class StrategyNarrator:
         # Inject all extra instructions at the end of user_prompt
         user_prompt += extra_instructions
 
+        # structured mode: title + slots come back as one JSON object
+        structured_title: Optional[str] = None
+        if self.output_mode == "json":
+            user_prompt += STRUCTURED_OUTPUT_BLOCK
+
         messages = [
             {"role": "system", "content": self._build_system_prompt(brand_name)},
             {"role": "user", "content": user_prompt},
         ]
-        raw_text = self.llm.generate(messages=messages)
-        paragraph_text = raw_text["text"] if isinstance(raw_text, dict) else raw_text
-        paragraph_text = self._hard_clean_keep_newlines(paragraph_text)
-        # Brand isolation: filter out any hybrid brand strings in LLM output
-        paragraph_text = _brand_isolation_filter(paragraph_text)
-
-        # 문단 분리 (절대 쪼개거나 재작성 금지)
-        paragraphs = [p.strip() for p in paragraph_text.split("\n\n") if p.strip()]
-        slot1 = paragraphs[0] if len(paragraphs) > 0 else ""
-        slot2 = paragraphs[1] if len(paragraphs) > 1 else ""
-        slot3 = paragraphs[2] if len(paragraphs) > 2 else ""
-        slot4 = paragraphs[3] if len(paragraphs) > 3 else ""
+        if self.output_mode == "json":
+            slots = self._generate_structured(messages)
+            # per-slot guards (same cleaning as the text path, one paragraph per slot)
+            slot1, slot2, slot3, slot4 = (
+                _brand_isolation_filter(" ".join(self._hard_clean_keep_newlines(slots.get(f"slot{n}", "")).split()))
+                for n in range(1, 5)
+            )
+            # "" when the call was refused / invalid -> deterministic fallback title below
+            structured_title = slots.get("title", "")
+        else:
+            # call budget exhausted (e.g. repair regeneration): empty draft, the deterministic
+            # slot padding below (_ensure_len_300_350) builds the body
+            raw_text = ""
+            if acquire_call("body"):
+                with llm_stage("body"):
+                    raw_text = self.llm.generate(messages=messages)
+            paragraph_text = raw_text["text"] if isinstance(raw_text, dict) else raw_text
+            paragraph_text = self._hard_clean_keep_newlines(paragraph_text)
+            # Brand isolation: filter out any hybrid brand strings in LLM output
+            paragraph_text = _brand_isolation_filter(paragraph_text)
+
+            # 문단 분리 (절대 쪼개거나 재작성 금지)
+            paragraphs = [p.strip() for p in paragraph_text.split("\n\n") if p.strip()]
+            slot1 = paragraphs[0] if len(paragraphs) > 0 else ""
+            slot2 = paragraphs[1] if len(paragraphs) > 1 else ""
+            slot3 = paragraphs[2] if len(paragraphs) > 2 else ""
+            slot4 = paragraphs[3] if len(paragraphs) > 3 else ""
 
         # --- Ensure slot2 begins with a transition phrase ---
         slot2_starts = ("그 해답은", "이런 고민을 위해", "그래서", "이럴 때")
@@ -1576,7 +1792,14 @@ class StrategyNarrator:
             {"role": "system", "content": "제목만 한 줄로 작성하세요."},
             {"role": "user", "content": title_prompt},
         ]
-        title_out = self.llm.generate(messages=title_messages)
+        # call budget exhausted: _ensure_title_25_40_with_emojis builds the fallback title
+        title_out = ""
+        if structured_title is not None:
+            # structured mode: title came with the slots, no second round trip
+            title_out = structured_title
+        elif acquire_call("title"):
+            with llm_stage("title"):
+                title_out = self.llm.generate(messages=title_messages)
         title = self._ensure_title_25_40_with_emojis(
             self._s(title_out.get("text", "") if isinstance(title_out, dict) else title_out),
             brand_name,
@@ -1645,6 +1868,193 @@ class StrategyNarrator:
             final_text += "."
         final_text = self._force_inject_brand(final_text, brand_name, product_name)
         return final_text
+
+    def _generate_structured(self, messages: List[Dict[str, str]]) -> Dict[str, str]:
+        """
+        One JSON-mode call for title + slot1..4, strictly parsed.
+        Refused by the call budget or invalid output -> {} (deterministic slot padding
+        and fallback title take over; no heuristic recovery of malformed output).
+        """
+        if not acquire_call("message"):
+            return {}
+        with llm_stage("message"):
+            raw = self.llm.generate(messages=messages, response_format={"type": "json_object"})
+        try:
+            return parse_structured_message(raw)
+        except ValueError as e:
+            log.warning("%s -> deterministic fallback", e)
+            return {}
+
+    # -------------------------
+    # slot-level repair (Executor: repair_planner.plan_repairs -> repair_slots)
+    # -------------------------
+    def repair_slots(
+        self,
+        message: str,
+        slot_errors: Dict[int, List[str]],
+        row: Dict[str, Any],
+        plan: Dict[str, Any],
+    ) -> str:
+        """
+        Rewrite only the slots in slot_errors ({slot_id: [error, ...]}, 1-based);
+        the title and the other slots are returned unchanged.
+        - one short "repair" call per slot (the slot + its neighbours as context)
+        - call refused by the budget, or the rewrite still misses a fix:
+          the deterministic fix for that error is applied on top (must_include /
+          viewpoint have none: plan_repairs(tried=...) sends them to full regeneration)
+        """
+        from repair_planner import parse_error, split_body
+
+        title_line, _, body_line = self._s(message).partition("\n")
+        title = re.sub(r"^\s*TITLE:\s*", "", title_line)
+        slots = split_body(body_line)
+        brand = self._s(row.get("brand", ""))
+        product = self._s(row.get("상품명", ""))
+
+        for n, errs in sorted(slot_errors.items()):
+            fixes = [parse_error(e) for e in errs]
+            original = slots[n - 1]
+            text = ""
+            if acquire_call("repair"):
+                messages = [
+                    {"role": "system", "content": "너는 마케팅 카피 편집자다."},
+                    {"role": "user", "content": self._build_user_prompt_slot_repair(slots, n, fixes, brand, product)},
+                ]
+                with llm_stage("repair"):
+                    out = self.llm.generate(messages=messages)
+                text = out["text"] if isinstance(out, dict) else out
+                # one paragraph, echoed "[slotN]" label dropped
+                text = " ".join(self._hard_clean_keep_newlines(text).split())
+                text = re.sub(rf"^\[?slot\s*{n}\]?\s*:?\s*", "", text, flags=re.IGNORECASE)
+            text = _brand_isolation_filter(text or original)
+            text = self._apply_slot_fixes(text, original, n, fixes, row, plan, brand, product)
+
+            if n == 2 and not text.startswith(("그 해답은", "이런 고민을 위해", "그래서", "이럴 때")):
+                text = "이런 고민을 위해, " + text
+            if n == 4 and len(text) > 80:
+                text = text[:80].rstrip()
+            slots[n - 1] = self._enforce_slot_punct(text, n)
+
+        final_text = f"TITLE: {title}\nBODY: {self._join_4lines(slots)}"
+        return self._polish_final_text(self._finalize_text(final_text))
+
+    def _apply_slot_fixes(
+        self,
+        text: str,
+        original: str,
+        slot_id: int,
+        fixes: List[Tuple[str, List[str]]],
+        row: Dict[str, Any],
+        plan: Dict[str, Any],
+        brand: str,
+        product: str,
+    ) -> str:
+        """Deterministic per-error fix; no-op for errors the (rewritten) slot already satisfies."""
+        from verifier import NL_ANOMALY_PATTERNS
+
+        def _norm(s: str) -> str:
+            return re.sub(r"\s+", "", s)
+
+        for code, kws in fixes:
+            if code == "banned":
+                for k in kws:
+                    text = text.replace(k, "")
+            elif code == "nl_anomaly":
+                # grouped pattern (duplicated token) keeps one copy, otherwise the fragment is dropped
+                for p in NL_ANOMALY_PATTERNS:
+                    text = re.sub(p, lambda m: m.group(1) if m.groups() else "", text)
+            elif code in ("brand_missing", "product_missing"):
+                has_brand = not brand or _norm(brand) in _norm(text)
+                has_product = not product or _norm(product) in _norm(text)
+                if has_brand and has_product:
+                    continue
+                if not has_brand and product and product in text:
+                    text = text.replace(product, f"{brand} {product}", 1)
+                else:
+                    core = product if has_brand else f"{brand} {product}".strip()
+                    text = f"이럴 때 {core} 하나면 충분해요. {text}"
+            elif code in ("must_include", "viewpoint"):
+                # no deterministic fix: brand-rule text (viewpoint sentences, bare keywords)
+                # never goes into the copy verbatim. A rewrite that still misses it fails
+                # the re-check and the executor escalates it to a full regeneration.
+                continue
+            elif code == "slot_count<4":
+                if text.strip():
+                    continue
+                if slot_id == 1:
+                    life = self._lifestyle_phrase(self._as_text(row.get("lifestyle", ""))) or "실내 환경이 건조한 날엔"
+                    text = f"{life}, 피부가 먼저 신호를 보내지 않나요?"
+                elif slot_id in (2, 3):
+                    text = self._build_slot23_expansion_sentence(row, plan, slot_id)
+                else:
+                    text = "오늘 루틴에 한 단계만 더해 가볍게 이어가 보세요 ✨"
+            elif code == "body_too_short":
+                if len(text) > len(original):
+                    continue
+                exp = self._build_slot23_expansion_sentence(row, plan, slot_id) if slot_id in (2, 3) else ""
+                text = f"{text} {exp or '오늘 루틴에 자연스럽게 이어가도 부담 없어요.'}"
+        return re.sub(r"\s{2,}", " ", text).strip()
+
+    def _build_user_prompt_slot_repair(
+        self,
+        slots: List[str],
+        slot_id: int,
+        fixes: List[Tuple[str, List[str]]],
+        brand: str,
+        product: str,
+    ) -> str:
+        """Short rewrite prompt for one slot: what to fix + the neighbouring slots as context."""
+        fix_lines = []
+        for code, kws in fixes:
+            if code == "banned":
+                fix_lines.append(f"- 다음 표현은 빼고 쓰세요: {', '.join(kws)}")
+            elif code == "must_include":
+                fix_lines.append(f"- 다음 중 1개 이상을 자연스럽게 포함: {', '.join(kws)}")
+            elif code == "viewpoint":
+                fix_lines.append(f"- 다음 브랜드 관점을 반영: {' / '.join(kws)}")
+            elif code == "brand_missing":
+                fix_lines.append(f"- 브랜드명 '{brand}'을(를) 1회 포함")
+            elif code == "product_missing":
+                fix_lines.append(f"- 제품명 '{product}'을(를) 1회 포함")
+            elif code == "nl_anomaly":
+                fix_lines.append("- 어색한 숫자/중복 표현(예: '5에', '잦음도 잦음')을 자연스럽게 고치기")
+            elif code == "slot_count<4":
+                fix_lines.append("- 비어 있는 문단입니다. 앞뒤 문단을 잇는 2문장을 새로 쓰세요")
+            elif code == "body_too_short":
+                fix_lines.append("- 의미를 유지한 채 1문장을 덧붙여 조금 더 길게")
+            else:
+                fix_lines.append(f"- {code} 해결")
+        role = REPAIR_SLOT_ROLES.get(slot_id, "")
+        punct = {
+            1: "'?' 최대 1회, '!'·이모지 금지",
+            2: "'?'·이모지 금지, '!' 1~2회",
+            3: "'?'·이모지 금지, '!' 1~2회",
+            4: "60~80자, 이모지 1개까지",
+        }[slot_id]
+        prev_text = slots[slot_id - 2] if slot_id > 1 else ""
+        next_text = slots[slot_id] if slot_id < 4 else ""
+        fixes_text = "\n".join(fix_lines)
+        return f"""
+아래 광고 BODY의 slot{slot_id}({role})만 고쳐 쓰세요.
+브랜드: {brand}
+제품: {product}
+
+[고칠 점]
+{fixes_text}
+
+[규칙]
+- 고친 slot{slot_id} 한 문단만 출력 (라벨·따옴표·설명 금지)
+- 2~3문장, 새로운 수치·효능 주장 금지
+- {punct}
+
+[앞 문단]
+{prev_text or '(없음)'}
+[slot{slot_id}]
+{slots[slot_id - 1] or '(비어 있음)'}
+[뒤 문단]
+{next_text or '(없음)'}
+""".strip()
+
     def _has_emoji(self, s: str) -> bool:
         import re
         if not s:
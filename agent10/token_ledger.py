@@ -0,0 +1,302 @@
+# agent10/token_ledger.py
+# Prompt / completion token accounting per pipeline stage.
+#
+# - estimate_tokens(): local estimator (tiktoken when installed, otherwise a
+#   script-aware heuristic: Hangul ~1 token per syllable, other text ~4 chars/token)
+# - llm_stage("body") sets the stage in a contextvar, so the call site that knows
+#   *what* it is asking for labels the call and the client wrapper only reads it
+# - MeteredLLM wraps the chat client: every generate() is recorded in a TokenLedger
+#   (prompt tokens, completion tokens, latency) under stage + its brand/persona labels
+# - per-stage prompt budgets warn when a prompt grows past its limit
+#   (AGENT10_PROMPT_BUDGET_<STAGE>=<tokens> overrides, 0 disables)
+# - per-message call budget: begin_message_budget() opens a CallBudget for one
+#   generated message (planner + narrator + repairs); every LLM call site asks
+#   acquire_call(stage) first and takes its deterministic fallback when refused
+#   (AGENT10_MAX_LLM_CALLS_PER_MESSAGE, default 6, 0 = unlimited)
+#
+# The ledger summary is exported with the run timing via controller.main(run_stats=...).
+
+import contextvars
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+from agent_logging import get_logger
+
+log = get_logger("token_ledger")
+
+# per-call prompt budgets (estimated tokens); stages not listed are unbudgeted
+STAGE_PROMPT_BUDGETS: Dict[str, int] = {
+    "plan": 700,
+    "body": 3500,
+    "title": 250,
+    "message": 3800,  # structured title + 4 slots in one call (narrator output_mode="json")
+    "shorten": 400,
+    "insert": 700,
+    "repair": 600,  # one slot rewrite (repair_planner -> StrategyNarrator.repair_slots)
+}
+
+# chat format overhead (gpt-4o family): per message + reply priming
+_TOKENS_PER_MESSAGE = 3
+_TOKENS_REPLY = 3
+
+_HANGUL_RE = re.compile(r"[가-힣ㄱ-ㆎ]")
+_WS_RE = re.compile(r"\s+")
+
+_STAGE: contextvars.ContextVar = contextvars.ContextVar("agent10_llm_stage", default="unlabeled")
+_BUDGET: contextvars.ContextVar = contextvars.ContextVar("agent10_call_budget", default=None)
+
+# planner 1 + body 1 + title 1 + up to 2 length inserts, +1 for a repair regeneration
+DEFAULT_MAX_CALLS_PER_MESSAGE = 6
+
+_ENCODER: Any = None
+
+
+def _encoder():
+    global _ENCODER
+    if _ENCODER is None:
+        try:
+            import tiktoken
+
+            _ENCODER = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _ENCODER = False
+    return _ENCODER
+
+
+def estimate_tokens(text: Any) -> int:
+    if not text:
+        return 0
+    text = str(text)
+    enc = _encoder()
+    if enc:
+        return len(enc.encode(text))
+    hangul = len(_HANGUL_RE.findall(text))
+    rest = len(_WS_RE.sub(" ", text)) - hangul
+    return hangul + (rest + 3) // 4
+
+
+def estimate_prompt_tokens(messages: Any) -> int:
+    """Chat messages (list of {"role","content"}) or a bare prompt string."""
+    if messages is None:
+        return 0
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    n = _TOKENS_REPLY
+    for m in messages:
+        if isinstance(m, dict):
+            n += _TOKENS_PER_MESSAGE + estimate_tokens(m.get("content", "")) + estimate_tokens(m.get("role", ""))
+        else:
+            n += _TOKENS_PER_MESSAGE + estimate_tokens(m)
+    return n
+
+
+def stage_budget(stage: str) -> int:
+    env = os.getenv(f"AGENT10_PROMPT_BUDGET_{stage.upper()}", "").strip()
+    if env.isdigit():
+        return int(env)
+    return STAGE_PROMPT_BUDGETS.get(stage, 0)
+
+
+# ---------------------------------------------------------------------------
+# context
+# ---------------------------------------------------------------------------
+@contextmanager
+def llm_stage(stage: str) -> Iterator[None]:
+    tok = _STAGE.set(stage)
+    try:
+        yield
+    finally:
+        _STAGE.reset(tok)
+
+
+def current_stage() -> str:
+    return _STAGE.get()
+
+
+# ---------------------------------------------------------------------------
+# per-message call budget
+# ---------------------------------------------------------------------------
+def max_calls_per_message() -> int:
+    env = os.getenv("AGENT10_MAX_LLM_CALLS_PER_MESSAGE", "").strip()
+    return int(env) if env.isdigit() else DEFAULT_MAX_CALLS_PER_MESSAGE
+
+
+class CallBudget:
+    """LLM calls allowed for one generated message (max_calls=0 -> unlimited)."""
+
+    def __init__(self, max_calls: int):
+        self.max_calls = int(max_calls)
+        self.used = 0
+        self.stages: List[str] = []
+        self.denied: List[str] = []
+
+    @property
+    def remaining(self) -> int:
+        if not self.max_calls:
+            return sys.maxsize
+        return max(0, self.max_calls - self.used)
+
+    def acquire(self, stage: str) -> bool:
+        if self.remaining <= 0:
+            self.denied.append(stage)
+            return False
+        self.used += 1
+        self.stages.append(stage)
+        return True
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"llm_calls": self.used, "llm_call_limit": self.max_calls, "llm_calls_denied": list(self.denied)}
+
+
+def begin_message_budget(max_calls: Any = None) -> CallBudget:
+    """Open the call budget for the next message in this context (replaces the previous one)."""
+    budget = CallBudget(max_calls_per_message() if max_calls is None else max_calls)
+    _BUDGET.set(budget)
+    return budget
+
+
+def end_message_budget() -> None:
+    _BUDGET.set(None)
+
+
+def current_budget() -> Any:
+    return _BUDGET.get()
+
+
+def acquire_call(stage: str) -> bool:
+    """True if the caller may make one LLM call for `stage` (always True outside a message budget)."""
+    budget = _BUDGET.get()
+    return True if budget is None else budget.acquire(stage)
+
+
+# ---------------------------------------------------------------------------
+# ledger
+# ---------------------------------------------------------------------------
+def _bucket() -> Dict[str, float]:
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0, "over_budget": 0}
+
+
+class TokenLedger:
+    def __init__(self, warn: bool = True):
+        self.warn = warn
+        self.calls: List[Dict[str, Any]] = []
+
+    def record(self, stage: str, prompt_tokens: int, completion_tokens: int, seconds: float = 0.0, **labels: Any) -> Dict[str, Any]:
+        budget = stage_budget(stage)
+        over = bool(budget) and prompt_tokens > budget
+        entry = {
+            "stage": stage,
+            "brand": labels.get("brand", ""),
+            "persona": labels.get("persona", ""),
+            "prompt_tokens": int(prompt_tokens),
+            "completion_tokens": int(completion_tokens),
+            "seconds": round(float(seconds), 4),
+            "budget": budget,
+            "over_budget": over,
+        }
+        self.calls.append(entry)
+        if over and self.warn:
+            log.warning(
+                "stage=%s prompt_tokens=%d > budget=%d (brand=%s persona=%s)",
+                stage, prompt_tokens, budget, entry["brand"], entry["persona"],
+            )
+        return entry
+
+    def _group(self, key: str) -> Dict[str, Dict[str, float]]:
+        out: Dict[str, Dict[str, float]] = {}
+        for c in self.calls:
+            b = out.setdefault(c[key] or "-", _bucket())
+            b["calls"] += 1
+            b["prompt_tokens"] += c["prompt_tokens"]
+            b["completion_tokens"] += c["completion_tokens"]
+            b["seconds"] = round(b["seconds"] + c["seconds"], 4)
+            b["over_budget"] += int(c["over_budget"])
+        return out
+
+    def totals(self) -> Dict[str, float]:
+        t = _bucket()
+        for b in self._group("stage").values():
+            for k in t:
+                t[k] += b[k]
+        t["seconds"] = round(t["seconds"], 4)
+        return t
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "totals": self.totals(),
+            "by_stage": self._group("stage"),
+            "by_brand": self._group("brand"),
+            "by_persona": self._group("persona"),
+            "budgets": {s: stage_budget(s) for s in sorted(set(STAGE_PROMPT_BUDGETS) | {c["stage"] for c in self.calls})},
+        }
+
+    def format_table(self) -> str:
+        lines = [f"{'stage':<12}{'calls':>6}{'prompt':>9}{'compl':>8}{'sec':>8}{'over':>6}"]
+        for stage, b in sorted(self._group("stage").items()):
+            lines.append(
+                f"{stage:<12}{b['calls']:>6}{b['prompt_tokens']:>9}{b['completion_tokens']:>8}"
+                f"{b['seconds']:>8.2f}{b['over_budget']:>6}"
+            )
+        t = self.totals()
+        lines.append(
+            f"{'TOTAL':<12}{t['calls']:>6}{t['prompt_tokens']:>9}{t['completion_tokens']:>8}"
+            f"{t['seconds']:>8.2f}{t['over_budget']:>6}"
+        )
+        return "\n".join(lines)
+
+
+class MeteredLLM:
+    """
+    Transparent wrapper around the chat client: generate() is forwarded unchanged and
+    recorded in the ledger under the current stage and .labels (the controller sets
+    brand / persona per row). Other attributes (offline, model, chat ...) pass through.
+    """
+
+    def __init__(self, llm: Any, ledger: TokenLedger, **labels: Any):
+        self._llm = llm
+        self.ledger = ledger
+        self.labels: Dict[str, Any] = dict(labels)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._llm, name)
+
+    def generate(self, *args: Any, **kwargs: Any) -> Any:
+        messages = kwargs.get("messages")
+        if messages is None and args:
+            messages = args[0] if len(args) == 1 else [
+                {"role": "system", "content": args[0]}, {"role": "user", "content": args[1]},
+            ]
+        if messages is None and kwargs.get("user") is not None:
+            messages = [{"role": "system", "content": kwargs.get("system") or ""}, {"role": "user", "content": kwargs["user"]}]
+
+        t0 = time.perf_counter()
+        out = self._llm.generate(*args, **kwargs)
+        text = out.get("text", "") if isinstance(out, dict) else out
+        self.ledger.record(
+            current_stage(),
+            estimate_prompt_tokens(messages),
+            estimate_tokens(text),
+            time.perf_counter() - t0,
+            **self.labels,
+        )
+        return out
+
+
+# ---------------------------------------------------------------------------
+# prompt mode
+# ---------------------------------------------------------------------------
+# "full": the original narrator / planner prompts
+# "compact": conditional blocks only when their trigger holds, rules stated once,
+#            persona context serialized as "key: value" lines (AGENT10_PROMPT_MODE)
+PROMPT_MODES = ("full", "compact")
+
+
+def prompt_mode_from(value: Any = None) -> str:
+    mode = str(value or os.getenv("AGENT10_PROMPT_MODE", "") or "full").strip().lower()
+    if mode not in PROMPT_MODES:
+        raise ValueError(f"unknown prompt mode {mode!r} (expected one of {PROMPT_MODES})")
+    return mode
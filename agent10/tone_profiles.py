@@ -1,71 +1,233 @@
 # tone_profiles.py
 from pathlib import Path
-import pandas as pd
-import sys
+import hashlib
+
+from agent_logging import get_logger
+
+log = get_logger("tone_profiles")
+
+# tone index 구성 파일 (data_dir 기준)
+TONE_DEFINITIONS_CSV = "brand_tone_definitions.csv"       # tone_id -> description
+TONE_CENTROID_CSV = "tone_centroid_profile.csv"           # cluster -> tones
+TONE_CLUSTER_CSV = "brand_tone_cluster.csv"               # tone_id -> cluster, brand_position
+BRAND_CLUSTER_CSV = "brand_tone_cluster_by_brand.csv"     # brand -> cluster
+
+TONE_INDEX_FILES = [TONE_DEFINITIONS_CSV, TONE_CENTROID_CSV, TONE_CLUSTER_CSV, BRAND_CLUSTER_CSV]
+
+
+def _file_sha256(p: Path) -> str:
+    if not p.exists():
+        return ""
+    h = hashlib.sha256()
+    with p.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _read_rows(p: Path):
+    if not p.exists():
+        return []
+    from data_build import read_records
+
+    # columnar build when fresh (values stripped, "" for missing), CSV otherwise
+    return read_records(p)
+
+
+def cluster_key(v) -> str:
+    """brand_tone_cluster 값 정규화: 2 / "2" / 2.0 / " 2 " -> "2" (NaN/빈값 -> "")."""
+    if v is None:
+        return ""
+    s = str(v).strip()
+    if s.lower() in ("", "nan", "none"):
+        return ""
+    try:
+        f = float(s)
+        if f.is_integer():
+            return str(int(f))
+    except ValueError:
+        pass
+    return s
+
+
+def _brand_key(v) -> str:
+    from brand_rules import normalize_brand
+
+    return normalize_brand(v)
+
+
+class ToneIndex:
+    """
+    brand -> cluster -> tone ids -> descriptions, resolved with dict lookups.
+
+    - tone_descriptions : tone_id -> "preview full_description"
+    - cluster_tones     : cluster -> (tone_id, ...)   (tone_centroid_profile.csv,
+                          falling back to brand_tone_cluster.csv membership)
+    - brand_clusters    : normalized brand -> cluster (brand_tone_cluster_by_brand.csv)
+    - cluster_profiles  : cluster -> joined description of its tones (precomputed)
+
+    Mapping-compatible (get / [] / in / keys / items) over tone ids AND cluster keys,
+    so it can be handed to consumers that expect the old tone_profile_map dict.
+    """
+
+    def __init__(self, definition_rows, centroid_rows, tone_cluster_rows, brand_cluster_rows, signature=""):
+        self.signature = signature
+
+        self.tone_descriptions = {}
+        for r in definition_rows:
+            tid = r.get("tone_id", "")
+            if not tid:
+                continue
+            full = r.get("full_description", "")
+            prev = r.get("description_preview", "")
+            blob = full
+            if prev and prev not in blob:
+                blob = f"{prev} {full}".strip()
+            self.tone_descriptions[tid] = blob
+
+        self.cluster_positions = {}
+        members = {}
+        for r in tone_cluster_rows:
+            c = cluster_key(r.get("brand_tone_cluster"))
+            tid = r.get("brand", "")  # 이 파일의 brand 컬럼은 tone_id
+            if not c or not tid:
+                continue
+            members.setdefault(c, []).append(tid)
+            if r.get("brand_position"):
+                self.cluster_positions.setdefault(c, r["brand_position"])
+
+        self.cluster_tones = {c: tuple(ts) for c, ts in members.items()}
+        for r in centroid_rows:
+            c = cluster_key(r.get("brand_tone_cluster"))
+            tones = tuple(t.strip() for t in r.get("tones", "").split(",") if t.strip())
+            if c and tones:
+                self.cluster_tones[c] = tones
+
+        self.brand_clusters = {}
+        for r in brand_cluster_rows:
+            b = _brand_key(r.get("brand", ""))
+            c = cluster_key(r.get("brand_tone_cluster"))
+            if b and c:
+                self.brand_clusters[b] = c
+
+        self.cluster_profiles = {}
+        for c, tones in self.cluster_tones.items():
+            descs = [f"{t}: {self.tone_descriptions[t]}" for t in tones if self.tone_descriptions.get(t)]
+            if descs:
+                self.cluster_profiles[c] = " / ".join(descs)
+
+        # tone ids + cluster keys (old tone_profile_map keys + cluster keys)
+        self._flat = dict(self.tone_descriptions)
+        self._flat.update(self.cluster_profiles)
+
+    # ---- resolution ----
+    def cluster_for(self, brand) -> str:
+        return self.brand_clusters.get(_brand_key(brand), "")
+
+    def tones_for(self, brand=None, cluster=None):
+        c = cluster_key(cluster) or self.cluster_for(brand)
+        return self.cluster_tones.get(c, ())
+
+    def resolve(self, brand=None, cluster=None) -> str:
+        """Tone description for a row: explicit cluster first, brand's cluster otherwise ("" if unknown)."""
+        c = cluster_key(cluster)
+        if c in self.cluster_profiles:
+            return self.cluster_profiles[c]
+        return self.cluster_profiles.get(self.cluster_for(brand), "")
+
+    # ---- mapping compatibility ----
+    def get(self, key, default=""):
+        return self._flat.get(cluster_key(key), default)
+
+    def __getitem__(self, key):
+        return self._flat[cluster_key(key)]
+
+    def __contains__(self, key):
+        return cluster_key(key) in self._flat
+
+    def __iter__(self):
+        return iter(self._flat)
+
+    def __len__(self):
+        return len(self._flat)
+
+    def __bool__(self):
+        return bool(self._flat)
+
+    def keys(self):
+        return self._flat.keys()
+
+    def items(self):
+        return self._flat.items()
+
+    def to_dict(self):
+        return dict(self._flat)
+
+
+# data_dir -> ToneIndex (files' sha256 signature 가 바뀌면 재빌드)
+_TONE_INDEX_CACHE = {}
+
+
+def load_tone_index(data_dir) -> ToneIndex:
+    """프로세스 당 1회 로드. 구성 CSV 중 하나라도 내용이 바뀌면 다시 빌드한다."""
+    data_dir = Path(data_dir)
+    paths = [data_dir / name for name in TONE_INDEX_FILES]
+    signature = "|".join(_file_sha256(p) for p in paths)
+
+    cached = _TONE_INDEX_CACHE.get(str(data_dir))
+    if cached is not None and cached.signature == signature:
+        return cached
+
+    index = ToneIndex(*[_read_rows(p) for p in paths], signature=signature)
+    _TONE_INDEX_CACHE[str(data_dir)] = index
+    log.info(
+        "tone index built tones=%d clusters=%d brands=%d",
+        len(index.tone_descriptions), len(index.cluster_profiles), len(index.brand_clusters),
+    )
+    return index
+
 
 class ToneProfiles:
     def __init__(self, data_dir):
         self.data_dir = Path(data_dir)
-        print(f"[ToneProfiles] initialized with data_dir={self.data_dir}", file=sys.stderr)
+        log.debug("initialized with data_dir=%s", self.data_dir)
 
     def _read_csv(self, name):
         p = self.data_dir / name
         if not p.exists():
-            print(f"[ToneProfiles] CSV not found: {p}", file=sys.stderr)
+            log.info("CSV not found: %s", p)
             return None
-        df = pd.read_csv(p)
-        print(f"[ToneProfiles] loaded CSV: {p} rows={len(df)}", file=sys.stderr)
+        from data_build import read_table
+
+        df = read_table(p)
+        log.debug("loaded CSV: %s rows=%d", p, len(df))
         return df
 
     def load_tone_profiles(self):
-        print("[ToneProfiles] load_tone_profiles()", file=sys.stderr)
+        log.debug("load_tone_profiles()")
         df = self._read_csv("brand_tone_definitions.csv")
         if df is None:
             df = self._read_csv("tone_centroid_profile.csv")
         if df is None:
             df = self._read_csv("brand_tone_cluster.csv")
         if df is not None:
-            print(f"[ToneProfiles] tone profiles loaded rows={len(df)}", file=sys.stderr)
-        return df if df is not None else pd.DataFrame()
-
-    def load_tone_profile_map(self):
-        print("[ToneProfiles] load_tone_profile_map()", file=sys.stderr)
-        df = self.load_tone_profiles()
-        if df is None or df.empty:
-            return {}
+            log.info("tone profiles loaded rows=%d", len(df))
+        if df is None:
+            import pandas as pd
 
-        cols = [str(c).strip() for c in df.columns]
+            df = pd.DataFrame()
+        return df
 
-        def pick(cands):
-            for c in cands:
-                if c in cols:
-                    return c
-            return None
+    def tone_index(self) -> ToneIndex:
+        """Cached brand -> cluster -> tone index (see load_tone_index)."""
+        return load_tone_index(self.data_dir)
 
-        kcol = pick(["brand_tone_cluster", "cluster", "tone_cluster", "tone_id", "id"])
-        tcol = pick(["full_description", "tone_full", "description", "desc", "profile", "tone_profile", "text"])
-        pcol = pick(["description_preview", "preview", "short", "summary"])
-
-        if kcol is None:
-            kcol = cols[0]
-        if tcol is None and len(cols) >= 2:
-            tcol = cols[1]
-        if tcol is None:
-            return {}
-
-        m = {}
-        for _, r in df.iterrows():
-            key = str(r.get(kcol, "")).strip()
-            full = str(r.get(tcol, "")).strip()
-            prev = str(r.get(pcol, "")).strip() if pcol else ""
-            if not key:
-                continue
-            blob = full
-            if prev and prev not in blob:
-                blob = f"{prev} {full}".strip()
-            m[key] = blob
-        print(f"[ToneProfiles] tone profile map size={len(m)}", file=sys.stderr)
-        return m
+    def load_tone_profile_map(self):
+        """
+        tone_id -> description, plus cluster key ("0", "1", ...) -> joined description
+        of the cluster's tones. Served from the cached tone index (no CSV re-read).
+        """
+        return self.tone_index().to_dict()
 
 
 # Standalone execution block for testing/logging
@@ -78,6 +240,9 @@ if __name__ == "__main__":
     tp = ToneProfiles(args.data_dir)
     df = tp.load_tone_profiles()
     mp = tp.load_tone_profile_map()
+    idx = tp.tone_index()
 
     print("rows:", len(df))
-    print("map_keys:", list(mp.keys())[:5])
\ No newline at end of file
+    print("map_keys:", list(mp.keys())[:5])
+    for b, c in list(idx.brand_clusters.items())[:5]:
+        print(f"{b} -> cluster {c} -> {idx.tones_for(brand=b)}")
@@ -2,24 +2,56 @@
 # Verifier is executed after narration. It must validate structure without mutating content.
 
 import re
-import csv
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from product_index import load_product_index, name_variants, normalize_product_key
 
 MIN_BODY_LEN = 300
 MAX_BODY_LEN = 350
 
+# nl_anomaly patterns (also used by repair_planner to locate the slot)
+NL_ANOMALY_PATTERNS = (
+    r"\b5에\b",                 # stray numeral + particle
+    r"(잦음)\s*도\s*\1",        # duplicated token like '잦음도 잦음'
+)
+
+
+@lru_cache(maxsize=None)
+def _adjacent_repeat_pattern(min_k: int, max_k: int) -> "re.Pattern":
+    # (.{min_k,max_k})\1 : some k-gram (min_k <= k <= max_k) immediately followed by itself.
+    # The regex engine backtracks over every k at every position, so a match exists
+    # iff s[i:i+k] == s[i+k:i+2k] for some i, k (the scan runs in C instead of a Python double loop).
+    return re.compile(r"(.{%d,%d})\1" % (min_k, max_k), re.DOTALL)
+
+
 class MessageVerifier:
-    def __init__(self, strict: bool = True, product_catalog_path: Optional[str] = None):
+    def __init__(
+        self,
+        strict: bool = True,
+        product_catalog_path: Optional[str] = None,
+        product_brand_map: Optional[Dict[str, str]] = None,
+    ):
         self.strict = strict
 
         # Product→Brand reverse mapping (상품명 -> brand)
         # Used to validate that the selected product actually belongs to the persona's brand.
         # If the catalog cannot be loaded, brand-mismatch validation is skipped (non-blocking).
+        # A preloaded map (normalized key -> brand, see product_brand_map()) skips the CSV read;
+        # verify_many hands the parent's map to every worker this way.
         self._product_brand_map: Dict[str, str] = {}
         self._product_brand_map_loaded: bool = False
         self._product_catalog_path: Optional[str] = product_catalog_path
+        if product_brand_map is not None:
+            self._product_brand_map = dict(product_brand_map)
+            self._product_brand_map_loaded = True
+        self._ensure_product_brand_map_loaded()
+
+    def product_brand_map(self) -> Dict[str, str]:
+        """Normalized product key -> brand (as loaded from the catalog)."""
         self._ensure_product_brand_map_loaded()
+        return self._product_brand_map
 
     def _has_brand(self, text: str, brand: str) -> bool:
         if not brand:
@@ -34,17 +66,16 @@ class MessageVerifier:
         if not text:
             return False
 
-        # Normalize whitespace
+        # Normalize whitespace; anchor variants (whitespace-free / volume-stripped,
+        # e.g. 10ml/30ml/50ml/100ml removed) are memoized in product_index
         norm_text = re.sub(r"\s+", "", text)
-        norm_anchor = re.sub(r"\s+", "", product_anchor)
+        norm_anchor, stripped_anchor = name_variants(product_anchor)
 
         # Exact anchor match
         if norm_anchor in norm_text:
             return True
 
-        # Tolerant match: strip common volume units like 10ml/30ml/50ml/100ml
-        stripped_anchor = re.sub(r"\d+(ml|ML|mL)", "", norm_anchor)
-        stripped_anchor = stripped_anchor.strip()
+        # Tolerant match: volume units stripped
 
         if stripped_anchor and stripped_anchor in norm_text:
             return True
@@ -57,10 +88,7 @@ class MessageVerifier:
         - Strip whitespace
         - Remove common volume tokens like 10ml/30ml
         """
-        s = re.sub(r"\s+", "", name or "")
-        # Remove volume tokens (ml) to be tolerant to anchor formatting
-        s2 = re.sub(r"\d+(ml|ML|mL)", "", s)
-        return s2.strip()
+        return normalize_product_key(name or "")
 
     def _default_product_catalog_path(self) -> Path:
         # agent10/verifier.py -> project_root/data/amore_with_category.csv
@@ -86,20 +114,9 @@ class MessageVerifier:
                 self._product_brand_map_loaded = True
                 return
 
-            m: Dict[str, str] = {}
-            with path.open("r", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                # Expected columns: 상품명, ..., brand
-                for row in reader:
-                    pname = (row.get("상품명") or "").strip()
-                    b = (row.get("brand") or "").strip()
-                    if not pname or not b:
-                        continue
-                    key = self._normalize_product_key(pname)
-                    if key:
-                        # Keep first occurrence; later duplicates are ignored to preserve determinism.
-                        m.setdefault(key, b)
-            self._product_brand_map = m
+            # Shared product index (built once per catalog file; expected columns: 상품명, ..., brand).
+            # Keys are volume-stripped names; first occurrence wins to preserve determinism.
+            self._product_brand_map = load_product_index(path).brand_map()
         except Exception:
             # Non-blocking: if catalog load fails, skip this validation.
             self._product_brand_map = {}
@@ -114,7 +131,7 @@ class MessageVerifier:
         if not self._product_brand_map:
             return ""
 
-        key = self._normalize_product_key(product_name)
+        raw_key, key = name_variants(product_name)
         if not key:
             return ""
 
@@ -124,8 +141,7 @@ class MessageVerifier:
             return b
 
         # If the input still contains ml variants, try the raw whitespace-stripped form too.
-        raw_key = re.sub(r"\s+", "", product_name or "").strip()
-        return self._product_brand_map.get(raw_key, "")
+        return self._product_brand_map.get(raw_key.strip(), "")
 
     def _has_skin_concern(self, text: str, concerns: List[str]) -> bool:
         """Skin concern is OPTIONAL.
@@ -196,12 +212,7 @@ class MessageVerifier:
     def _has_natural_language_anomaly(self, body: str) -> bool:
         if not body:
             return False
-        # Simple anomaly patterns
-        patterns = [
-            r"\b5에\b",                 # stray numeral + particle
-            r"(잦음)\s*도\s*\1",        # duplicated token like '잦음도 잦음'
-        ]
-        for p in patterns:
+        for p in NL_ANOMALY_PATTERNS:
             if re.search(p, body):
                 return True
         return False
@@ -241,14 +252,7 @@ class MessageVerifier:
             if len(s) < (min_k * 2):
                 return False
             # Scan for any k-gram that repeats immediately next to itself: s[i:i+k] == s[i+k:i+2k]
-            for k in range(min_k, max_k + 1):
-                limit = len(s) - 2 * k
-                if limit < 0:
-                    continue
-                for i in range(0, limit + 1):
-                    if s[i:i + k] == s[i + k:i + 2 * k]:
-                        return True
-            return False
+            return _adjacent_repeat_pattern(min_k, max_k).search(s) is not None
 
         # Strict for main chunks: smaller repeats should be caught.
         for c in main_chunks:
@@ -375,6 +379,53 @@ class MessageVerifier:
 
         return errs
 
+# -------------------------------------------------
+# Batch verification (archive audits)
+# - re-verify months of sent messages when a rule changes
+# - records are (message, plan) pairs, sharded across worker processes
+# - verdicts stream back in input order (see workers.ordered_pool_map)
+# -------------------------------------------------
+_WORKER_VERIFIER: Optional[MessageVerifier] = None
+
+
+def _init_verify_worker(strict: bool, product_brand_map: Dict[str, str]) -> None:
+    global _WORKER_VERIFIER
+    _WORKER_VERIFIER = MessageVerifier(strict=strict, product_brand_map=product_brand_map)
+
+
+def _verify_chunk(records: List[Tuple[Dict, Dict]]) -> List[Dict]:
+    v = _WORKER_VERIFIER
+    return [v.verify(message or {}, plan or {}) for message, plan in records]
+
+
+def verify_many(
+    records: Iterable[Tuple[Dict, Dict]],
+    processes: Optional[int] = None,
+    chunksize: int = 512,
+    max_pending: Optional[int] = None,
+    strict: bool = True,
+    product_catalog_path: Optional[str] = None,
+) -> Iterator[Dict]:
+    """Verify (message, plan) records in worker processes; yields verify() verdicts in order.
+
+    The product→brand map is loaded once here and shipped to each worker at startup.
+    `records` is consumed lazily; at most `max_pending` chunks (default 2 per worker) are in flight.
+    processes=1 runs in-process.
+    """
+    from workers import ordered_pool_map
+
+    brand_map = MessageVerifier(strict=strict, product_catalog_path=product_catalog_path).product_brand_map()
+    return ordered_pool_map(
+        _verify_chunk,
+        records,
+        initializer=_init_verify_worker,
+        initargs=(strict, brand_map),
+        processes=processes,
+        chunksize=chunksize,
+        max_pending=max_pending,
+    )
+
+
 # Compatibility helper for controller import.
 # Brand rule validation (if any) must be executed after narration, and must not mutate content.
 # This default implementation is intentionally non-destructive and signature-tolerant.
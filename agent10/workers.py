@@ -0,0 +1,81 @@
+# agent10/workers.py
+# Ordered, bounded process-pool map for archive-scale batch jobs.
+#
+# - input is any iterable (generators over months of archived messages are fine);
+#   it is consumed lazily in chunks, never materialized
+# - at most `max_pending` chunks are in flight, so memory stays bounded
+# - results are yielded in input order
+# - per-worker state (verifier, product→brand map, compiled rules ...) is built
+#   once by `initializer`, not once per record
+#
+# processes=1 (or a single-CPU box) runs everything in-process with the same
+# initializer, which is also what you want under a debugger.
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence
+
+DEFAULT_CHUNKSIZE = 512
+
+
+def default_processes() -> int:
+    """Worker count: AGENT10_WORKERS env, else CPU count."""
+    env = os.getenv("AGENT10_WORKERS", "").strip()
+    if env.isdigit() and int(env) > 0:
+        return int(env)
+    return os.cpu_count() or 1
+
+
+def iter_chunks(items: Iterable[Any], chunksize: int) -> Iterator[List[Any]]:
+    it = iter(items)
+    size = max(1, int(chunksize))
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def ordered_pool_map(
+    chunk_fn: Callable[[List[Any]], Sequence[Any]],
+    items: Iterable[Any],
+    initializer: Optional[Callable[..., None]] = None,
+    initargs: tuple = (),
+    processes: Optional[int] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    max_pending: Optional[int] = None,
+) -> Iterator[Any]:
+    """
+    Apply `chunk_fn` (list of items -> list of results, same length) over `items`
+    in worker processes and yield the individual results in input order.
+
+    `chunk_fn` and `initializer` must be module-level functions (picklable).
+    """
+    n_proc = int(processes) if processes else default_processes()
+
+    if n_proc <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for chunk in iter_chunks(items, chunksize):
+            yield from chunk_fn(chunk)
+        return
+
+    # 2 chunks per worker keeps every worker busy while the consumer drains results
+    limit = int(max_pending) if max_pending else 2 * n_proc
+
+    with ProcessPoolExecutor(max_workers=n_proc, initializer=initializer, initargs=initargs) as pool:
+        pending = deque()
+        chunks = iter_chunks(items, chunksize)
+        try:
+            for chunk in chunks:
+                pending.append(pool.submit(chunk_fn, chunk))
+                if len(pending) >= limit:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            # consumer stopped early (or an error surfaced): drop queued work
+            for fut in pending:
+                fut.cancel()